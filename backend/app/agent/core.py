@@ -2,6 +2,13 @@ import asyncio
 import uuid
 from typing import Any, Dict, List, Optional
 
+from app.agent.graph.checkpoint import (
+    clear_turn,
+    get_checkpointer,
+    has_pending_turn,
+    make_turn_config,
+    touch_turn,
+)
 from app.agent.graph.workflow import AgentState, create_workflow
 from app.agent.memory import AgentMemory
 from app.agent.tools import get_tools
@@ -9,6 +16,13 @@ from app.core.error_handler import ErrorSanitizer
 from app.services.llm_service import get_llm
 from loguru import logger
 
+# セッションごとに作成するAgentManager（既定のLLMクライアントとワークフロー）と、
+# セッション別のLLM設定で追加するクライアントとワークフローの概算メモリサイズ（バイト）
+# scripts/benchmark_memory.py --agent-managers で計測した値（Azure OpenAI・OpenAIで
+# それぞれ約147KiB・約136KiB、ローカルLLMで約31KiB）の大きい方を切り上げて使用する
+SESSION_AGENT_FOOTPRINT_BYTES = 160 * 1024
+SESSION_CLIENT_FOOTPRINT_BYTES = 160 * 1024
+
 
 class AgentManager:
     """エージェントマネージャクラス - セッション別管理対応"""
@@ -24,7 +38,10 @@ class AgentManager:
         self.default_llm = get_llm(llm_config)
         self.memory = AgentMemory()
         self.tools = get_tools()
-        self.default_workflow = create_workflow(self.default_llm, self.tools)
+        self.checkpointer = get_checkpointer()
+        self.default_workflow = create_workflow(
+            self.default_llm, self.tools, self.checkpointer
+        )
         self.sessions = {}  # セッション情報
         self.session_llm_configs = {}  # セッション別LLM設定
         self.session_llms = {}  # セッション別LLMインスタンス
@@ -74,7 +91,7 @@ class AgentManager:
         try:
             self.session_llms[session_id] = get_llm(llm_config)
             self.session_workflows[session_id] = create_workflow(
-                self.session_llms[session_id], self.tools
+                self.session_llms[session_id], self.tools, self.checkpointer
             )
             logger.info(f"セッション {session_id} のLLM設定を更新しました")
         except Exception as e:
@@ -130,14 +147,42 @@ class AgentManager:
                 "current_thought": "",
                 "tool_calls": [],
                 "tools_output": [],
+                "budget_report": [],
+                "budget_notice": None,
                 "final_response": None,
                 "error": None,
             }
 
             # セッション別のワークフローを取得して実行
             workflow = self.get_session_workflow(session_id)
-            logger.info(f"ワークフロー実行開始: セッションID={session_id}")
-            result_state = await asyncio.to_thread(workflow.invoke, initial_state)
+            # チェックポイント有効時はセッションとターンをキーに状態を保存
+            turn_config = (
+                await asyncio.to_thread(
+                    make_turn_config, self.checkpointer, session_id, enriched_message
+                )
+                if self.checkpointer is not None
+                else None
+            )
+
+            # 再開されないまま残ったターンを期限切れで削除できるよう開始時刻を記録
+            await asyncio.to_thread(touch_turn, self.checkpointer, turn_config)
+
+            if turn_config and await asyncio.to_thread(
+                has_pending_turn, workflow, turn_config
+            ):
+                # 中断されたターンは最後に完了したノードから再開
+                logger.info(f"中断されたターンを再開: セッションID={session_id}")
+                result_state = await asyncio.to_thread(
+                    workflow.invoke, None, turn_config
+                )
+            else:
+                logger.info(f"ワークフロー実行開始: セッションID={session_id}")
+                result_state = await asyncio.to_thread(
+                    workflow.invoke, initial_state, turn_config
+                )
+
+            # 完了したターンのチェックポイントは不要なので削除
+            await asyncio.to_thread(clear_turn, self.checkpointer, turn_config)
 
             # エラー処理
             if result_state.get("error"):
@@ -157,6 +202,7 @@ class AgentManager:
                 "session_id": session_id,
                 "thought_process": result_state.get("current_thought", ""),
                 "tool_calls": result_state.get("tools_output", []),
+                "budget_notice": result_state.get("budget_notice"),
             }
 
         except Exception as e:
@@ -191,18 +237,35 @@ class AgentManager:
 
         # 古いセッションを削除
         for session_id in sessions_to_remove:
-            self.memory.clear_session(session_id)
-            if session_id in self.session_llm_configs:
-                del self.session_llm_configs[session_id]
-            if session_id in self.session_llms:
-                del self.session_llms[session_id]
-            if session_id in self.session_workflows:
-                del self.session_workflows[session_id]
-            del self.sessions[session_id]
+            self.remove_session(session_id)
             logger.info(f"古いセッションを削除: {session_id}")
 
         return len(sessions_to_remove)
 
+    def remove_session(self, session_id: str) -> None:
+        """セッションに関連するデータをすべて削除する"""
+        self.memory.clear_session(session_id)
+        self.session_llm_configs.pop(session_id, None)
+        self.session_llms.pop(session_id, None)
+        self.session_workflows.pop(session_id, None)
+        self.sessions.pop(session_id, None)
+
+    def get_session_footprint(self, session_id: str) -> int:
+        """
+        セッションが使用している概算メモリサイズを取得する
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            概算バイト数（履歴、AgentManager、セッション別クライアント）
+        """
+        footprint = self.memory.get_session_size(session_id)
+        footprint += SESSION_AGENT_FOOTPRINT_BYTES
+        if session_id in self.session_llms or session_id in self.session_workflows:
+            footprint += SESSION_CLIENT_FOOTPRINT_BYTES
+        return footprint
+
     def get_session_stats(self) -> Dict[str, Any]:
         """セッション統計情報を取得"""
         return {
@@ -210,4 +273,7 @@ class AgentManager:
             "memory_sessions": self.memory.get_session_count(),
             "llm_config_sessions": len(self.session_llm_configs),
             "active_workflows": len(self.session_workflows),
+            "footprint_bytes": sum(
+                self.get_session_footprint(session_id) for session_id in self.sessions
+            ),
         }
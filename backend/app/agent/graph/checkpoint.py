@@ -0,0 +1,211 @@
+"""
+ワークフローのチェックポイント管理
+ターン途中でワーカーが停止しても、完了済みノードから再開できるようにする
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.config import CHECKPOINT_DB_PATH
+from app.core.settings import get_settings
+from loguru import logger
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+# チェックポイントを保存するテーブル（thread_idでターンを識別する）
+_TURN_TABLES = ("checkpoints", "writes", "turn_activity")
+
+
+def get_checkpointer():
+    """
+    SQLiteベースのチェックポインタを取得する（無効時はNone）
+
+    Returns:
+        SqliteSaverインスタンス、またはNone
+    """
+    global _checkpointer
+
+    if not get_settings().checkpoint_enabled:
+        return None
+
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+
+            # ワークフローはスレッドプールで実行されるため同一スレッド制約を外す
+            conn = sqlite3.connect(CHECKPOINT_DB_PATH, check_same_thread=False)
+            _checkpointer = SqliteSaver(conn)
+            _checkpointer.setup()
+            # 再開されなかったターンを期限切れで削除するため、ターンの開始時刻を記録する
+            with _checkpointer.cursor() as cur:
+                cur.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS turn_activity (
+                        thread_id TEXT PRIMARY KEY,
+                        updated_at REAL NOT NULL
+                    )
+                    """
+                )
+                # 同じ内容のメッセージを別のターンとして区別するため、完了したターン数を記録する
+                cur.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS session_turns (
+                        session_id TEXT PRIMARY KEY,
+                        completed INTEGER NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                    """
+                )
+            logger.info(f"チェックポイントDBを初期化しました: {CHECKPOINT_DB_PATH}")
+
+    return _checkpointer
+
+
+def make_turn_config(checkpointer, session_id: str, turn_input: str) -> Dict[str, Any]:
+    """
+    セッションとターンをキーとしたワークフロー実行設定を作成する
+
+    ターンはセッションで完了したターン数とユーザー入力のハッシュで識別する。
+    中断されたターンのメッセージが再起動後に再送された場合は同じスレッドに対応付けられ、
+    完了したターンと同じ内容のメッセージは新しいターンとして扱われる。
+
+    Args:
+        checkpointer: チェックポインタ
+        session_id: セッションID
+        turn_input: ターンのユーザー入力（添付ファイル情報を含む）
+
+    Returns:
+        LangGraphの実行設定
+    """
+    with checkpointer.cursor() as cur:
+        row = cur.execute(
+            "SELECT completed FROM session_turns WHERE session_id = ?", (session_id,)
+        ).fetchone()
+    turn_index = row[0] if row else 0
+    turn_key = hashlib.sha256(turn_input.encode("utf-8")).hexdigest()[:16]
+    return {"configurable": {"thread_id": f"{session_id}:{turn_index}:{turn_key}"}}
+
+
+def has_pending_turn(workflow, config: Dict[str, Any]) -> bool:
+    """中断されたターン（未実行ノードが残っている状態）があるか確認"""
+    snapshot = workflow.get_state(config)
+    return bool(snapshot and snapshot.next)
+
+
+def touch_turn(checkpointer, config: Optional[Dict[str, Any]]) -> None:
+    """ターンの実行開始時刻を記録する（期限切れのターンの削除に使用）"""
+    if checkpointer is None or config is None:
+        return
+
+    try:
+        with checkpointer.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO turn_activity (thread_id, updated_at) "
+                "VALUES (?, ?)",
+                (config["configurable"]["thread_id"], time.time()),
+            )
+    except Exception as e:
+        logger.warning(f"ターンの記録エラー: {str(e)}")
+
+
+def _delete_threads(cur: sqlite3.Cursor, thread_ids: List[str]) -> None:
+    """ターンのチェックポイントを削除"""
+    for table in _TURN_TABLES:
+        cur.executemany(
+            f"DELETE FROM {table} WHERE thread_id = ?",
+            [(thread_id,) for thread_id in thread_ids],
+        )
+
+
+def clear_turn(checkpointer, config: Optional[Dict[str, Any]]) -> None:
+    """完了したターンのチェックポイントを削除し、セッションの完了ターン数を進める"""
+    if checkpointer is None or config is None:
+        return
+
+    thread_id = config["configurable"]["thread_id"]
+    session_id = thread_id.rsplit(":", 2)[0]
+    try:
+        with checkpointer.cursor() as cur:
+            _delete_threads(cur, [thread_id])
+            cur.execute(
+                """
+                INSERT INTO session_turns (session_id, completed, updated_at)
+                VALUES (?, 1, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    completed = completed + 1, updated_at = excluded.updated_at
+                """,
+                (session_id, time.time()),
+            )
+    except Exception as e:
+        logger.warning(f"チェックポイント削除エラー: {str(e)}")
+
+
+def clear_session_turns(checkpointer, session_id: str) -> None:
+    """
+    セッションの未完了ターンのチェックポイントをすべて削除する（セッション削除時に使用）
+
+    Args:
+        checkpointer: チェックポインタ（Noneの場合は何もしない）
+        session_id: セッションID
+    """
+    if checkpointer is None:
+        return
+
+    # thread_idは「セッションID:ターン番号:入力のハッシュ」のため、前方一致の範囲で検索する
+    # （「;」は「:」の次の文字）
+    bounds = (f"{session_id}:", f"{session_id};")
+    try:
+        with checkpointer.cursor() as cur:
+            for table in _TURN_TABLES:
+                cur.execute(
+                    f"DELETE FROM {table} WHERE thread_id >= ? AND thread_id < ?",
+                    bounds,
+                )
+            cur.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+    except Exception as e:
+        logger.warning(f"チェックポイント削除エラー: {str(e)}")
+
+
+def sweep_stale_turns(checkpointer, max_age_seconds: float) -> int:
+    """
+    一定時間再開されなかったターンのチェックポイントを削除する
+
+    Args:
+        checkpointer: チェックポインタ（Noneの場合は何もしない）
+        max_age_seconds: ターンの開始からの保持期間（秒）
+
+    Returns:
+        削除したターン数
+    """
+    if checkpointer is None:
+        return 0
+
+    cutoff = time.time() - max_age_seconds
+    with checkpointer.cursor() as cur:
+        thread_ids = [
+            row[0]
+            for row in cur.execute(
+                "SELECT thread_id FROM turn_activity WHERE updated_at < ?", (cutoff,)
+            ).fetchall()
+        ]
+        # 開始時刻を記録する前に作成されたチェックポイントも対象にする
+        thread_ids += [
+            row[0]
+            for row in cur.execute(
+                "SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id NOT IN "
+                "(SELECT thread_id FROM turn_activity)"
+            ).fetchall()
+        ]
+        _delete_threads(cur, thread_ids)
+        # 長期間ターンが完了していないセッションの完了ターン数も削除する
+        cur.execute("DELETE FROM session_turns WHERE updated_at < ?", (cutoff,))
+
+    if thread_ids:
+        logger.info(
+            f"再開されなかったターンのチェックポイントを削除しました: {len(thread_ids)}件"
+        )
+    return len(thread_ids)
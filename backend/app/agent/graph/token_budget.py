@@ -0,0 +1,161 @@
+"""
+ツール実行結果のトークン予算管理
+最終応答の生成前に各ツール出力のトークン数を見積もり、全体の予算内に収まるよう配分・削減する
+"""
+
+from typing import Any, Dict, List, Tuple
+
+# 削減時に先頭側へ割り当てる予算の割合（残りは末尾側）
+_HEAD_RATIO = 0.7
+
+# 中略の注記に確保するトークン数
+_MARKER_TOKENS = 32
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのトークン数を見積もる
+
+    トークナイザーを読み込まずに高速に計算するため、ASCII文字は約4文字で1トークン、
+    日本語などの非ASCII文字は1文字1トークンとして概算する。
+
+    Args:
+        text: 対象テキスト
+
+    Returns:
+        推定トークン数
+    """
+    # 日本語の大半はUTF-8で3バイトのため、増えたバイト数から非ASCII文字数を概算
+    non_ascii = (len(text.encode("utf-8", errors="replace")) - len(text)) // 2
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+def allocate_budget(sizes: List[int], total_budget: int) -> List[int]:
+    """
+    全体の予算を各出力に配分する
+
+    予算の均等割り当て以下の出力はそのまま残し、余った分を大きな出力で分け合う
+    （小さな出力が大きな出力の巻き添えで削られないようにする）。
+
+    Args:
+        sizes: 出力ごとの推定トークン数
+        total_budget: 全体のトークン予算
+
+    Returns:
+        出力ごとに割り当てたトークン数
+    """
+    allocation = [0] * len(sizes)
+    remaining = total_budget
+    pending = sorted(range(len(sizes)), key=lambda i: sizes[i])
+
+    while pending:
+        share = remaining // len(pending)
+        index = pending[0]
+        if sizes[index] > share:
+            # 残りはすべて均等割り当てを超えるため、等分して終了
+            for index in pending:
+                allocation[index] = share
+            break
+        allocation[index] = sizes[index]
+        remaining -= sizes[index]
+        pending.pop(0)
+
+    return allocation
+
+
+def fit_to_budget(text: str, budget: int) -> Tuple[str, int]:
+    """
+    テキストを予算内に収まるよう先頭と末尾を残して中略する
+
+    表やログは行単位で意味を持つため、切り取り位置は行の境界に合わせる。
+
+    Args:
+        text: 対象テキスト
+        budget: トークン予算
+
+    Returns:
+        (削減後のテキスト, 省略した文字数)
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        return text, 0
+
+    # トークン数と文字数の比率から、残す文字数を算出
+    keep_chars = max(0, int(len(text) * (budget - _MARKER_TOKENS) / tokens))
+    head_chars = int(keep_chars * _HEAD_RATIO)
+    tail_chars = keep_chars - head_chars
+
+    head_end = text.rfind("\n", 0, head_chars)
+    head_end = head_end + 1 if head_end > head_chars // 2 else head_chars
+    tail_start = text.find("\n", len(text) - tail_chars)
+    tail_start = (
+        tail_start + 1
+        if 0 <= tail_start < len(text) - tail_chars // 2
+        else len(text) - tail_chars
+    )
+
+    omitted = tail_start - head_end
+    marker = f"\n\n...（中略: 約{omitted}文字を省略しました）...\n\n"
+    return text[:head_end] + marker + text[tail_start:], omitted
+
+
+def apply_token_budget(
+    tools_output: List[Dict[str, Any]], total_budget: int
+) -> List[Dict[str, Any]]:
+    """
+    ツール出力全体に予算を配分し、超過した出力を削減する
+
+    Args:
+        tools_output: ツール実行結果のリスト（各要素のoutputを書き換える）
+        total_budget: 全体のトークン予算
+
+    Returns:
+        削減した出力の報告（ツール名・元のトークン数・残したトークン数・省略文字数）
+    """
+    outputs = [str(entry.get("output", "")) for entry in tools_output]
+    sizes = [estimate_tokens(output) for output in outputs]
+    if sum(sizes) <= total_budget:
+        return []
+
+    report = []
+    for entry, output, size, budget in zip(
+        tools_output, outputs, sizes, allocate_budget(sizes, total_budget)
+    ):
+        if size <= budget:
+            continue
+
+        trimmed, omitted = fit_to_budget(output, budget)
+        entry["output"] = trimmed
+        report.append(
+            {
+                "tool": entry.get("tool"),
+                "original_tokens": size,
+                "kept_tokens": estimate_tokens(trimmed),
+                "omitted_chars": omitted,
+            }
+        )
+        entry["budget"] = report[-1]
+
+    return report
+
+
+def format_budget_notice(report: List[Dict[str, Any]]) -> str:
+    """
+    削減内容をユーザー向けの注記に整形する
+
+    Args:
+        report: apply_token_budgetの報告
+
+    Returns:
+        注記テキスト（削減がなければ空文字列）
+    """
+    if not report:
+        return ""
+
+    lines = ["※ ツール実行結果が長いため、一部を省略して回答しています:"]
+    for item in report:
+        lines.append(
+            f"- {item['tool']}: 約{item['original_tokens']}トークン中 "
+            f"約{item['kept_tokens']}トークンを使用（{item['omitted_chars']}文字を省略）"
+        )
+    return "\n".join(lines)
@@ -1,24 +1,36 @@
 import json
 from typing import Any, Dict, List, Optional, TypedDict
 
+from app.agent.graph.token_budget import apply_token_budget, format_budget_notice
+from app.agent.memory import ROLE_USER, ChatRecord, to_prompt_messages
 from app.core.error_handler import ErrorSanitizer
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from app.core.settings import get_settings
+from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.graph import END, START, StateGraph
 from loguru import logger
 
 
 # 状態の型定義
 class AgentState(TypedDict):
-    messages: List[Dict[str, Any]]
+    messages: List[ChatRecord]
     current_thought: str
     tool_calls: List[Dict[str, Any]]
     tools_output: List[Dict[str, Any]]
+    budget_report: List[Dict[str, Any]]
+    budget_notice: Optional[str]
     final_response: Optional[str]
     error: Optional[str]
 
 
-def create_workflow(agent, tools):
-    """エージェントワークフローを作成する"""
+def create_workflow(agent, tools, checkpointer=None):
+    """
+    エージェントワークフローを作成する
+
+    Args:
+        agent: LLMインスタンス
+        tools: 利用可能なツールのリスト
+        checkpointer: ノード単位で状態を保存するチェックポインタ（オプション）
+    """
 
     # 状態グラフの作成
     workflow = StateGraph(AgentState)
@@ -35,8 +47,8 @@ def create_workflow(agent, tools):
             # 最新のユーザーメッセージを取得
             last_user_message = None
             for msg in reversed(state["messages"]):
-                if msg["role"] == "user":
-                    last_user_message = msg["content"]
+                if msg.role == ROLE_USER:
+                    last_user_message = msg.content
                     break
 
             if not last_user_message:
@@ -49,6 +61,7 @@ def create_workflow(agent, tools):
             state["current_thought"] = ""
             state["tool_calls"] = []
             state["tools_output"] = []
+            state["budget_report"] = []
             state["final_response"] = None
             state["error"] = None
 
@@ -85,6 +98,7 @@ def create_workflow(agent, tools):
             1. web_search - ウェブ上で情報を検索します
             2. file_processor - アップロードされたファイルを処理します
             3. document_checker - アップロードされたドキュメントをチェックします
+            4. document_search - アップロードされたドキュメントから質問に関連する部分を検索します
             
             問題解決の手順:
             1. 問題を明確に理解する
@@ -98,13 +112,7 @@ def create_workflow(agent, tools):
             prompt_messages.append(SystemMessage(content=system_content))
 
             # 会話履歴を追加
-            for msg in state["messages"]:
-                if msg["role"] == "user":
-                    prompt_messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    prompt_messages.append(AIMessage(content=msg["content"]))
-                elif msg["role"] == "system":
-                    prompt_messages.append(SystemMessage(content=msg["content"]))
+            prompt_messages.extend(to_prompt_messages(state["messages"]))
 
             # 思考生成用の追加指示
             think_instruction = """
@@ -175,7 +183,7 @@ def create_workflow(agent, tools):
                 HumanMessage(
                     content=f"""
                 ユーザーの質問:
-                {state["messages"][-1]["content"]}
+                {state["messages"][-1].content}
                 
                 私の思考:
                 {state["current_thought"]}
@@ -234,8 +242,8 @@ def create_workflow(agent, tools):
                     if tool and tool_input:
                         try:
                             logger.debug(f"ツール実行: {tool_name}, 入力: {tool_input}")
-                            # ツールを実行
-                            tool_output = tool._run(tool_input)
+                            # ツールを実行（決定的なツールは共有キャッシュを利用）
+                            tool_output = tool.execute(tool_input)
 
                             # 結果を記録
                             tools_output.append(
@@ -275,14 +283,39 @@ def create_workflow(agent, tools):
             state["error"] = safe_message
             return state
 
-    # ステップ4: 最終応答生成
+    # ステップ4: ツール出力のトークン予算調整
+    def budget_tools_output(state: AgentState) -> AgentState:
+        """
+        ツール出力をトークン予算内に収めるノード
+
+        最終応答の生成時間とコストが出力の大きさに左右されないよう、
+        予算を超えた出力は先頭と末尾を残して中略する。
+        """
+        logger.info("ステップ4: ツール出力の予算調整")
+
+        if state.get("error") or not state.get("tools_output"):
+            return state
+
+        report = apply_token_budget(
+            state["tools_output"], get_settings().tool_output_token_budget
+        )
+        for item in report:
+            logger.info(
+                f"ツール出力を削減: {item['tool']} "
+                f"{item['original_tokens']} -> {item['kept_tokens']}トークン"
+            )
+        state["budget_report"] = report
+
+        return state
+
+    # ステップ5: 最終応答生成
     def generate_response(state: AgentState) -> AgentState:
         """
         最終的な応答を生成するノード
 
         思考プロセスとツール実行結果を使用して、ユーザーへの最終応答を生成する。
         """
-        logger.info("ステップ4: 最終応答生成")
+        logger.info("ステップ5: 最終応答生成")
 
         if state.get("error"):
             return state
@@ -308,7 +341,7 @@ def create_workflow(agent, tools):
                 HumanMessage(
                     content=f"""
                 ユーザーの質問:
-                {state["messages"][-1]["content"]}
+                {state["messages"][-1].content}
                 
                 私の思考過程:
                 {state["current_thought"]}
@@ -327,8 +360,11 @@ def create_workflow(agent, tools):
             # 応答内容のログを記録
             logger.debug(f"生成された最終応答:\n{response.content}")
 
-            # 応答を状態に保存
+            # 応答を状態に保存（ツール出力を省略した旨は会話履歴に残さないよう別に保持）
             state["final_response"] = response.content
+            state["budget_notice"] = (
+                format_budget_notice(state.get("budget_report") or []) or None
+            )
 
             return state
 
@@ -342,14 +378,16 @@ def create_workflow(agent, tools):
     workflow.add_node("process_input", process_input)
     workflow.add_node("generate_thought", generate_thought)
     workflow.add_node("execute_tools", execute_tools)
+    workflow.add_node("budget_tools_output", budget_tools_output)
     workflow.add_node("generate_response", generate_response)
 
     # エッジの定義
     workflow.add_edge(START, "process_input")
     workflow.add_edge("process_input", "generate_thought")
     workflow.add_edge("generate_thought", "execute_tools")
-    workflow.add_edge("execute_tools", "generate_response")
+    workflow.add_edge("execute_tools", "budget_tools_output")
+    workflow.add_edge("budget_tools_output", "generate_response")
     workflow.add_edge("generate_response", END)
 
     # コンパイル
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
@@ -1,8 +1,45 @@
-from typing import Any, Dict, List
+import sys
+from typing import Dict, Iterable, List, NamedTuple
 
-from langchain.memory import ConversationBufferMemory
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+# メッセージのロール（全レコードで同一の文字列オブジェクトを共有する）
+ROLE_USER = "user"
+ROLE_ASSISTANT = "assistant"
+ROLE_SYSTEM = "system"
+
+
+class ChatRecord(NamedTuple):
+    """会話履歴の1メッセージ（タプルベースでインスタンス辞書を持たない）"""
+
+    role: str
+    content: str
+
+
+# レコード1件あたりの概算オーバーヘッド（タプル本体とリストのスロット）
+_RECORD_OVERHEAD_BYTES = 64
+
+
+def _text_size(text: str) -> int:
+    """文字列の概算メモリサイズ（バイト）"""
+    return sys.getsizeof(text)
+
+
+# ロールとプロンプト用メッセージクラスの対応
+_PROMPT_MESSAGE_CLASSES = {
+    ROLE_USER: HumanMessage,
+    ROLE_ASSISTANT: AIMessage,
+    ROLE_SYSTEM: SystemMessage,
+}
+
+
+def to_prompt_messages(records: Iterable[ChatRecord]) -> List[BaseMessage]:
+    """会話履歴をLLMに渡すメッセージリストに変換する"""
+    return [
+        _PROMPT_MESSAGE_CLASSES[record.role](content=record.content)
+        for record in records
+        if record.role in _PROMPT_MESSAGE_CLASSES
+    ]
 
 
 class AgentMemory:
@@ -10,65 +47,85 @@ class AgentMemory:
 
     def __init__(self):
         # セッション別のチャット履歴を管理
-        self.session_histories: Dict[str, ChatMessageHistory] = {}
-        self.session_memories: Dict[str, ConversationBufferMemory] = {}
-        self.file_contexts: Dict[
-            str, Dict[str, str]
-        ] = {}  # セッションごとのファイルコンテキスト
+        self.session_histories: Dict[str, List[ChatRecord]] = {}
+        self.session_sizes: Dict[str, int] = {}  # セッションごとの概算バイト数
 
-    def _get_or_create_session_history(self, session_id: str) -> ChatMessageHistory:
+    def _get_or_create_session_history(self, session_id: str) -> List[ChatRecord]:
         """セッション別のチャット履歴を取得または作成"""
-        if session_id not in self.session_histories:
-            self.session_histories[session_id] = ChatMessageHistory()
-            self.session_memories[session_id] = ConversationBufferMemory(
-                chat_memory=self.session_histories[session_id], return_messages=True
-            )
-        return self.session_histories[session_id]
+        history = self.session_histories.get(session_id)
+        if history is None:
+            history = self.session_histories[session_id] = []
+        return history
+
+    def _add_size(self, session_id: str, delta: int) -> None:
+        """セッションの概算バイト数を更新"""
+        self.session_sizes[session_id] = self.session_sizes.get(session_id, 0) + delta
 
     def add_user_message(self, session_id: str, message: str) -> None:
         """ユーザーメッセージをセッション別メモリに追加"""
-        chat_history = self._get_or_create_session_history(session_id)
-        chat_history.add_user_message(message)
+        self._get_or_create_session_history(session_id).append(
+            ChatRecord(ROLE_USER, message)
+        )
+        self._add_size(session_id, _text_size(message) + _RECORD_OVERHEAD_BYTES)
 
     def add_ai_message(self, session_id: str, message: str) -> None:
         """AIメッセージをセッション別メモリに追加"""
-        chat_history = self._get_or_create_session_history(session_id)
-        chat_history.add_ai_message(message)
-
-    def get_chat_history(self, session_id: str) -> List[Dict[str, Any]]:
-        """セッション別のチャット履歴を取得"""
-        chat_history = self._get_or_create_session_history(session_id)
-        messages = chat_history.messages
-
-        history = []
-        for msg in messages:
-            if isinstance(msg, HumanMessage):
-                history.append({"role": "user", "content": msg.content})
-            elif isinstance(msg, AIMessage):
-                history.append({"role": "assistant", "content": msg.content})
-            elif isinstance(msg, SystemMessage):
-                history.append({"role": "system", "content": msg.content})
+        self._get_or_create_session_history(session_id).append(
+            ChatRecord(ROLE_ASSISTANT, message)
+        )
+        self._add_size(session_id, _text_size(message) + _RECORD_OVERHEAD_BYTES)
 
-        return history
+    def get_chat_history(self, session_id: str) -> List[ChatRecord]:
+        """
+        セッション別のチャット履歴を取得
+
+        レコードは変換せずに共有し、リストのみコピーして返す。
+        """
+        return list(self._get_or_create_session_history(session_id))
+
+    def get_session_size(self, session_id: str) -> int:
+        """セッションの履歴の概算バイト数を取得"""
+        return self.session_sizes.get(session_id, 0)
+
+    def trim_session(self, session_id: str, max_bytes: int) -> int:
+        """
+        セッションの概算バイト数が上限以下になるまで古いターンから削除する
+
+        直近のターンは残す。
+
+        Args:
+            session_id: セッションID
+            max_bytes: セッションあたりの上限バイト数
+
+        Returns:
+            削除したメッセージ数
+        """
+        size = self.get_session_size(session_id)
+        if size <= max_bytes:
+            return 0
 
-    def add_file_context(self, session_id: str, file_id: str, context: str) -> None:
-        """ファイルコンテキストをセッション別に追加"""
-        if session_id not in self.file_contexts:
-            self.file_contexts[session_id] = {}
-        self.file_contexts[session_id][file_id] = context
+        # 古いターン（ユーザーとAIのメッセージ）から削除
+        # ターンの途中で切らないよう、先頭がユーザーメッセージになるまで続ける
+        history = self.session_histories.get(session_id, [])
+        removed_messages = 0
+        while len(history) - removed_messages > 2 and (
+            size > max_bytes
+            or (removed_messages and history[removed_messages].role != ROLE_USER)
+        ):
+            record = history[removed_messages]
+            size -= _text_size(record.content) + _RECORD_OVERHEAD_BYTES
+            removed_messages += 1
+        if removed_messages:
+            del history[:removed_messages]
 
-    def get_file_contexts(self, session_id: str) -> Dict[str, str]:
-        """セッションのファイルコンテキストを取得"""
-        return self.file_contexts.get(session_id, {})
+        self.session_sizes[session_id] = size
+        return removed_messages
 
     def clear_session(self, session_id: str) -> None:
         """セッションの履歴を完全にクリア"""
         if session_id in self.session_histories:
             del self.session_histories[session_id]
-        if session_id in self.session_memories:
-            del self.session_memories[session_id]
-        if session_id in self.file_contexts:
-            del self.file_contexts[session_id]
+        self.session_sizes.pop(session_id, None)
 
     def get_session_count(self) -> int:
         """アクティブなセッション数を取得"""
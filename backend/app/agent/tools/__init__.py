@@ -1,16 +1,42 @@
+from functools import lru_cache
+from importlib import import_module
 from typing import List
 
 from app.agent.tools.base import BaseAgentTool
-from app.agent.tools.document_checker import DocumentCheckerTool
-from app.agent.tools.file_processor import FileProcessorTool
-from app.agent.tools.web_search import WebSearchTool
+
+# ツール名と実装クラス（モジュールは最初に使用されるときにインポートする）
+_TOOL_REGISTRY = {
+    "web_search": "app.agent.tools.web_search:WebSearchTool",
+    "file_processor": "app.agent.tools.file_processor:FileProcessorTool",
+    "document_checker": "app.agent.tools.document_checker:DocumentCheckerTool",
+    "document_search": "app.agent.tools.document_search:DocumentSearchTool",
+    # 新しいツールはここに追加
+}
+
+
+def get_tool_names() -> List[str]:
+    """登録されているツール名のリストを取得"""
+    return list(_TOOL_REGISTRY)
+
+
+@lru_cache(maxsize=None)
+def get_tool(name: str) -> BaseAgentTool:
+    """
+    ツールのインスタンスを取得する（初回の呼び出し時に生成し、全セッションで共有する）
+
+    Args:
+        name: ツール名
+
+    Returns:
+        ツールのインスタンス
+    """
+    if name not in _TOOL_REGISTRY:
+        raise ValueError(f"登録されていないツールです: {name}")
+
+    module_name, class_name = _TOOL_REGISTRY[name].split(":")
+    return getattr(import_module(module_name), class_name)()
 
 
 def get_tools() -> List[BaseAgentTool]:
     """利用可能なツールのリストを取得"""
-    return [
-        WebSearchTool(),
-        FileProcessorTool(),
-        DocumentCheckerTool(),
-        # 新しいツールはここに追加
-    ]
+    return [get_tool(name) for name in _TOOL_REGISTRY]
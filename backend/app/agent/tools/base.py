@@ -1,4 +1,22 @@
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, ClassVar, Dict, Optional, Tuple
+
+from app.core.error_handler import ErrorSanitizer
+from app.services.tool_result_cache import get_tool_result_cache
+from app.services.upload_store import get_content_hash
 from langchain.tools import BaseTool
+from loguru import logger
+
+# エラーを表す出力の先頭（キャッシュしない）
+_ERROR_PREFIXES = ("エラー", "未対応", "対応していない")
+
+# キャッシュする出力中のファイル参照を置き換える文字列の区切り（Unicodeの私用領域）
+# アップロードごとのパス・ファイル名（file_idを含む）を他のセッションへ返さないようにする
+_FILE_REF_MARK = "\ue000"
 
 
 class BaseAgentTool(BaseTool):
@@ -8,6 +26,13 @@ class BaseAgentTool(BaseTool):
     name: str = "base_tool"
     description: str = "基本ツール"
 
+    # 実行結果のキャッシュ設定（同じ入力に対して常に同じ結果を返すツールのみ有効にする）
+    cacheable: ClassVar[bool] = False
+    # キャッシュの有効期間（秒、Noneの場合は設定値）
+    cache_ttl_seconds: ClassVar[Optional[float]] = None
+    # キャッシュキーの生成時にファイルの内容ハッシュへ置き換える入力項目
+    cache_file_fields: ClassVar[Tuple[str, ...]] = ()
+
     def _run(self, query: str) -> str:
         """ツール実行ロジック（同期）"""
         raise NotImplementedError("サブクラスでオーバーライドしてください")
@@ -16,3 +41,127 @@ class BaseAgentTool(BaseTool):
         """ツール実行ロジック（非同期）"""
         # デフォルトでは同期メソッドを呼び出す
         return self._run(query)
+
+    def execute(self, tool_input: Any) -> str:
+        """
+        ツールを実行する（キャッシュ可能なツールは共有キャッシュの結果を返す）
+
+        Args:
+            tool_input: ツールへの入力
+
+        Returns:
+            実行結果
+        """
+        if not self.cacheable:
+            return self._run(tool_input)
+
+        try:
+            key = self.cache_key(tool_input)
+        except Exception as e:
+            logger.warning(f"キャッシュキーの生成に失敗しました: {self.name}: {str(e)}")
+            key = None
+        if key is None:
+            return self._run(tool_input)
+
+        refs = self._file_refs(tool_input)
+        cache = get_tool_result_cache()
+        output = cache.get(self.name, key)
+        if output is not None:
+            logger.info(f"ツール実行結果のキャッシュを使用: {self.name}")
+            for placeholder, value in refs.items():
+                output = output.replace(placeholder, value)
+            return output
+
+        output = self._run(tool_input)
+        if self._is_cacheable_output(output):
+            shared = output
+            for placeholder, value in refs.items():
+                shared = shared.replace(value, placeholder)
+            cache.put(self.name, key, shared, self.cache_ttl_seconds)
+        return output
+
+    def _file_refs(self, tool_input: Any) -> Dict[str, str]:
+        """
+        出力中のファイル参照の置き換え文字列と、この呼び出しでの値の対応を取得する
+
+        キャッシュにはパス・ファイル名を置き換え文字列にした出力を保存し、
+        取り出すときに呼び出し元のアップロードの値へ戻す。
+
+        Args:
+            tool_input: ツールへの入力
+
+        Returns:
+            置き換え文字列とパス・ファイル名の対応（パスを先に置き換える順序）
+        """
+        inputs = _normalize_input(tool_input)
+        refs: Dict[str, str] = {}
+        if not isinstance(inputs, dict):
+            return refs
+
+        for field in self.cache_file_fields:
+            if inputs.get(field):
+                file_path = str(Path(inputs[field]))
+                refs[f"{_FILE_REF_MARK}{field}:path{_FILE_REF_MARK}"] = file_path
+                refs[f"{_FILE_REF_MARK}{field}:name{_FILE_REF_MARK}"] = (
+                    os.path.basename(file_path)
+                )
+        return refs
+
+    def cache_key(self, tool_input: Any) -> Optional[str]:
+        """
+        入力からキャッシュキーを生成する（Noneの場合はキャッシュしない）
+
+        ファイルを指定する項目は内容のハッシュに置き換えるため、同じ内容であれば
+        別のセッション・別のアップロードからの呼び出しでも同じキーになる。
+
+        Args:
+            tool_input: ツールへの入力
+
+        Returns:
+            キャッシュキー
+        """
+        inputs = _normalize_input(tool_input)
+        if isinstance(inputs, dict):
+            inputs = dict(inputs)
+            for field in self.cache_file_fields:
+                if not inputs.get(field):
+                    return None
+                file_path = str(Path(inputs[field]))
+                if not os.path.isfile(file_path):
+                    return None
+                inputs[field] = get_content_hash(file_path)
+
+        raw = json.dumps(
+            {"tool": self.name, "version": self.cache_version(), "input": inputs},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def cache_version(self) -> str:
+        """出力に影響する実装・設定の識別子（変わるとキャッシュが無効になる）"""
+        return ""
+
+    @staticmethod
+    def _is_cacheable_output(output: Any) -> bool:
+        """エラーを表す出力はキャッシュしない"""
+        return (
+            isinstance(output, str)
+            and bool(output)
+            and not output.startswith(_ERROR_PREFIXES)
+            and not ErrorSanitizer.is_sanitized_message(output)
+        )
+
+
+def _normalize_input(tool_input: Any) -> Any:
+    """JSON文字列の入力を辞書に変換（Windowsのパス区切りも許容）"""
+    if isinstance(tool_input, str):
+        text = tool_input.strip()
+        if text.startswith("{"):
+            try:
+                return json.loads(re.sub(r'(?<!\\)\\(?![\\"])', r"\\\\", text))
+            except json.JSONDecodeError:
+                pass
+        return text
+    return tool_input
@@ -2,12 +2,20 @@ import json
 import os
 import re
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
-import pandas as pd
 from app.agent.tools.base import BaseAgentTool
 from app.core.error_handler import ErrorSanitizer
+from app.core.settings import get_settings
 from loguru import logger
 
+if TYPE_CHECKING:
+    import pandas as pd
+    from app.services.excel_reader import ExcelSheet
+
+# シートの概要として渡すサンプル行数
+_SAMPLE_ROWS = 5
+
 
 class DocumentCheckerTool(BaseAgentTool):
     """ドキュメントチェックツール"""
@@ -15,6 +23,10 @@ class DocumentCheckerTool(BaseAgentTool):
     name: str = "document_checker"
     description: str = 'アップロードされたエクセルファイルの内容をチェックします。ファイルパスとチェックタイプ(content_check: 内容チェック, formal_check: 形式チェック, compliance_check: コンプライアンスチェック)を指定してください。例: {"file_path": "/path/to/file.xlsx", "operation": "content_check"}'
 
+    # 同じ内容のファイル・チェック種別では結果が変わらないため、セッション間で共有する
+    cacheable = True
+    cache_file_fields = ("file_path",)
+
     # チェック用のプロンプトテンプレート
     _check_prompts = {
         "content_check": """
@@ -31,7 +43,7 @@ class DocumentCheckerTool(BaseAgentTool):
 2. 表記統一：用語や表記が統一されているか
 3. 誤字脱字：誤字脱字がないか
 4. 文法：文法的に正しいか
-5. 数値確認：表内の数値が正確か、計算が合っているか
+5. 数値確認：自動チェックの結果を踏まえ、表内の数値が正確か、計算が合っているか
 """,
         "compliance_check": """
 以下の観点で、ドキュメントのコンプライアンスをチェックしてください：
@@ -43,6 +55,10 @@ class DocumentCheckerTool(BaseAgentTool):
 """,
     }
 
+    def cache_version(self) -> str:
+        """読み込む行数の上限が変わると結果が変わるため、キャッシュキーに含める"""
+        return str(get_settings().excel_max_rows_per_sheet)
+
     def _run(self, input_str: str) -> str:
         """
         ドキュメントチェックを実行する
@@ -88,33 +104,52 @@ class DocumentCheckerTool(BaseAgentTool):
             )
             return safe_message
 
+    @staticmethod
+    def _summarize_sheet(
+        sheet: "ExcelSheet", df: "pd.DataFrame", max_rows: Optional[int]
+    ) -> str:
+        """シートの行数・列・先頭数行のサンプルをまとめる"""
+        summary = f"[シート: {sheet.name}]\n"
+        summary += f"- レコード数: {len(df)}\n"
+        if sheet.truncated:
+            summary += f"- {max_rows}行を超えるため以降の行は省略しました\n"
+        if df.empty:
+            return summary + "- シートにデータがありません\n\n"
+
+        summary += f"- カラム: {', '.join(map(str, df.columns))}\n"
+        summary += f"- 先頭{min(len(df), _SAMPLE_ROWS)}行:\n"
+        return summary + df.head(_SAMPLE_ROWS).to_string() + "\n\n"
+
     def _check_document(self, file_path: str, operation: str) -> str:
         """エクセルドキュメントをチェック"""
-        try:
-            # Excelファイルを読み込む
-            excel = pd.ExcelFile(file_path)
-            sheet_names = excel.sheet_names
-
-            if not sheet_names:
-                return "エラー: エクセルファイルにシートが存在しません"
+        from app.services.document_rules import format_findings, run_checks
+        from app.services.excel_reader import open_excel
 
-            # 最初のシートのみを読み込む
-            first_sheet = sheet_names[0]
-            df = pd.read_excel(file_path, sheet_name=first_sheet)
+        try:
+            max_rows = get_settings().excel_max_rows_per_sheet or None
 
             # 基本情報の取得
             document_info = "ドキュメント基本情報:\n"
             document_info += f"- ファイル名: {os.path.basename(file_path)}\n"
-            document_info += f"- 処理シート名: {first_sheet}\n"
 
-            # データフレームが空でないか確認
-            if df.empty:
-                document_info += "- シートにデータがありません\n\n"
-                document_data = ""
-            else:
-                # シート内の全データを文字列として取得
-                document_data = "シート内の全データ:\n"
-                document_data += df.to_string() + "\n\n"
+            # 全シートを1回の読み込みで処理し、自動チェックの結果と概要のみを渡す
+            findings = {}
+            overviews = []
+            with open_excel(file_path, max_rows=max_rows) as sheets:
+                for sheet in sheets:
+                    df = sheet.read_frame()
+                    findings[sheet.name] = run_checks(df)
+                    overviews.append(self._summarize_sheet(sheet, df, max_rows))
+
+            if not findings:
+                return "エラー: エクセルファイルにシートが存在しません"
+
+            document_info += f"- シート数: {len(findings)}\n\n"
+            document_data = "シートの概要:\n" + "".join(overviews)
+            document_data += (
+                "自動チェックの結果（集計の検算・キーの重複・型と書式の一貫性・"
+                "必須セルの空欄・外れ値）:\n" + format_findings(findings) + "\n"
+            )
 
             # チェック種別に応じたプロンプトの取得
             if operation in self._check_prompts:
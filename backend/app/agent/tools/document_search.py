@@ -0,0 +1,183 @@
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.agent.tools.base import BaseAgentTool
+from app.agent.tools.file_processor import FileProcessorTool
+from app.core.error_handler import ErrorSanitizer
+from app.core.settings import get_settings
+from app.services.upload_store import get_content_hash
+from loguru import logger
+
+# 検索方式（keyword: BM25, semantic: ベクトル検索, hybrid: 両方の順位を統合）
+_SEARCH_MODES = ("keyword", "semantic", "hybrid")
+
+# Reciprocal Rank Fusionの順位に加える定数
+_RRF_K = 60
+
+
+class DocumentSearchTool(BaseAgentTool):
+    """ドキュメント検索ツール - 質問に関連する部分のみを返す"""
+
+    name: str = "document_search"
+    description: str = 'アップロードされたファイルから質問に関連する部分だけを検索して返します。大きなファイルでは全文読み取りの代わりに使用してください。ファイルパスと検索クエリ、必要に応じて件数(top_k)と検索方式(mode: keyword=キーワード検索, semantic=意味検索, hybrid=両方)を指定してください。例: {"file_path": "/path/to/file.pdf", "query": "契約期間", "top_k": 5, "mode": "keyword"}'
+
+    # 同じ内容のファイル・クエリでは結果が変わらないため、セッション間で共有する
+    cacheable = True
+    cache_file_fields = ("file_path",)
+
+    def cache_version(self) -> str:
+        """抽出・分割・埋め込みの設定が変わると結果が変わるため、キャッシュキーに含める"""
+        from app.services.embedding_service import get_embedding_model_id
+
+        settings = get_settings()
+        return (
+            f"{FileProcessorTool._extractor_version}:{settings.document_chunk_size}:"
+            f"{settings.document_chunk_overlap}:{settings.document_search_top_k}:"
+            f"{get_embedding_model_id()}"
+        )
+
+    def _run(self, input_str: str) -> str:
+        """
+        ドキュメント検索を実行する
+
+        Args:
+            input_str: JSON形式の入力。ファイルパスと検索クエリを含む
+
+        Returns:
+            関連度の高いチャンクの一覧
+        """
+        try:
+
+            def loads_with_windows_path(raw: str) -> dict:
+                fixed = re.sub(r'(?<!\\)\\(?![\\"])', r"\\\\", raw)
+                return json.loads(fixed)
+
+            inputs = (
+                loads_with_windows_path(input_str)
+                if isinstance(input_str, str)
+                else input_str
+            )
+            file_path = str(Path(inputs.get("file_path")))
+            query = str(inputs.get("query", "")).strip()
+            top_k = max(
+                1, int(inputs.get("top_k") or get_settings().document_search_top_k)
+            )
+            mode = inputs.get("mode") or "keyword"
+
+            if not file_path or not os.path.exists(file_path):
+                return "エラー: 有効なファイルパスを指定してください"
+
+            if not query:
+                return "エラー: 検索クエリを指定してください"
+
+            if not FileProcessorTool.supports(file_path):
+                file_ext = os.path.splitext(file_path)[1].lower()
+                return f"未対応のファイル形式です: {file_ext}"
+
+            if mode not in _SEARCH_MODES:
+                return f"エラー: 検索方式は{', '.join(_SEARCH_MODES)}のいずれかを指定してください"
+
+            # インデックスは内容と抽出器バージョンごとに1度だけ作成する
+            from app.services.document_index import get_document_index_cache
+
+            processor = FileProcessorTool()
+            index_key = f"{get_content_hash(file_path)}:{processor._extractor_version}"
+            index = get_document_index_cache().get_or_build(
+                index_key, lambda: processor.load(file_path)
+            )
+
+            if mode == "keyword":
+                results = index.search(query, top_k)
+            elif mode == "semantic":
+                results = self._semantic_search(index_key, index.chunks, query, top_k)
+            else:
+                results = self._fuse(
+                    [
+                        index.search(query, top_k * 2),
+                        self._semantic_search(
+                            index_key, index.chunks, query, top_k * 2
+                        ),
+                    ],
+                    top_k,
+                )
+            if not results:
+                return f"「{query}」に関連する箇所は見つかりませんでした（全{len(index.chunks)}チャンク）"
+
+            file_name = os.path.basename(file_path)
+            parts = [
+                f"# 検索結果: {file_name}\n"
+                f"クエリ: {query}（全{len(index.chunks)}チャンク中 上位{len(results)}件）\n"
+            ]
+            for rank, (chunk_id, score) in enumerate(results, 1):
+                parts.append(
+                    f"\n## {rank}. チャンク {chunk_id + 1} (スコア: {score:.3f})\n\n"
+                    f"{index.chunks[chunk_id]}\n"
+                )
+            return "".join(parts)
+
+        except Exception as e:
+            logger.error(f"ドキュメント検索エラー: {str(e)}")
+            safe_message = ErrorSanitizer.sanitize_error_message(
+                str(e), "file_processing"
+            )
+            return safe_message
+
+    @staticmethod
+    def _semantic_search(
+        index_key: str, chunks: List[str], query: str, top_k: int
+    ) -> List[Tuple[int, float]]:
+        """
+        チャンクの埋め込みとクエリの類似度で検索する
+
+        Args:
+            index_key: ドキュメントのインデックスキー
+            chunks: チャンクのリスト
+            query: 検索クエリ
+            top_k: 返すチャンク数
+
+        Returns:
+            (チャンク番号, スコア) のリスト（スコアの高い順）
+        """
+        from app.services.embedding_service import (
+            embed_texts,
+            get_cached_embeddings,
+            get_embedding_model_id,
+        )
+        from app.services.vector_index import get_vector_index_store
+
+        embeddings = get_cached_embeddings()
+        store = get_vector_index_store()
+        vector_index = store.get_or_build(
+            store.make_key(index_key, get_embedding_model_id()),
+            lambda: embed_texts(embeddings, chunks),
+            len(chunks),
+        )
+        query_vector = embed_texts(embeddings, [query])
+        return [
+            (chunk_id, score)
+            for chunk_id, score in vector_index.search(query_vector, top_k)
+            if score > 0
+        ]
+
+    @staticmethod
+    def _fuse(
+        rankings: List[List[Tuple[int, float]]], top_k: int
+    ) -> List[Tuple[int, float]]:
+        """
+        複数の検索結果をReciprocal Rank Fusionで統合する
+
+        Args:
+            rankings: 検索方式ごとの (チャンク番号, スコア) のリスト
+            top_k: 返すチャンク数
+
+        Returns:
+            (チャンク番号, 統合スコア) のリスト（スコアの高い順）
+        """
+        fused: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, (chunk_id, _) in enumerate(ranking, 1):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (_RRF_K + rank)
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
@@ -2,21 +2,71 @@ import json
 import os
 import re
 from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
-import pandas as pd
-import pdfplumber
 from app.agent.tools.base import BaseAgentTool
 from app.core.error_handler import ErrorSanitizer
-from docx import Document
+from app.core.settings import get_settings
+from app.services.extraction_cache import get_extraction_cache
+from app.services.extraction_service import get_pending_extraction
+from app.services.parser_pool import get_parser_pool
+from app.services.upload_store import get_content_hash
 from loguru import logger
-from pptx import Presentation
+
+# 解析ライブラリ（pandas・pdfplumber等）は読み込みに時間がかかるため、
+# 起動を速くするよう該当する形式のファイルを初めて処理するときにインポートする
+
+# 抽出器が1セクションとして返すテキストの文字数と表の行数
+_TEXT_BLOCK_CHARS = 64 * 1024
+_TABLE_BLOCK_ROWS = 1000
+
+# ファイル拡張子と抽出メソッドの対応
+_EXTRACTORS = {
+    ".pdf": "_process_pdf",
+    ".docx": "_process_docx",
+    ".pptx": "_process_pptx",
+    ".md": "_process_markdown",
+    ".csv": "_process_csv",
+    ".txt": "_process_text",
+    ".xlsx": "_process_excel",
+    ".xls": "_process_excel",
+    ".json": "_process_json",
+}
+
+# 統計プロファイルに対応するファイル拡張子とメソッドの対応
+_PROFILERS = {
+    ".csv": "_profile_csv",
+    ".xlsx": "_profile_excel",
+    ".xls": "_profile_excel",
+}
+
+# プロファイル作成時に1度に読み込む行数
+_PROFILE_BLOCK_ROWS = 50000
+
+# 範囲指定（セレクター）と対応するファイル拡張子
+_SELECTORS = {
+    "pages": {".pdf"},
+    "slides": {".pptx"},
+    "sheets": {".xlsx", ".xls"},
+    "rows": {".csv", ".xlsx", ".xls"},
+}
+
+# 範囲指定で一度に指定できる番号の最大数
+_MAX_SELECTED_NUMBERS = 10000
+
+
+class SelectionError(ValueError):
+    """範囲指定が不正な場合の例外"""
 
 
 class FileProcessorTool(BaseAgentTool):
     """ファイル処理ツール - 全文読み取り対応"""
 
     name: str = "file_processor"
-    description: str = 'アップロードされたファイルの内容を全文読み取りします。ファイルパスを指定してください。例: {"file_path": "/path/to/file.pdf"}'
+    description: str = 'アップロードされたファイルの内容を全文読み取りします。ファイルパスを指定してください。必要な部分だけを読む場合は、pages（PDFのページ）、slides（PowerPointのスライド）、sheets（Excelのシート名または番号）、rows（CSV・Excelのデータ行）を"1-3,5"のように1始まりで指定でき、max_charsで最大文字数を指定できます。CSV・Excelの大きな表は"mode": "profile"を指定すると、全行の代わりに列ごとの統計量と代表サンプルを返します。例: {"file_path": "/path/to/file.pdf"}, {"file_path": "/path/to/file.pdf", "pages": "3"}, {"file_path": "/path/to/book.xlsx", "sheets": ["売上"], "rows": "1-100"}, {"file_path": "/path/to/data.csv", "mode": "profile"}'
+
+    # 抽出処理のバージョン（出力形式を変更したら更新し、キャッシュを無効化する）
+    _extractor_version = "5"
 
     def _run(self, input_str: str) -> str:
         """
@@ -40,6 +90,8 @@ class FileProcessorTool(BaseAgentTool):
                 else input_str
             )
             file_path = str(Path(inputs.get("file_path")))
+            mode = inputs.get("mode") or "full"
+            max_chars = int(inputs["max_chars"]) if inputs.get("max_chars") else None
 
             if not file_path or not os.path.exists(file_path):
                 return "エラー: 有効なファイルパスを指定してください"
@@ -48,25 +100,24 @@ class FileProcessorTool(BaseAgentTool):
             file_ext = os.path.splitext(file_path)[1].lower()
 
             # ファイルタイプに応じた処理
-            if file_ext == ".pdf":
-                return self._process_pdf(file_path)
-            elif file_ext == ".docx":
-                return self._process_docx(file_path)
-            elif file_ext == ".pptx":
-                return self._process_pptx(file_path)
-            elif file_ext == ".md":
-                return self._process_markdown(file_path)
-            elif file_ext == ".csv":
-                return self._process_csv(file_path)
-            elif file_ext == ".txt":
-                return self._process_text(file_path)
-            elif file_ext in [".xlsx", ".xls"]:
-                return self._process_excel(file_path)
-            elif file_ext == ".json":
-                return self._process_json(file_path)
-            else:
+            if not self.supports(file_path):
                 return f"未対応のファイル形式です: {file_ext}"
 
+            selection = _parse_selection(inputs, file_ext)
+
+            if mode == "profile":
+                if file_ext not in _PROFILERS:
+                    return f"統計プロファイルはCSV・Excelファイルのみ対応しています: {file_ext}"
+                return self.profile(file_path, selection)
+
+            # 範囲や文字数の指定がある場合は、指定された部分のみを抽出する
+            if selection or max_chars:
+                return self.extract(file_path, max_chars, selection)
+
+            return self.load(file_path)
+
+        except SelectionError as e:
+            return f"エラー: {str(e)}"
         except Exception as e:
             logger.error(f"ファイル処理エラー: {str(e)}")
             safe_message = ErrorSanitizer.sanitize_error_message(
@@ -74,48 +125,277 @@ class FileProcessorTool(BaseAgentTool):
             )
             return safe_message
 
-    def _process_pdf(self, file_path: str) -> str:
+    @staticmethod
+    def supports(file_path: str) -> bool:
+        """抽出に対応しているファイル形式か判定"""
+        return os.path.splitext(file_path)[1].lower() in _EXTRACTORS
+
+    def load(self, file_path: str) -> str:
+        """
+        全文の抽出結果を取得する（バックグラウンド抽出が実行中であれば完了を待つ）
+
+        Args:
+            file_path: ファイルパス（対応形式であること）
+
+        Returns:
+            抽出済みテキスト
+        """
+        # アップロード時に開始した抽出が実行中であれば完了を待つ
+        pending = get_pending_extraction(file_path)
+        if pending is not None:
+            logger.info(
+                f"バックグラウンド抽出の完了を待機: {os.path.basename(file_path)}"
+            )
+            return pending.result()
+
+        return self.extract(file_path)
+
+    def extract(
+        self,
+        file_path: str,
+        max_chars: Optional[int] = None,
+        selection: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """
+        抽出結果のキャッシュを確認し、なければ抽出してキャッシュに保存する
+
+        Args:
+            file_path: ファイルパス（対応形式であること）
+            max_chars: 抽出する最大文字数（省略時は全文）
+            selection: ページ・スライド・シート・行の範囲指定（省略時は全体）
+
+        Returns:
+            抽出済みテキスト
+        """
+        file_ext = os.path.splitext(file_path)[1].lower()
+        options = {"file_type": file_ext, "max_chars": max_chars}
+        args: List[Any] = [max_chars]
+        if selection:
+            options["selection"] = selection
+            args.append(selection)
+
+        # 解析はAPIプロセスをブロックしないよう専用のプロセスプールで実行
+        if file_ext == ".pdf" and max_chars is None and not selection:
+            return self._cached(
+                file_path, options, self._extract_pdf_parallel, file_path
+            )
+        return self._cached(
+            file_path,
+            options,
+            get_parser_pool().run,
+            _run_extractor,
+            _EXTRACTORS[file_ext],
+            file_path,
+            *args,
+        )
+
+    def profile(
+        self, file_path: str, selection: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        CSV・Excelの統計プロファイルを作成する（結果は抽出結果と同様にキャッシュする）
+
+        Args:
+            file_path: ファイルパス（CSVまたはExcelであること）
+            selection: シート・行の範囲指定（省略時は全体）
+
+        Returns:
+            列ごとの統計量と代表サンプル
+        """
+        file_ext = os.path.splitext(file_path)[1].lower()
+        options: Dict[str, Any] = {"file_type": file_ext, "mode": "profile"}
+        if selection:
+            options["selection"] = selection
+        return self._cached(
+            file_path,
+            options,
+            get_parser_pool().run,
+            _run_extractor,
+            _PROFILERS[file_ext],
+            file_path,
+            selection,
+        )
+
+    def _cached(
+        self,
+        file_path: str,
+        options: dict,
+        compute: Callable[..., str],
+        *args: Any,
+    ) -> str:
+        """
+        抽出結果のキャッシュを確認し、なければ計算してキャッシュに保存する
+
+        Args:
+            file_path: ファイルパス
+            options: 抽出オプション（キャッシュキーに含める）
+            compute: 抽出結果を計算する関数
+            *args: 関数の引数
+
+        Returns:
+            抽出済みテキスト
+        """
+        cache = get_extraction_cache()
+        content_hash = get_content_hash(file_path)
+
+        cached = cache.get(content_hash, self._extractor_version, options)
+        if cached is not None:
+            logger.info(f"抽出キャッシュを使用: {os.path.basename(file_path)}")
+            return cached
+
+        content = compute(*args)
+        cache.put(content_hash, self._extractor_version, options, content)
+        return content
+
+    def _extract_pdf_parallel(self, file_path: str) -> str:
+        """
+        ページ数の多いPDFをページ範囲ごとに分割し、複数プロセスで並列に抽出する
+
+        Args:
+            file_path: PDFファイルのパス
+
+        Returns:
+            ページ順に連結した抽出結果
+        """
+        settings = get_settings()
+        pool = get_parser_pool()
+
+        page_count = pool.run(_count_pdf_pages, file_path)
+        if page_count < settings.pdf_parallel_page_threshold or pool.size <= 1:
+            return pool.run(_run_extractor, "_process_pdf", file_path)
+
+        pages_per_job = max(1, settings.pdf_pages_per_job)
+        ranges = [
+            (start, min(start + pages_per_job, page_count))
+            for start in range(0, page_count, pages_per_job)
+        ]
+        logger.info(
+            f"PDFを{len(ranges)}分割して並列抽出: {os.path.basename(file_path)} ({page_count}ページ)"
+        )
+
+        parts = pool.map(
+            _run_extractor,
+            [("_process_pdf_pages", file_path, start, end) for start, end in ranges],
+        )
+        return self._format_pdf_content("".join(parts))
+
+    @staticmethod
+    def _collect_sections(
+        sections: Iterator[str], max_chars: Optional[int] = None
+    ) -> str:
+        """
+        抽出器が返すセクションを順に読み込み、最後に1回だけ連結する
+
+        上限に達した時点で抽出器を停止するため、残りの部分は解析されない。
+
+        Args:
+            sections: セクション（ページ、スライド、シート、テーブルなど）のイテレータ
+            max_chars: 最大文字数（省略時は全セクション）
+
+        Returns:
+            連結したテキスト
+        """
+        parts: List[str] = []
+        total = 0
+
+        for section in sections:
+            if max_chars is not None and total + len(section) > max_chars:
+                parts.append(section[: max_chars - total])
+                parts.append(f"\n\n...（{max_chars}文字で打ち切りました）\n")
+                sections.close()
+                break
+            parts.append(section)
+            total += len(section)
+
+        return "".join(parts)
+
+    def _process_pdf(
+        self,
+        file_path: str,
+        max_chars: Optional[int] = None,
+        selection: Optional[Dict[str, Any]] = None,
+    ) -> str:
         """PDFファイルを処理"""
-        try:
-            content = "=== PDFファイル内容 ===\n\n"
+        page_numbers = (selection or {}).get("pages")
+        return self._format_pdf_content(
+            self._collect_sections(
+                self._iter_pdf_sections(file_path, page_numbers=page_numbers),
+                max_chars,
+            )
+        )
+
+    def _format_pdf_content(self, pages_content: str) -> str:
+        """ページごとの抽出結果にヘッダーを付与"""
+        if not pages_content.strip():
+            return "PDFからテキストを抽出できませんでした"
+        return "=== PDFファイル内容 ===\n\n" + pages_content
+
+    def _process_pdf_pages(
+        self, file_path: str, start: int = 0, end: Optional[int] = None
+    ) -> str:
+        """PDFの指定ページ範囲を処理（startは0始まり、endは含まない）"""
+        return self._collect_sections(self._iter_pdf_sections(file_path, start, end))
+
+    def _iter_pdf_sections(
+        self,
+        file_path: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        page_numbers: Optional[List[int]] = None,
+    ) -> Iterator[str]:
+        """PDFのページとテーブルをセクションとして順に返す（page_numbersは1始まり）"""
+        import pdfplumber
 
+        try:
             with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
+                if page_numbers is None:
+                    targets = enumerate(pdf.pages[start:end], start + 1)
+                else:
+                    # 指定ページのみ解析する
+                    missing = [n for n in page_numbers if n > len(pdf.pages)]
+                    if missing:
+                        yield _missing_note("ページ", missing, len(pdf.pages))
+                    targets = (
+                        (n, pdf.pages[n - 1])
+                        for n in page_numbers
+                        if n <= len(pdf.pages)
+                    )
+
+                for page_num, page in targets:
                     text = page.extract_text()
                     if text and text.strip():
-                        content += f"--- ページ {page_num} ---\n"
-                        content += text.strip() + "\n\n"
+                        yield f"--- ページ {page_num} ---\n{text.strip()}\n\n"
 
                     # テーブルがある場合は抽出
                     tables = page.extract_tables()
                     for table_num, table in enumerate(tables, 1):
                         if table:
-                            content += f"[ページ {page_num} - テーブル {table_num}]\n"
-                            for row in table:
-                                if row:
-                                    content += (
-                                        " | ".join([cell or "" for cell in row]) + "\n"
-                                    )
-                            content += "\n"
-
-            return (
-                content
-                if content.strip() != "=== PDFファイル内容 ==="
-                else "PDFからテキストを抽出できませんでした"
-            )
+                            yield _format_table(
+                                f"[ページ {page_num} - テーブル {table_num}]",
+                                (
+                                    " | ".join([cell or "" for cell in row])
+                                    for row in table
+                                    if row
+                                ),
+                            )
 
         except Exception as e:
             logger.error(f"PDF処理エラー: {str(e)}")
-            safe_message = ErrorSanitizer.sanitize_error_message(
-                str(e), "file_processing"
-            )
-            return safe_message
+            raise
 
-    def _process_docx(self, file_path: str) -> str:
+    def _process_docx(self, file_path: str, max_chars: Optional[int] = None) -> str:
         """Wordファイルを処理"""
+        content = self._collect_sections(self._iter_docx_sections(file_path), max_chars)
+        if not content.strip():
+            return "Wordファイルからテキストを抽出できませんでした"
+        return "=== Wordファイル内容 ===\n\n" + content
+
+    def _iter_docx_sections(self, file_path: str) -> Iterator[str]:
+        """Wordの段落とテーブルをセクションとして順に返す"""
+        from docx import Document
+
         try:
             doc = Document(file_path)
-            content = "=== Wordファイル内容 ===\n\n"
 
             for paragraph in doc.paragraphs:
                 if paragraph.text.strip():
@@ -123,175 +403,440 @@ class FileProcessorTool(BaseAgentTool):
                     if paragraph.style.name.startswith("Heading"):
                         level = paragraph.style.name.replace("Heading ", "")
                         if level.isdigit():
-                            content += "#" * int(level) + " " + paragraph.text + "\n\n"
+                            yield "#" * int(level) + " " + paragraph.text + "\n\n"
                         else:
-                            content += "# " + paragraph.text + "\n\n"
+                            yield "# " + paragraph.text + "\n\n"
                     else:
-                        content += paragraph.text + "\n\n"
+                        yield paragraph.text + "\n\n"
 
             # テーブルの処理
             for table_num, table in enumerate(doc.tables, 1):
-                content += f"[テーブル {table_num}]\n"
-                for row in table.rows:
-                    row_text = " | ".join([cell.text.strip() for cell in row.cells])
-                    if row_text.strip():
-                        content += row_text + "\n"
-                content += "\n"
-
-            return (
-                content
-                if content.strip() != "=== Wordファイル内容 ==="
-                else "Wordファイルからテキストを抽出できませんでした"
-            )
+                yield _format_table(
+                    f"[テーブル {table_num}]",
+                    (
+                        " | ".join([cell.text.strip() for cell in row.cells])
+                        for row in table.rows
+                    ),
+                )
 
         except Exception as e:
             logger.error(f"Word処理エラー: {str(e)}")
-            safe_message = ErrorSanitizer.sanitize_error_message(
-                str(e), "file_processing"
-            )
-            return safe_message
-
-    def _process_pptx(self, file_path: str) -> str:
+            raise
+
+    def _process_pptx(
+        self,
+        file_path: str,
+        max_chars: Optional[int] = None,
+        selection: Optional[Dict[str, Any]] = None,
+    ) -> str:
         """PowerPointファイルを処理"""
+        slide_numbers = (selection or {}).get("slides")
+        content = self._collect_sections(
+            self._iter_pptx_sections(file_path, slide_numbers), max_chars
+        )
+        if not content.strip():
+            return "PowerPointファイルからテキストを抽出できませんでした"
+        return "=== PowerPointファイル内容 ===\n\n" + content
+
+    def _iter_pptx_sections(
+        self, file_path: str, slide_numbers: Optional[List[int]] = None
+    ) -> Iterator[str]:
+        """PowerPointのスライドをセクションとして順に返す（slide_numbersは1始まり）"""
+        from pptx import Presentation
+
         try:
             prs = Presentation(file_path)
-            content = "=== PowerPointファイル内容 ===\n\n"
 
-            for slide_num, slide in enumerate(prs.slides, 1):
-                content += f"--- スライド {slide_num} ---\n"
+            slides = prs.slides
+            if slide_numbers is None:
+                targets = enumerate(slides, 1)
+            else:
+                missing = [n for n in slide_numbers if n > len(slides)]
+                if missing:
+                    yield _missing_note("スライド", missing, len(slides))
+                targets = (
+                    (n, slides[n - 1]) for n in slide_numbers if n <= len(slides)
+                )
+
+            for slide_num, slide in targets:
+                parts = [f"--- スライド {slide_num} ---\n"]
 
                 for shape in slide.shapes:
                     if hasattr(shape, "text") and shape.text.strip():
                         # タイトルかどうかの判定
                         if shape == slide.shapes.title:
-                            content += f"# {shape.text}\n\n"
+                            parts.append(f"# {shape.text}\n\n")
                         else:
-                            content += f"{shape.text}\n\n"
+                            parts.append(f"{shape.text}\n\n")
 
                     # テーブルの処理
                     if shape.has_table:
-                        content += "[テーブル]\n"
-                        table = shape.table
-                        for row in table.rows:
-                            row_text = " | ".join(
-                                [cell.text.strip() for cell in row.cells]
+                        parts.append(
+                            _format_table(
+                                "[テーブル]",
+                                (
+                                    " | ".join(
+                                        [cell.text.strip() for cell in row.cells]
+                                    )
+                                    for row in shape.table.rows
+                                ),
                             )
-                            if row_text.strip():
-                                content += row_text + "\n"
-                        content += "\n"
-
-                content += "\n"
+                        )
 
-            return (
-                content
-                if content.strip() != "=== PowerPointファイル内容 ==="
-                else "PowerPointファイルからテキストを抽出できませんでした"
-            )
+                parts.append("\n")
+                yield "".join(parts)
 
         except Exception as e:
             logger.error(f"PowerPoint処理エラー: {str(e)}")
-            safe_message = ErrorSanitizer.sanitize_error_message(
-                str(e), "file_processing"
-            )
-            return safe_message
+            raise
 
-    def _process_markdown(self, file_path: str) -> str:
+    def _process_markdown(self, file_path: str, max_chars: Optional[int] = None) -> str:
         """Markdownファイルを処理"""
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
+        # Markdownの構造をそのまま保持
+        return "=== Markdownファイル内容 ===\n\n" + self._collect_sections(
+            self._iter_text_sections(file_path, "Markdown"), max_chars
+        )
 
-            # Markdownの構造をそのまま保持
-            result = "=== Markdownファイル内容 ===\n\n"
-            result += content
+    def _process_text(self, file_path: str, max_chars: Optional[int] = None) -> str:
+        """テキストファイルを処理"""
+        return "=== テキストファイル内容 ===\n\n" + self._collect_sections(
+            self._iter_text_sections(file_path, "テキスト"), max_chars
+        )
 
-            return result
+    def _iter_text_sections(self, file_path: str, label: str) -> Iterator[str]:
+        """テキストファイルを一定サイズのブロックごとに返す"""
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                while block := f.read(_TEXT_BLOCK_CHARS):
+                    yield block
 
         except Exception as e:
-            logger.error(f"Markdown処理エラー: {str(e)}")
-            safe_message = ErrorSanitizer.sanitize_error_message(
-                str(e), "file_processing"
-            )
-            return safe_message
-
-    def _process_csv(self, file_path: str) -> str:
+            logger.error(f"{label}処理エラー: {str(e)}")
+            raise
+
+    def _process_csv(
+        self,
+        file_path: str,
+        max_chars: Optional[int] = None,
+        selection: Optional[Dict[str, Any]] = None,
+    ) -> str:
         """CSVファイルを処理"""
+        rows = (selection or {}).get("rows")
+        return "=== CSVファイル内容 ===\n\n" + self._collect_sections(
+            self._iter_csv_sections(file_path, rows), max_chars
+        )
+
+    def _iter_csv_sections(
+        self, file_path: str, rows: Optional[List[Optional[int]]] = None
+    ) -> Iterator[str]:
+        """CSVを一定行数のブロックごとに読み込んで返す"""
         try:
-            df = pd.read_csv(file_path)
+            record_count = 0
+            with _read_csv_blocks(file_path, _TABLE_BLOCK_ROWS, rows) as reader:
+                for block_num, df in enumerate(reader):
+                    if block_num == 0:
+                        yield f"カラム数: {len(df.columns)}\n"
+                        if rows:
+                            yield f"表示範囲: {_format_row_range(rows)}\n"
+                        yield "\n"
+                    record_count += len(df)
 
-            content = "=== CSVファイル内容 ===\n\n"
-            content += f"レコード数: {len(df)}\n"
-            content += f"カラム数: {len(df.columns)}\n\n"
+                    # 全データをタブ区切りで出力
+                    yield _format_table_block(df, header=block_num == 0)
 
-            # 全データを表形式で出力
-            content += df.to_string(index=False)
-
-            return content
+            yield f"\nレコード数: {record_count}\n"
 
         except Exception as e:
             logger.error(f"CSV処理エラー: {str(e)}")
-            safe_message = ErrorSanitizer.sanitize_error_message(
-                str(e), "file_processing"
-            )
-            return safe_message
-
-    def _process_text(self, file_path: str) -> str:
-        """テキストファイルを処理"""
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
+            raise
+
+    def _process_excel(
+        self,
+        file_path: str,
+        max_chars: Optional[int] = None,
+        selection: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Excelファイルを処理"""
+        return "=== Excelファイル内容 ===\n\n" + self._collect_sections(
+            self._iter_excel_sections(file_path, selection or {}), max_chars
+        )
 
-            result = "=== テキストファイル内容 ===\n\n"
-            result += content
+    def _iter_excel_sections(
+        self, file_path: str, selection: Dict[str, Any]
+    ) -> Iterator[str]:
+        """Excelのシートを一定行数のブロックごとに返す"""
+        from app.services.excel_reader import open_excel
 
-            return result
+        try:
+            max_rows = get_settings().excel_max_rows_per_sheet or None
+            rows = selection.get("rows")
+
+            # ブックは1回だけ開き、指定されたシートの行のみをストリーミングで読み込む
+            with open_excel(
+                file_path,
+                _TABLE_BLOCK_ROWS,
+                max_rows,
+                sheets=selection.get("sheets"),
+                rows=rows,
+            ) as sheets:
+                sheet_count = 0
+                for sheet in sheets:
+                    sheet_count += 1
+                    yield (
+                        f"--- シート: {sheet.name} ---\n"
+                        f"カラム数: {len(sheet.columns)}\n"
+                    )
+                    if rows:
+                        yield f"表示範囲: {_format_row_range(rows)}\n"
+                    yield "\n"
+
+                    # 全データをタブ区切りで出力
+                    for block_num, df in enumerate(sheet.iter_blocks()):
+                        yield _format_table_block(df, header=block_num == 0)
+
+                    yield f"\nレコード数: {sheet.row_count}\n"
+                    if sheet.truncated:
+                        yield f"（{max_rows}行を超えるため以降の行は省略しました）\n"
+                    yield "\n"
+
+                if sheet_count == 0:
+                    yield f"指定されたシートが見つかりません: {', '.join(selection['sheets'])}\n"
 
         except Exception as e:
-            logger.error(f"テキスト処理エラー: {str(e)}")
-            safe_message = ErrorSanitizer.sanitize_error_message(
-                str(e), "file_processing"
-            )
-            return safe_message
+            logger.error(f"Excel処理エラー: {str(e)}")
+            raise
+
+    def _profile_csv(
+        self, file_path: str, selection: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """CSVファイルの統計プロファイルを作成"""
+        from app.services.table_profile import TableProfiler
 
-    def _process_excel(self, file_path: str) -> str:
-        """Excelファイルを処理"""
         try:
-            excel = pd.ExcelFile(file_path)
-            content = "=== Excelファイル内容 ===\n\n"
+            profiler = TableProfiler()
+            rows = (selection or {}).get("rows")
+            with _read_csv_blocks(file_path, _PROFILE_BLOCK_ROWS, rows) as reader:
+                for df in reader:
+                    profiler.update(df)
+            return "=== CSVファイル プロファイル ===\n\n" + profiler.render()
 
-            for sheet_name in excel.sheet_names:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                content += f"--- シート: {sheet_name} ---\n"
-                content += f"レコード数: {len(df)}\n"
-                content += f"カラム数: {len(df.columns)}\n\n"
+        except Exception as e:
+            logger.error(f"CSVプロファイル作成エラー: {str(e)}")
+            raise
 
-                # 全データを表形式で出力
-                content += df.to_string(index=False)
-                content += "\n\n"
+    def _profile_excel(
+        self, file_path: str, selection: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Excelファイルの統計プロファイルをシートごとに作成"""
+        from app.services.excel_reader import open_excel
+        from app.services.table_profile import TableProfiler
 
-            return content
+        try:
+            selection = selection or {}
+            parts = ["=== Excelファイル プロファイル ===\n\n"]
+            with open_excel(
+                file_path,
+                _PROFILE_BLOCK_ROWS,
+                sheets=selection.get("sheets"),
+                rows=selection.get("rows"),
+            ) as sheets:
+                for sheet in sheets:
+                    profiler = TableProfiler()
+                    for df in sheet.iter_blocks():
+                        profiler.update(df)
+                    parts.append(f"--- シート: {sheet.name} ---\n")
+                    parts.append(profiler.render() + "\n")
+            return "".join(parts)
 
         except Exception as e:
-            logger.error(f"Excel処理エラー: {str(e)}")
-            safe_message = ErrorSanitizer.sanitize_error_message(
-                str(e), "file_processing"
-            )
-            return safe_message
+            logger.error(f"Excelプロファイル作成エラー: {str(e)}")
+            raise
 
-    def _process_json(self, file_path: str) -> str:
+    def _process_json(self, file_path: str, max_chars: Optional[int] = None) -> str:
         """JSONファイルを処理"""
+        return "=== JSONファイル内容 ===\n\n" + self._collect_sections(
+            self._iter_json_sections(file_path), max_chars
+        )
+
+    def _iter_json_sections(self, file_path: str) -> Iterator[str]:
+        """JSONを整形しながら一定サイズのブロックごとに返す"""
         try:
             with open(file_path, "r", encoding="utf-8") as f:
                 data = json.load(f)
 
-            content = "=== JSONファイル内容 ===\n\n"
-            content += json.dumps(data, indent=2, ensure_ascii=False)
-
-            return content
+            encoder = json.JSONEncoder(indent=2, ensure_ascii=False)
+            parts: List[str] = []
+            size = 0
+            for chunk in encoder.iterencode(data):
+                parts.append(chunk)
+                size += len(chunk)
+                if size >= _TEXT_BLOCK_CHARS:
+                    yield "".join(parts)
+                    parts, size = [], 0
+            if parts:
+                yield "".join(parts)
 
         except Exception as e:
             logger.error(f"JSON処理エラー: {str(e)}")
-            safe_message = ErrorSanitizer.sanitize_error_message(
-                str(e), "file_processing"
+            raise
+
+
+def _format_table(title: str, rows: Iterable[str]) -> str:
+    """テーブルのタイトルと行を1つのセクションにまとめる"""
+    lines = [title]
+    lines.extend(row for row in rows if row.strip())
+    return "\n".join(lines) + "\n\n"
+
+
+def _run_extractor(extractor_name: str, file_path: str, *args: Any) -> str:
+    """解析ワーカープロセスで抽出メソッドを実行する"""
+    return getattr(FileProcessorTool(), extractor_name)(file_path, *args)
+
+
+def _count_pdf_pages(file_path: str) -> int:
+    """解析ワーカープロセスでPDFのページ数を取得する"""
+    import pdfplumber
+
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def _parse_numbers(value: Any, name: str) -> List[int]:
+    """ "1-3,5" や [1, 2] のような番号の指定を、重複のない昇順のリストに変換"""
+    items = value if isinstance(value, list) else str(value).split(",")
+    numbers = set()
+    for item in items:
+        text = str(item).strip()
+        if not text:
+            continue
+
+        first_text, _, last_text = text.partition("-")
+        try:
+            first = int(first_text)
+            last = int(last_text) if last_text.strip() else first
+        except ValueError:
+            raise SelectionError(
+                f'{name}は1始まりの番号で "1-3,5" のように指定してください: {value}'
             )
-            return safe_message
+        if first < 1 or last < first:
+            raise SelectionError(f"{name}の範囲が不正です: {text}")
+        if len(numbers) + last - first >= _MAX_SELECTED_NUMBERS:
+            raise SelectionError(
+                f"{name}は{_MAX_SELECTED_NUMBERS}件以内で指定してください"
+            )
+        numbers.update(range(first, last + 1))
+
+    if not numbers:
+        raise SelectionError(f"{name}を指定してください")
+    return sorted(numbers)
+
+
+def _parse_row_range(value: Any) -> List[Optional[int]]:
+    """ "100-200"・"100-"・[100, 200]・100 のような行範囲の指定を [開始, 終了] に変換"""
+    try:
+        if isinstance(value, list):
+            start, end = (value + [None])[:2] if len(value) == 1 else value
+        elif isinstance(value, int):
+            start = end = value
+        else:
+            first, _, last = str(value).partition("-")
+            start = first.strip()
+            end = last.strip() if "-" in str(value) else first.strip()
+        start = int(start)
+        end = int(end) if end not in (None, "") else None
+    except (TypeError, ValueError):
+        raise SelectionError(
+            f'rowsは1始まりの行番号で "1-100" のように指定してください: {value}'
+        )
+    if start < 1 or (end is not None and end < start):
+        raise SelectionError(f"rowsの範囲が不正です: {value}")
+    return [start, end]
+
+
+def _parse_selection(inputs: Dict[str, Any], file_ext: str) -> Dict[str, Any]:
+    """
+    ツール入力から範囲指定を取り出し、ファイル形式に対応しているか検証する
+
+    Args:
+        inputs: ツールの入力
+        file_ext: ファイル拡張子
+
+    Returns:
+        正規化した範囲指定（指定がなければ空の辞書）
+    """
+    selection: Dict[str, Any] = {}
+    for name, extensions in _SELECTORS.items():
+        value = inputs.get(name)
+        if value in (None, "", []):
+            continue
+        if file_ext not in extensions:
+            raise SelectionError(
+                f"{name}は{', '.join(sorted(extensions))}ファイルでのみ指定できます"
+            )
+
+        if name == "rows":
+            selection[name] = _parse_row_range(value)
+        elif name == "sheets":
+            sheets = value if isinstance(value, list) else str(value).split(",")
+            selection[name] = [str(sheet).strip() for sheet in sheets]
+        else:
+            selection[name] = _parse_numbers(value, name)
+    return selection
+
+
+def _missing_note(label: str, missing: List[int], total: int) -> str:
+    """存在しない番号が指定された場合の注記"""
+    numbers = ", ".join(map(str, missing[:10]))
+    return f"（指定された{label} {numbers} は存在しません。全{total}{label}）\n\n"
+
+
+def _format_table_block(df: Any, header: bool) -> str:
+    """
+    表のブロックをタブ区切りのテキストに変換する
+
+    ブロックごとに列幅を揃える形式では、ブロックの境目で列の位置がずれるため、
+    列幅に依存しない区切り文字形式で出力する。
+
+    Args:
+        df: 表のブロック（pandasのDataFrame）
+        header: 列名の行を出力するか（最初のブロックのみ）
+
+    Returns:
+        タブ区切りのテキスト
+    """
+    return df.to_csv(sep="\t", index=False, header=header, lineterminator="\n")
+
+
+def _format_row_range(rows: List[Optional[int]]) -> str:
+    """行範囲を表示用の文字列に変換"""
+    start, end = rows
+    return f"{start}行目〜{f'{end}行目' if end else '最終行'}"
+
+
+def _read_csv_blocks(
+    file_path: str, block_rows: int, rows: Optional[List[Optional[int]]] = None
+) -> Any:
+    """
+    CSVを一定行数のブロックごとに読み込むリーダーを作成する
+
+    Args:
+        file_path: CSVファイルのパス
+        block_rows: 1ブロックあたりの行数
+        rows: 読み込むデータ行の範囲（1始まり、見出し行を除く）
+
+    Returns:
+        pandasのTextFileReader（with文で使用する）
+    """
+    import pandas as pd
+
+    if not rows:
+        return pd.read_csv(file_path, chunksize=block_rows)
+
+    start, end = rows
+    # 見出し行（0行目）は残し、開始行より前のデータ行を読み飛ばす
+    return pd.read_csv(
+        file_path,
+        chunksize=block_rows,
+        skiprows=range(1, start) if start > 1 else None,
+        nrows=end - start + 1 if end else None,
+    )
@@ -1,56 +1,61 @@
+import json
+from typing import Any, Dict, List, Tuple
+
 from app.agent.tools.base import BaseAgentTool
 from app.core.error_handler import ErrorSanitizer
+from app.core.settings import get_settings
+from app.services.web_search_service import SearchResponse, get_web_search_service
 from loguru import logger
 
+# 1回の呼び出しで検索できるクエリ数と、クエリごとの結果数の上限
+_MAX_QUERIES = 5
+_MAX_RESULTS = 10
+
 
 class WebSearchTool(BaseAgentTool):
     """Web検索ツール"""
 
     name: str = "web_search"
-    description: str = (
-        "ウェブ上で情報を検索します。クエリを文字列として渡してください。"
-    )
+    description: str = 'ウェブ上で情報を検索します。クエリを文字列として渡してください。複数のクエリをまとめて検索する場合や、上位ページの本文も取得する場合はJSONで指定できます。例: "東京 天気", {"queries": ["東京 天気", "大阪 天気"], "max_results": 5, "fetch_pages": 2}'
 
-    def _run(self, query: str) -> str:
+    def _run(self, query: Any) -> str:
         """
-        Web検索を実行する（モック実装）
+        Web検索を実行する
 
         Args:
-            query: 検索クエリ
+            query: 検索クエリ、またはqueries・max_results・fetch_pagesを含むJSON
 
         Returns:
             検索結果
         """
-        logger.info(f"Web検索: {query}")
+        try:
+            queries, max_results, fetch_pages = self._parse_input(query)
+            if not queries:
+                return "エラー: 検索クエリを指定してください"
+
+            responses, pages = get_web_search_service().search(
+                queries, max_results, fetch_pages
+            )
+            return self._format(responses, pages)
+
+        except Exception as e:
+            logger.error(f"Web検索エラー: {str(e)}")
+            safe_message = ErrorSanitizer.sanitize_error_message(
+                str(e), "tool_execution"
+            )
+            return safe_message
 
+    async def _arun(self, query: Any) -> str:
+        """Web検索を実行する（非同期）"""
         try:
-            # モック検索結果の生成
-            # 実際にはここでBing APIやGoogle APIなどを呼び出す
-            mock_results = [
-                {
-                    "title": f"検索結果1 - {query}に関する情報",
-                    "snippet": f"{query}に関する詳細情報です。これは最も関連性の高い結果です。",
-                    "url": f"https://example.com/result1?q={query}",
-                },
-                {
-                    "title": f"検索結果2 - {query}の歴史",
-                    "snippet": f"{query}の歴史的背景と発展について解説しています。",
-                    "url": f"https://example.com/result2?q={query}",
-                },
-                {
-                    "title": f"検索結果3 - {query}の使い方ガイド",
-                    "snippet": f"{query}の基本的な使い方と応用例を紹介します。",
-                    "url": f"https://example.com/result3?q={query}",
-                },
-            ]
-
-            results_text = f"「{query}」の検索結果:\n\n"
-            for i, result in enumerate(mock_results, 1):
-                results_text += f"{i}. {result['title']}\n"
-                results_text += f"   {result['snippet']}\n"
-                results_text += f"   URL: {result['url']}\n\n"
-
-            return results_text
+            queries, max_results, fetch_pages = self._parse_input(query)
+            if not queries:
+                return "エラー: 検索クエリを指定してください"
+
+            responses, pages = await get_web_search_service().asearch(
+                queries, max_results, fetch_pages
+            )
+            return self._format(responses, pages)
 
         except Exception as e:
             logger.error(f"Web検索エラー: {str(e)}")
@@ -58,3 +63,64 @@ class WebSearchTool(BaseAgentTool):
                 str(e), "tool_execution"
             )
             return safe_message
+
+    @staticmethod
+    def _parse_input(query: Any) -> Tuple[List[str], int, int]:
+        """
+        入力から検索クエリ・結果数・本文を取得するページ数を取り出す
+
+        Args:
+            query: 検索クエリの文字列、またはJSON（文字列・辞書）
+
+        Returns:
+            (重複を除いた検索クエリ, クエリごとの結果数, 本文を取得するページ数)
+        """
+        settings = get_settings()
+        inputs: Dict[str, Any] = {}
+        if isinstance(query, dict):
+            inputs = query
+        elif isinstance(query, str) and query.strip().startswith("{"):
+            try:
+                inputs = json.loads(query)
+            except json.JSONDecodeError:
+                inputs = {"query": query}
+        else:
+            inputs = {"query": query}
+
+        raw_queries = inputs.get("queries") or inputs.get("query") or []
+        if not isinstance(raw_queries, list):
+            raw_queries = [raw_queries]
+        queries = list(
+            dict.fromkeys(
+                str(item).strip() for item in raw_queries if str(item).strip()
+            )
+        )[:_MAX_QUERIES]
+
+        max_results = int(inputs.get("max_results") or settings.web_search_max_results)
+        max_results = min(max(max_results, 1), _MAX_RESULTS)
+        fetch_pages = int(inputs.get("fetch_pages") or settings.web_search_fetch_pages)
+        return queries, max_results, min(max(fetch_pages, 0), max_results)
+
+    @staticmethod
+    def _format(responses: List[SearchResponse], pages: Dict[str, str]) -> str:
+        """検索結果と取得したページ本文をテキストに整形する"""
+        parts = []
+        for response in responses:
+            if response.error is not None:
+                parts.append(f"「{response.query}」の検索に失敗しました。\n\n")
+                continue
+            if not response.results:
+                parts.append(f"「{response.query}」の検索結果はありませんでした。\n\n")
+                continue
+
+            parts.append(f"「{response.query}」の検索結果:\n\n")
+            for i, result in enumerate(response.results, 1):
+                parts.append(f"{i}. {result.title}\n")
+                parts.append(f"   {result.snippet}\n")
+                parts.append(f"   URL: {result.url}\n")
+                page = pages.get(result.url)
+                if page:
+                    parts.append(f"   本文:\n{page}\n")
+                parts.append("\n")
+
+        return "".join(parts)
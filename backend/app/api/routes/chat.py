@@ -1,14 +1,46 @@
+import asyncio
 import json
-import random
 import uuid
 from typing import List, Optional
 
 from app.api.dependencies import get_llm_config, validate_llm_config
 from app.core.error_handler import ErrorSanitizer
 from app.core.session_manager import get_session_manager
-from app.models.chat import ChatResponse, FileUploadResponse
-from app.services.file_service import save_uploaded_file
-from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile, status
+from app.models.chat import (
+    ChatResponse,
+    ChunkedUploadStatus,
+    FileListResponse,
+    FileUploadResponse,
+)
+from app.services.extraction_service import schedule_extraction
+from app.services.file_service import (
+    abort_chunked_upload,
+    delete_session_uploads,
+    finalize_chunked_upload,
+    get_chunked_upload_status,
+    get_file_info,
+    get_upload_content,
+    init_chunked_upload,
+    list_uploaded_files,
+    resolve_uploads,
+    save_uploaded_file,
+    save_uploaded_files,
+    write_upload_chunk,
+)
+from app.services.tool_result_cache import get_tool_result_cache
+from app.services.upload_gc import collect_upload_garbage
+from app.services.upload_store import EXTRACTION_COMPLETED, get_upload_store
+from fastapi import (
+    APIRouter,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+    status,
+)
+from fastapi.responses import FileResponse
 from loguru import logger
 
 router = APIRouter()
@@ -18,6 +50,7 @@ router = APIRouter()
 async def process_message(
     message: str = Form(...),
     files: Optional[List[UploadFile]] = File(None),
+    file_ids: Optional[List[str]] = Form(None),
     session_id: Optional[str] = Form(None),
     request: Request = None,
 ):
@@ -27,6 +60,7 @@ async def process_message(
     Args:
         message: ユーザーメッセージ
         files: 添付ファイルリスト（オプション）
+        file_ids: 添付する登録済みアップロードのIDリスト（オプション、再送信不要）
         session_id: セッションID（オプション）
         request: リクエスト情報
 
@@ -50,6 +84,9 @@ async def process_message(
         if not session_id:
             session_id = str(uuid.uuid4())
 
+        # セッションの実行状態を全ワーカーで共有する（アップロードの保持期間の判定に使用）
+        await asyncio.to_thread(get_upload_store().touch_session, session_id)
+
         # セッション管理システムを使用
         session_manager = get_session_manager()
 
@@ -80,17 +117,32 @@ async def process_message(
             session_id, llm_config
         )
 
-        # ファイル処理
+        # 登録済みのアップロードはカタログから参照し、内容を再送信させない
         file_paths = []
+        if file_ids:
+            for file_info in await resolve_uploads(file_ids, session_id):
+                file_paths.append(file_info.file_path)
+                logger.info(f"登録済みのファイルを添付しました: {file_info.file_id}")
+
+                # 抽出済みでなければ抽出を開始（抽出キャッシュがあれば即座に完了）
+                if file_info.extraction_status != EXTRACTION_COMPLETED:
+                    await asyncio.to_thread(schedule_extraction, file_info.file_path)
+
+        # ファイル処理（添付ファイルは並行して保存）
         if files:
-            for file in files:
-                file_path = await save_uploaded_file(file)
-                file_paths.append(file_path)
-                logger.info(f"ファイルを保存しました: {file_path}")
+            saved_paths = await save_uploaded_files(files, session_id)
+            file_paths.extend(saved_paths)
+
+            # LLMの思考生成と並行して全ファイルの抽出を開始
+            for file_path in saved_paths:
+                await asyncio.to_thread(schedule_extraction, file_path)
 
         # メッセージ処理
         response = await agent_manager.process_message(message, session_id, file_paths)
 
+        # セッションのメモリ使用量を更新し、上限を超えた分を削除
+        session_manager.update_session_footprint(session_id)
+
         # 結果をログに記録
         logger.info(f"メッセージ処理完了 - セッションID: {response['session_id']}")
         logger.debug(f"思考プロセス: {response.get('thought_process', '')[:200]}...")
@@ -101,21 +153,17 @@ async def process_message(
                 f"ツール呼び出し: {json.dumps(response.get('tool_calls', [])[:3], ensure_ascii=False)}"
             )
 
-        # 定期的なクリーンアップ（10%の確率で実行）
-        if random.random() < 0.1:
-            removed_count = session_manager.cleanup_old_sessions()
-            if removed_count > 0:
-                logger.info(
-                    f"{removed_count}個の古いセッションをクリーンアップしました"
-                )
-
         return ChatResponse(
             message=response["message"],
             session_id=response["session_id"],
             thought_process=response.get("thought_process"),
             tool_calls=response.get("tool_calls"),
+            budget_notice=response.get("budget_notice"),
         )
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.error(f"メッセージ処理エラー: {str(e)}")
         safe_message = ErrorSanitizer.sanitize_error_message(str(e), "api_call")
@@ -198,6 +246,21 @@ async def get_session_stats():
         )
 
 
+@router.get("/tool-cache-stats")
+async def get_tool_cache_stats():
+    """ツール実行結果のキャッシュ統計情報を取得（ツールごとのヒット数を含む）"""
+    try:
+        return get_tool_result_cache().get_stats()
+    except Exception as e:
+        logger.error(f"ツールキャッシュ統計取得エラー: {str(e)}")
+        safe_message = ErrorSanitizer.sanitize_error_message(str(e), "api_call")
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=safe_message,
+        )
+
+
 @router.delete("/session/{session_id}")
 async def delete_session(session_id: str):
     """特定のセッションを削除"""
@@ -205,6 +268,9 @@ async def delete_session(session_id: str):
         session_manager = get_session_manager()
         removed = session_manager.remove_session(session_id)
 
+        # セッションのアップロードは保持期間を待たずに削除
+        await delete_session_uploads(session_id)
+
         if removed:
             return {
                 "success": True,
@@ -243,6 +309,7 @@ async def clear_chat_history(session_id: str):
         if agent_manager:
             # 会話履歴のみをクリア（LLM設定やセッション情報は保持）
             agent_manager.memory.clear_session(session_id)
+            session_manager.update_session_footprint(session_id)
             logger.info(f"セッション {session_id} の会話履歴をクリアしました")
 
             return {
@@ -268,7 +335,7 @@ async def clear_chat_history(session_id: str):
 
 
 @router.post("/cleanup-sessions")
-async def cleanup_old_sessions(max_age_seconds: int = 3600):
+async def cleanup_old_sessions(max_age_seconds: Optional[int] = None):
     """古いセッションを手動でクリーンアップ"""
     try:
         session_manager = get_session_manager()
@@ -289,24 +356,49 @@ async def cleanup_old_sessions(max_age_seconds: int = 3600):
         )
 
 
+@router.post("/cleanup-uploads")
+async def cleanup_uploads():
+    """保持期間・容量上限を超えたアップロードを手動でクリーンアップ"""
+    try:
+        result = await asyncio.to_thread(collect_upload_garbage)
+
+        return {
+            "success": True,
+            "message": f"{result['expired'] + result['evicted']}個のアップロードをクリーンアップしました",
+            **result,
+        }
+    except Exception as e:
+        logger.error(f"アップロードクリーンアップエラー: {str(e)}")
+        safe_message = ErrorSanitizer.sanitize_error_message(str(e), "api_call")
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=safe_message,
+        )
+
+
 @router.post("/upload", response_model=FileUploadResponse)
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(
+    file: UploadFile = File(...), session_id: Optional[str] = Form(None)
+):
     """
     ファイルをアップロードする
 
     Args:
         file: アップロードファイル
+        session_id: セッションID（オプション、指定時は他のセッションから参照不可）
 
     Returns:
         FileUploadResponse: アップロード結果
     """
     try:
         # ファイル保存
-        file_path = await save_uploaded_file(file)
+        file_path = await save_uploaded_file(file, session_id)
 
-        # ファイル情報の作成
-        from app.services.file_service import get_file_info
+        # 次のメッセージを待たずに抽出を開始
+        await asyncio.to_thread(schedule_extraction, file_path)
 
+        # ファイル情報の作成
         file_info = await get_file_info(file_path)
 
         return FileUploadResponse(success=True, file_info=file_info)
@@ -322,3 +414,135 @@ async def upload_file(file: UploadFile = File(...)):
             success=False,
             error=safe_message,
         )
+
+
+@router.post("/upload/chunked", response_model=ChunkedUploadStatus)
+async def start_chunked_upload(
+    filename: str = Form(...),
+    size: int = Form(...),
+    session_id: Optional[str] = Form(None),
+):
+    """
+    分割アップロードを開始する（大きなファイルを複数のリクエストに分けて送信）
+
+    Args:
+        filename: ファイル名
+        size: ファイル全体のサイズ（バイト）
+        session_id: セッションID（オプション）
+
+    Returns:
+        ChunkedUploadStatus: 分割アップロードの状態
+    """
+    return await init_chunked_upload(filename, size, session_id)
+
+
+@router.get("/upload/chunked/{upload_id}", response_model=ChunkedUploadStatus)
+async def get_chunked_upload(upload_id: str):
+    """
+    分割アップロードの状態を取得する（切断後はreceivedの位置から送信を再開する）
+
+    Args:
+        upload_id: 分割アップロードのID
+
+    Returns:
+        ChunkedUploadStatus: 分割アップロードの状態
+    """
+    return await get_chunked_upload_status(upload_id)
+
+
+@router.put("/upload/chunked/{upload_id}", response_model=ChunkedUploadStatus)
+async def put_upload_chunk(upload_id: str, request: Request, offset: int = Query(...)):
+    """
+    チャンクを送信する（リクエスト本文をそのままファイルの指定位置に書き込む）
+
+    Args:
+        upload_id: 分割アップロードのID
+        request: リクエスト情報（本文がチャンクのバイト列）
+        offset: チャンクの書き込み開始位置
+
+    Returns:
+        ChunkedUploadStatus: 分割アップロードの状態
+    """
+    return await write_upload_chunk(upload_id, offset, request.stream())
+
+
+@router.post("/upload/chunked/{upload_id}/complete", response_model=FileUploadResponse)
+async def complete_chunked_upload(upload_id: str, sha256: str = Form(...)):
+    """
+    分割アップロードを完了する（内容のハッシュを検証してから登録）
+
+    Args:
+        upload_id: 分割アップロードのID
+        sha256: ファイル全体のSHA-256ハッシュ
+
+    Returns:
+        FileUploadResponse: アップロード結果
+    """
+    try:
+        file_path = await finalize_chunked_upload(upload_id, sha256)
+
+        # 次のメッセージを待たずに抽出を開始
+        await asyncio.to_thread(schedule_extraction, file_path)
+
+        file_info = await get_file_info(file_path)
+        return FileUploadResponse(success=True, file_info=file_info)
+
+    except HTTPException as he:
+        return FileUploadResponse(success=False, error=he.detail)
+
+    except Exception as e:
+        logger.error(f"分割アップロード完了エラー: {str(e)}")
+        safe_message = ErrorSanitizer.sanitize_error_message(str(e), "api_call")
+
+        return FileUploadResponse(
+            success=False,
+            error=safe_message,
+        )
+
+
+@router.delete("/upload/chunked/{upload_id}")
+async def cancel_chunked_upload(upload_id: str):
+    """分割アップロードを中止する"""
+    if await abort_chunked_upload(upload_id):
+        return {"success": True, "message": "分割アップロードを中止しました"}
+    return {"success": False, "message": "分割アップロードが見つかりません"}
+
+
+@router.get("/uploads/{session_id}", response_model=FileListResponse)
+async def list_uploads(session_id: str):
+    """
+    セッションのアップロード一覧を取得する（file_idsで再利用するため）
+
+    Args:
+        session_id: セッションID
+
+    Returns:
+        FileListResponse: アップロード一覧
+    """
+    try:
+        files = await list_uploaded_files(session_id)
+        return FileListResponse(session_id=session_id, files=files)
+    except Exception as e:
+        logger.error(f"アップロード一覧取得エラー: {str(e)}")
+        safe_message = ErrorSanitizer.sanitize_error_message(str(e), "api_call")
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=safe_message,
+        )
+
+
+@router.get("/uploads/{session_id}/{file_id}")
+async def download_upload(session_id: str, file_id: str):
+    """
+    セッションのアップロードをダウンロードする（他のセッションのファイルは取得不可）
+
+    Args:
+        session_id: セッションID
+        file_id: アップロードID
+
+    Returns:
+        FileResponse: ファイルの内容
+    """
+    blob_path, filename = await get_upload_content(file_id, session_id)
+    return FileResponse(blob_path, filename=filename)
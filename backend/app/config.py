@@ -8,5 +8,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 STATIC_DIR = os.path.join(BASE_DIR, "app", "static")
 UPLOAD_DIR = os.path.join(STATIC_DIR, "uploads")
 
-# アップロードディレクトリの作成（存在しない場合）
+# 内部データディレクトリ（公開しないファイルを配置）
+DATA_DIR = os.path.join(BASE_DIR, "data")
+CHECKPOINT_DB_PATH = os.path.join(DATA_DIR, "checkpoints.sqlite")
+EXTRACTION_CACHE_DIR = os.path.join(DATA_DIR, "extraction_cache")
+VECTOR_INDEX_DIR = os.path.join(DATA_DIR, "vector_index")
+
+# アップロード・データディレクトリの作成（存在しない場合）
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
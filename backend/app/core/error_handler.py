@@ -39,6 +39,20 @@ class ErrorSanitizer:
         "network": "ネットワークエラーが発生しました。",
     }
 
+    # コンテキスト別のメッセージ
+    CONTEXT_MESSAGES = {
+        "file_processing": "ファイルの処理中に問題が発生しました。ファイル形式や内容を確認してください。",
+        "llm_call": "AI処理中に問題が発生しました。しばらく時間をおいてから再度お試しください。",
+        "tool_execution": "ツールの実行中に問題が発生しました。入力内容を確認してください。",
+        "workflow": "ワークフローの実行中に問題が発生しました。",
+        "api_call": "API呼び出し中に問題が発生しました。",
+    }
+
+    # デフォルトメッセージ
+    DEFAULT_MESSAGE = (
+        "処理中に問題が発生しました。しばらく時間をおいてから再度お試しください。"
+    )
+
     @classmethod
     def sanitize_error_message(
         cls, error_message: str, context: str = "general"
@@ -88,20 +102,19 @@ class ErrorSanitizer:
                 return friendly_message
 
         # コンテキスト別のメッセージ
-        context_messages = {
-            "file_processing": "ファイルの処理中に問題が発生しました。ファイル形式や内容を確認してください。",
-            "llm_call": "AI処理中に問題が発生しました。しばらく時間をおいてから再度お試しください。",
-            "tool_execution": "ツールの実行中に問題が発生しました。入力内容を確認してください。",
-            "workflow": "ワークフローの実行中に問題が発生しました。",
-            "api_call": "API呼び出し中に問題が発生しました。",
-        }
-
-        if context in context_messages:
-            return context_messages[context]
+        if context in cls.CONTEXT_MESSAGES:
+            return cls.CONTEXT_MESSAGES[context]
 
         # デフォルトメッセージ
+        return cls.DEFAULT_MESSAGE
+
+    @classmethod
+    def is_sanitized_message(cls, message: str) -> bool:
+        """サニタイズ済みのエラーメッセージかどうか判定（ツール結果のキャッシュ可否に使用）"""
         return (
-            "処理中に問題が発生しました。しばらく時間をおいてから再度お試しください。"
+            message == cls.DEFAULT_MESSAGE
+            or message in cls.ERROR_MAPPINGS.values()
+            or message in cls.CONTEXT_MESSAGES.values()
         )
 
 
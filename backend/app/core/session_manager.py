@@ -4,10 +4,18 @@
 """
 
 import asyncio
+import heapq
 import uuid
-from typing import Any, Dict, Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 from app.agent.core import AgentManager
+from app.agent.graph.checkpoint import (
+    clear_session_turns,
+    get_checkpointer,
+    sweep_stale_turns,
+)
+from app.core.settings import get_settings
 from loguru import logger
 
 
@@ -24,8 +32,19 @@ class SessionManager:
 
     def __init__(self):
         if not self._initialized:
-            self.agent_managers: Dict[str, AgentManager] = {}
+            settings = get_settings()
+            # 最近使用した順に並ぶ（先頭が最も古い）
+            self.agent_managers: "OrderedDict[str, AgentManager]" = OrderedDict()
             self.session_metadata: Dict[str, Dict[str, Any]] = {}
+            # (最終使用時刻, セッションID) の最小ヒープ（古いエントリは遅延削除）
+            self._expiry_heap: List[Tuple[float, str]] = []
+            self.max_sessions = settings.max_sessions
+            self.session_memory_quota_bytes = settings.session_memory_quota_bytes
+            self.total_memory_quota_bytes = settings.total_memory_quota_bytes
+            self.total_footprint_bytes = 0  # 全セッションの概算バイト数
+            self.eviction_stats = {"expired": 0, "lru": 0, "manual": 0, "quota": 0}
+            self.trim_stats = {"messages": 0}
+            self._cleanup_task: Optional[asyncio.Task] = None
             self._initialized = True
             logger.info("SessionManagerを初期化しました")
 
@@ -36,23 +55,125 @@ class SessionManager:
         if not session_id:
             session_id = str(uuid.uuid4())
 
+        current_time = asyncio.get_event_loop().time()
+
         if session_id not in self.agent_managers:
             self.agent_managers[session_id] = AgentManager(llm_config)
             self.session_metadata[session_id] = {
-                "created_at": asyncio.get_event_loop().time(),
-                "last_used": asyncio.get_event_loop().time(),
+                "created_at": current_time,
+                "last_used": current_time,
                 "request_count": 0,
+                "footprint_bytes": 0,
             }
             logger.info(f"セッション {session_id} 用のAgentManagerを作成しました")
+            self._enforce_capacity()
         else:
             # 最終使用時間を更新
-            self.session_metadata[session_id]["last_used"] = (
-                asyncio.get_event_loop().time()
-            )
+            self.session_metadata[session_id]["last_used"] = current_time
+            self.agent_managers.move_to_end(session_id)
+
+        heapq.heappush(self._expiry_heap, (current_time, session_id))
+        self._compact_expiry_heap()
 
         self.session_metadata[session_id]["request_count"] += 1
         return self.agent_managers[session_id]
 
+    def _enforce_capacity(self) -> None:
+        """セッション数の上限を超えた分を最も古く使用されたものから削除"""
+        while len(self.agent_managers) > self.max_sessions:
+            session_id = next(iter(self.agent_managers))
+            self._evict_session(session_id)
+            self.eviction_stats["lru"] += 1
+            logger.info(f"セッション上限によりセッション {session_id} を削除しました")
+
+    def _compact_expiry_heap(self) -> None:
+        """古いエントリが溜まりすぎた場合にヒープを再構築"""
+        if len(self._expiry_heap) > 2 * len(self.session_metadata) + 64:
+            self._expiry_heap = [
+                (metadata["last_used"], session_id)
+                for session_id, metadata in self.session_metadata.items()
+            ]
+            heapq.heapify(self._expiry_heap)
+
+    def _evict_session(self, session_id: str) -> bool:
+        """セッションに関連するデータをすべて削除"""
+        removed = False
+
+        manager = self.agent_managers.pop(session_id, None)
+        if manager is not None:
+            # AgentManager内のセッションデータをクリア
+            manager.remove_session(session_id)
+            self._clear_checkpoints(manager.checkpointer, session_id)
+            removed = True
+
+        metadata = self.session_metadata.pop(session_id, None)
+        if metadata is not None:
+            self.total_footprint_bytes -= metadata["footprint_bytes"]
+            removed = True
+
+        return removed
+
+    @staticmethod
+    def _clear_checkpoints(checkpointer, session_id: str) -> None:
+        """削除したセッションの未完了ターンのチェックポイントを削除（ループをブロックしない）"""
+        if checkpointer is None:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            clear_session_turns(checkpointer, session_id)
+            return
+        loop.run_in_executor(None, clear_session_turns, checkpointer, session_id)
+
+    def update_session_footprint(self, session_id: str) -> int:
+        """
+        セッションの概算メモリ使用量を更新し、クォータを適用する
+
+        セッション単位の上限を超えた場合は古いターンから削除し、
+        全体の上限を超えた場合は最も古く使用されたセッションから削除する。
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            更新後のセッションの概算バイト数
+        """
+        manager = self.agent_managers.get(session_id)
+        metadata = self.session_metadata.get(session_id)
+        if manager is None or metadata is None:
+            return 0
+
+        footprint = manager.get_session_footprint(session_id)
+        if footprint > self.session_memory_quota_bytes:
+            removed_messages = manager.memory.trim_session(
+                session_id,
+                self.session_memory_quota_bytes
+                - (footprint - manager.memory.get_session_size(session_id)),
+            )
+            self.trim_stats["messages"] += removed_messages
+            footprint = manager.get_session_footprint(session_id)
+            logger.info(
+                f"セッション {session_id} がメモリ上限を超えたため、"
+                f"メッセージ{removed_messages}件を削除しました"
+            )
+
+        self.total_footprint_bytes += footprint - metadata["footprint_bytes"]
+        metadata["footprint_bytes"] = footprint
+
+        # 全体の上限を超えた場合は古いセッションから削除（対象セッション自身は残す）
+        while self.total_footprint_bytes > self.total_memory_quota_bytes:
+            oldest_session_id = next(iter(self.agent_managers))
+            if oldest_session_id == session_id:
+                break
+            self._evict_session(oldest_session_id)
+            self.eviction_stats["quota"] += 1
+            logger.info(
+                f"全体のメモリ上限によりセッション {oldest_session_id} を削除しました"
+            )
+
+        return footprint
+
     def get_agent_manager(self, session_id: str) -> Optional[AgentManager]:
         """セッションのAgentManagerを取得（存在しない場合はNone）"""
         return self.agent_managers.get(session_id)
@@ -66,6 +187,7 @@ class SessionManager:
                 self.agent_managers[session_id].update_session_llm_config(
                     session_id, llm_config
                 )
+                self.update_session_footprint(session_id)
                 logger.info(f"セッション {session_id} のLLM設定を更新しました")
                 return True
             except Exception as e:
@@ -79,30 +201,77 @@ class SessionManager:
             return self.agent_managers[session_id].get_session_llm_config(session_id)
         return None
 
-    def cleanup_old_sessions(self, max_age_seconds: int = 3600) -> int:
-        """古いセッションをクリーンアップ"""
-        current_time = asyncio.get_event_loop().time()
-        sessions_to_remove = []
+    def cleanup_old_sessions(self, max_age_seconds: Optional[int] = None) -> int:
+        """
+        古いセッションをクリーンアップ
+
+        最終使用時刻のヒープから期限切れのものだけを取り出すため、
+        削除1件あたりO(log n)で処理される。
+
+        Args:
+            max_age_seconds: 最大セッション有効期間（秒）。省略時は設定値
 
-        for session_id, metadata in self.session_metadata.items():
-            if current_time - metadata["last_used"] > max_age_seconds:
-                sessions_to_remove.append(session_id)
+        Returns:
+            削除されたセッション数
+        """
+        if max_age_seconds is None:
+            max_age_seconds = get_settings().session_max_age_seconds
 
+        cutoff = asyncio.get_event_loop().time() - max_age_seconds
         removed_count = 0
-        for session_id in sessions_to_remove:
-            if session_id in self.agent_managers:
-                # AgentManager内のセッションもクリーンアップ
-                self.agent_managers[session_id].cleanup_old_sessions(max_age_seconds)
-                del self.agent_managers[session_id]
-                removed_count += 1
 
-            if session_id in self.session_metadata:
-                del self.session_metadata[session_id]
+        while self._expiry_heap and self._expiry_heap[0][0] < cutoff:
+            last_used, session_id = heapq.heappop(self._expiry_heap)
+
+            metadata = self.session_metadata.get(session_id)
+            if metadata is None or metadata["last_used"] != last_used:
+                # 削除済み、または後から使用されたセッションの古いエントリ
+                continue
 
-            logger.info(f"古いセッション {session_id} をクリーンアップしました")
+            if self._evict_session(session_id):
+                removed_count += 1
+                self.eviction_stats["expired"] += 1
+                logger.info(f"古いセッション {session_id} をクリーンアップしました")
 
         return removed_count
 
+    async def _cleanup_loop(self, interval_seconds: int) -> None:
+        """期限切れセッションを定期的に削除するバックグラウンドループ"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                removed_count = self.cleanup_old_sessions()
+                if removed_count > 0:
+                    logger.info(
+                        f"{removed_count}個の古いセッションをクリーンアップしました"
+                    )
+
+                # 再開されなかったターンのチェックポイントを削除
+                await asyncio.to_thread(
+                    sweep_stale_turns,
+                    get_checkpointer(),
+                    get_settings().checkpoint_ttl_seconds,
+                )
+            except Exception as e:
+                logger.error(f"セッションクリーンアップエラー: {str(e)}")
+
+    def start_cleanup_task(self) -> None:
+        """バックグラウンドのセッションクリーンアップを開始"""
+        if self._cleanup_task is None or self._cleanup_task.done():
+            interval = get_settings().session_cleanup_interval_seconds
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop(interval))
+            logger.info(f"セッションクリーンアップを開始しました（間隔: {interval}秒）")
+
+    async def stop_cleanup_task(self) -> None:
+        """バックグラウンドのセッションクリーンアップを停止"""
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            try:
+                await self._cleanup_task
+            except asyncio.CancelledError:
+                pass
+            self._cleanup_task = None
+
     def get_session_stats(self) -> Dict[str, Any]:
         """セッション統計情報を取得"""
         total_sessions = 0
@@ -118,6 +287,12 @@ class SessionManager:
             "total_sessions": total_sessions,
             "total_memory_sessions": total_memory_sessions,
             "session_metadata_count": len(self.session_metadata),
+            "max_sessions": self.max_sessions,
+            "evictions": dict(self.eviction_stats),
+            "total_footprint_bytes": self.total_footprint_bytes,
+            "session_memory_quota_bytes": self.session_memory_quota_bytes,
+            "total_memory_quota_bytes": self.total_memory_quota_bytes,
+            "trimmed": dict(self.trim_stats),
             "manager_details": {
                 session_id: manager.get_session_stats()
                 for session_id, manager in self.agent_managers.items()
@@ -126,19 +301,10 @@ class SessionManager:
 
     def remove_session(self, session_id: str) -> bool:
         """特定のセッションを削除"""
-        removed = False
-
-        if session_id in self.agent_managers:
-            # AgentManager内のセッションデータをクリア
-            self.agent_managers[session_id].memory.clear_session(session_id)
-            del self.agent_managers[session_id]
-            removed = True
-
-        if session_id in self.session_metadata:
-            del self.session_metadata[session_id]
-            removed = True
+        removed = self._evict_session(session_id)
 
         if removed:
+            self.eviction_stats["manual"] += 1
             logger.info(f"セッション {session_id} を削除しました")
 
         return removed
@@ -40,9 +40,86 @@ class Settings(BaseSettings):
     # 共通LLM設定
     llm_temperature: float = 0.7
 
+    # セッション管理設定
+    session_max_age_seconds: int = 3600  # アイドル状態のセッションの有効期間
+    session_cleanup_interval_seconds: int = 60  # バックグラウンド削除の実行間隔
+    max_sessions: int = 1000  # 同時に保持するセッション数の上限（超過時はLRUで削除）
+    session_memory_quota_bytes: int = 16 * 1024 * 1024  # セッションあたりの上限
+    total_memory_quota_bytes: int = 1024 * 1024 * 1024  # 全セッション合計の上限
+
+    # ワークフローのチェックポイント設定（中断したターンの再開用）
+    checkpoint_enabled: bool = False
+    checkpoint_ttl_seconds: int = 24 * 60 * 60  # 再開されなかったターンの保持期間
+
+    # ファイル抽出結果のキャッシュ設定
+    extraction_cache_memory_bytes: int = 64 * 1024 * 1024
+    extraction_cache_disk_bytes: int = 1024 * 1024 * 1024
+    extraction_workers: int = 2  # アップロード時のバックグラウンド抽出の並列数
+
+    # ドキュメント解析プロセスプール設定
+    parser_pool_size: int = 2  # 0の場合はAPIプロセス内で解析
+    parser_job_timeout_seconds: float = 120.0
+    parser_memory_limit_mb: int = 2048  # ワーカーあたりのメモリ上限（0で無制限）
+    parser_max_jobs_per_worker: int = 50  # この件数を処理したワーカーは再起動
+    pdf_parallel_page_threshold: int = 40  # このページ数以上のPDFは並列に抽出
+    pdf_pages_per_job: int = 20  # 並列抽出時の1ジョブあたりのページ数
+    excel_max_rows_per_sheet: int = 100000  # シートごとに読み込む最大行数（0で無制限）
+
+    # ドキュメント検索設定
+    document_chunk_size: int = 800  # 検索用チャンクの最大文字数
+    document_chunk_overlap: int = 100  # 隣接チャンク間で重複させる文字数
+    document_search_top_k: int = 5  # 検索結果として返すチャンク数の既定値
+    document_index_cache_size: int = 32  # メモリに保持する検索インデックス数
+
+    # ベクトル検索設定
+    embedding_provider: str = "hashing"  # hashing（オフライン）/ azure / openai
+    embedding_dimensions: int = 512  # hashing方式の次元数
+    embedding_batch_size: int = 64  # 埋め込みAPIへ1回で送るチャンク数
+    azure_openai_embedding_deployment_name: str = ""
+    openai_embedding_model_name: str = "text-embedding-3-small"
+    vector_index_cache_size: int = 32  # メモリマップで開いておくインデックス数
+
+    # ツール実行結果のキャッシュ設定（セッション間で共有）
+    tool_cache_max_bytes: int = 64 * 1024 * 1024  # キャッシュする出力の合計サイズの上限
+    tool_cache_ttl_seconds: int = 3600  # ツールで指定がない場合の有効期間
+
+    # Web検索設定
+    web_search_provider: str = "mock"  # mock（オフライン）/ searxng / bing
+    web_search_endpoint: str = (
+        ""  # searxng: 検索APIのURL、bing: 省略時は公式エンドポイント
+    )
+    web_search_api_key: str = ""
+    web_search_max_results: int = 5  # クエリごとの検索結果数の既定値
+    web_search_fetch_pages: int = 0  # 本文を取得する上位ページ数の既定値
+    web_search_page_max_chars: int = 3000  # 取得したページ本文の最大文字数
+    web_search_timeout_seconds: float = 10.0
+    web_search_max_connections: int = 20  # 共有HTTPクライアントの最大接続数
+    web_search_cache_ttl_seconds: int = 600  # 検索結果・ページ本文のキャッシュ有効期間
+    web_search_cache_size: int = 256
+    web_search_allow_private_addresses: bool = (
+        False  # ページ取得で内部ネットワークを許可（ローカルの検証用サーバー向け）
+    )
+
+    # 最終応答生成時にツール出力全体へ割り当てるトークン数
+    tool_output_token_budget: int = 12000
+
     # ファイルアップロード設定
     upload_dir: str = "app/static/uploads"
     max_upload_size: int = 10 * 1024 * 1024  # 10MB
+    upload_save_concurrency: int = 4  # 1メッセージの添付ファイルを同時に保存する数
+    max_chunked_upload_size: int = 200 * 1024 * 1024  # 分割アップロードの上限（200MB）
+    upload_chunk_size: int = (
+        8 * 1024 * 1024
+    )  # 分割アップロードの1リクエストあたりの上限
+    chunked_upload_expiry_seconds: int = 24 * 3600  # 再開を待つ期間
+    upload_retention_seconds: int = 7 * 24 * 3600  # 最終利用からの保持期間
+    upload_session_retention_seconds: int = (
+        24 * 3600
+    )  # 終了したセッションのアップロードの保持期間
+    upload_disk_quota_bytes: int = (
+        10 * 1024 * 1024 * 1024
+    )  # 全アップロードの合計サイズの上限
+    upload_gc_interval_seconds: int = 600  # バックグラウンド削除の実行間隔
     allowed_extensions: List[str] = [
         "txt",
         "pdf",
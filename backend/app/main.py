@@ -5,7 +5,12 @@ import time
 from app.api.routes import chat
 from app.api.routes import settings as settings_router
 from app.config import STATIC_DIR, UPLOAD_DIR
+from app.core.session_manager import get_session_manager
 from app.core.settings import get_settings
+from app.services.extraction_service import shutdown_extraction_workers
+from app.services.parser_pool import get_parser_pool
+from app.services.upload_gc import start_upload_gc, stop_upload_gc
+from app.services.web_search_service import shutdown_web_search
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -119,12 +124,25 @@ async def startup_event():
     logger.info(f"環境: {app_settings.env}")
     logger.info(f"LLMプロバイダー: {app_settings.default_llm_provider}")
 
+    # 期限切れセッションのバックグラウンド削除を開始
+    get_session_manager().start_cleanup_task()
+
+    # 保持期間・容量上限を超えたアップロードのバックグラウンド削除を開始
+    start_upload_gc()
+
 
 # アプリケーション終了時の処理
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("アプリケーション終了")
 
+    # バックグラウンドタスクの停止
+    await get_session_manager().stop_cleanup_task()
+    await stop_upload_gc()
+    shutdown_extraction_workers()
+    get_parser_pool().shutdown()
+    shutdown_web_search()
+
 
 # 開発サーバー起動用コード
 if __name__ == "__main__":
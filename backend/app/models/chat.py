@@ -18,6 +18,7 @@ class ChatResponse(BaseModel):
     session_id: str
     thought_process: Optional[str] = None
     tool_calls: Optional[List[Dict[str, Any]]] = None
+    budget_notice: Optional[str] = None  # ツール出力を省略した場合の注記
 
 
 class FileInfo(BaseModel):
@@ -28,6 +29,7 @@ class FileInfo(BaseModel):
     file_path: str
     file_size: int
     file_type: str
+    extraction_status: Optional[str] = None
 
 
 class FileUploadResponse(BaseModel):
@@ -36,3 +38,20 @@ class FileUploadResponse(BaseModel):
     success: bool
     file_info: Optional[FileInfo] = None
     error: Optional[str] = None
+
+
+class ChunkedUploadStatus(BaseModel):
+    """分割アップロードの状態モデル"""
+
+    upload_id: str
+    filename: str
+    size: int
+    received: int
+    chunk_size: int
+
+
+class FileListResponse(BaseModel):
+    """アップロード一覧レスポンスモデル"""
+
+    session_id: str
+    files: List[FileInfo]
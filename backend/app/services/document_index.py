@@ -0,0 +1,164 @@
+"""
+アップロードドキュメントのチャンク分割と検索インデックス
+抽出済みテキストをチャンクに分割し、BM25で質問に関連するチャンクを検索する
+"""
+
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from app.core.settings import get_settings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# 日本語の文・読点でも区切れるようにした区切り文字（優先度の高い順）
+_JAPANESE_SEPARATORS = ["\n\n", "\n", "。", "．", "！", "？", "、", "，", " ", ""]
+
+# 英数字の単語と、かな・漢字の連続を抽出するパターン
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u3040-\u30ff\u3400-\u9fff\uff66-\uff9f]+")
+
+
+def split_into_chunks(text: str) -> List[str]:
+    """
+    抽出済みテキストを検索用のチャンクに分割する
+
+    Args:
+        text: 抽出済みテキスト
+
+    Returns:
+        チャンクのリスト
+    """
+    settings = get_settings()
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.document_chunk_size,
+        chunk_overlap=settings.document_chunk_overlap,
+        separators=_JAPANESE_SEPARATORS,
+        keep_separator="end",
+    )
+    return [chunk for chunk in splitter.split_text(text) if chunk.strip()]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    検索用にテキストをトークン化する
+
+    形態素解析器を使わずに日本語を扱えるよう、かな・漢字の連続は文字bigramに、
+    英数字は単語単位に分割する。
+
+    Args:
+        text: 対象テキスト
+
+    Returns:
+        トークンのリスト
+    """
+    tokens: List[str] = []
+    for match in _TOKEN_PATTERN.finditer(unicodedata.normalize("NFKC", text).lower()):
+        word = match.group()
+        if word.isascii() or len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class BM25Index:
+    """チャンク単位のBM25インデックス"""
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = np.zeros(len(chunks), dtype=np.float32)
+        for chunk_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            lengths[chunk_id] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((chunk_id, tf))
+
+        # 長さの正規化項はチャンクごとに事前計算しておく
+        average_length = float(lengths.mean()) if len(chunks) else 0.0
+        self._length_norm = k1 * (1 - b + b * lengths / max(average_length, 1.0))
+
+        chunk_count = len(chunks)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for term, entries in postings.items():
+            ids, tfs = zip(*entries)
+            idf = math.log((chunk_count - len(ids) + 0.5) / (len(ids) + 0.5) + 1)
+            self._postings[term] = (
+                np.asarray(ids, dtype=np.int32),
+                np.asarray(tfs, dtype=np.float32),
+                idf,
+            )
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """
+        クエリに関連するチャンクを検索する
+
+        Args:
+            query: 検索クエリ
+            top_k: 返すチャンク数
+
+        Returns:
+            (チャンク番号, スコア) のリスト（スコアの高い順）
+        """
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            ids, tfs, idf = posting
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[ids])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(chunk_id), float(scores[chunk_id])) for chunk_id in ranked]
+
+
+class DocumentIndexCache:
+    """コンテンツハッシュごとの検索インデックスを保持するLRUキャッシュ"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(
+        self, content_hash: str, load_text: Callable[[], str]
+    ) -> BM25Index:
+        """
+        インデックスを取得する（未作成の場合は抽出済みテキストから作成）
+
+        Args:
+            content_hash: ドキュメントのコンテンツハッシュ
+            load_text: 抽出済みテキストを返す関数
+
+        Returns:
+            BM25インデックス
+        """
+        with self._lock:
+            index = self._indexes.get(content_hash)
+            if index is not None:
+                self._indexes.move_to_end(content_hash)
+                return index
+
+        index = BM25Index(split_into_chunks(load_text()))
+
+        with self._lock:
+            self._indexes[content_hash] = index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index
+
+
+@lru_cache()
+def get_document_index_cache() -> DocumentIndexCache:
+    """DocumentIndexCacheのインスタンスを取得する（キャッシュ付き）"""
+    return DocumentIndexCache(get_settings().document_index_cache_size)
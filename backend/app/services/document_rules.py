@@ -0,0 +1,414 @@
+"""
+表データの自動チェック（ルールエンジン）
+集計の検算・キー重複・型と書式の一貫性・必須セルの空欄・外れ値をpandas/NumPyの
+ベクトル演算で検出し、LLMに渡す簡潔な指摘事項にまとめる
+"""
+
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+# 合計行・合計列とみなす見出し（セル全体が一致する場合のみ）
+_TOTAL_LABEL = re.compile(
+    r"^\s*(合計|総計|小計|計|total|grand total|subtotal)\s*$", re.I
+)
+_SUBTOTAL_LABEL = re.compile(r"^\s*(小計|subtotal)\s*$", re.I)
+_TOTAL_COLUMN = re.compile(r"(合計|総計|小計|^計|total)\s*$", re.I)
+
+# キー列とみなす見出し
+_KEY_COLUMN = re.compile(r"((?<![a-z])(id|no\.?|code|key)|番号|コード|キー)\s*$", re.I)
+
+# 必須列を表す見出しの記号
+_REQUIRED_MARK = re.compile(r"(\*|＊|※|必須)")
+
+# ルールごとに報告する該当箇所の最大数
+_MAX_EXAMPLES = 5
+
+
+class Finding(NamedTuple):
+    """チェックで検出した指摘事項"""
+
+    rule: str
+    column: Optional[str]
+    count: int
+    message: str
+    examples: List[str]
+
+
+def _data_row(index: int) -> str:
+    """DataFrameの行位置を報告用の行番号に変換（見出しの次を1行目とする）"""
+    return f"{index + 1}行目"
+
+
+def _examples(positions: np.ndarray, describe: Callable[[int], str]) -> List[str]:
+    """該当箇所のうち先頭の数件を報告用の文字列に変換"""
+    return [describe(int(position)) for position in positions[:_MAX_EXAMPLES]]
+
+
+def _numeric_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """各列を数値に変換（変換できないセルや日付・真偽値の列はNaN）"""
+    columns = {}
+    for position, column in enumerate(df.columns):
+        values = df.iloc[:, position]
+        if values.dtype == object or (
+            is_numeric_dtype(values) and not is_bool_dtype(values)
+        ):
+            columns[position] = pd.to_numeric(values, errors="coerce")
+        else:
+            columns[position] = pd.Series(np.nan, index=df.index)
+    numeric = pd.DataFrame(columns, index=df.index)
+    numeric.columns = df.columns
+    return numeric
+
+
+def _total_rows(df: pd.DataFrame) -> np.ndarray:
+    """合計・小計の見出しを含む行をブール配列で返す"""
+    mask = np.zeros(len(df), dtype=bool)
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == object:
+            mask |= values.astype(str).str.match(_TOTAL_LABEL).to_numpy()
+    return mask
+
+
+def check_cross_footing(
+    df: pd.DataFrame, numeric: pd.DataFrame, total_rows: np.ndarray
+) -> List[Finding]:
+    """
+    合計行・合計列の値が明細の合計と一致するか検算する
+
+    小計行は直前の合計行以降の明細の和、合計行はそれに加えて直前の総計以降の
+    明細全体の和・小計の和のいずれかと一致すれば正しいとみなす。
+    """
+    findings: List[Finding] = []
+    values = numeric.to_numpy(dtype=float)
+    filled = np.nan_to_num(values)
+
+    # 合計行の検算（列方向）
+    detail_cumsum = np.cumsum(np.where(total_rows[:, None], 0.0, filled), axis=0)
+    subtotal_rows = np.zeros(len(df), dtype=bool)
+    for column in df.columns:
+        if df[column].dtype == object:
+            subtotal_rows |= (
+                df[column].astype(str).str.match(_SUBTOTAL_LABEL).to_numpy()
+            )
+    subtotal_cumsum = np.cumsum(np.where(subtotal_rows[:, None], filled, 0.0), axis=0)
+
+    def cumulative(cumsum: np.ndarray, end: int, start: int) -> np.ndarray:
+        upper = cumsum[end - 1] if end > 0 else 0.0
+        lower = cumsum[start] if start >= 0 else 0.0
+        return upper - lower
+
+    mismatches = []
+    previous_total = -1
+    previous_grand_total = -1
+    for row in np.flatnonzero(total_rows):
+        actual = values[row]
+        candidates = [cumulative(detail_cumsum, row, previous_total)]
+        if not subtotal_rows[row]:
+            candidates.append(cumulative(detail_cumsum, row, previous_grand_total))
+            candidates.append(cumulative(subtotal_cumsum, row, previous_grand_total))
+            previous_grand_total = row
+        previous_total = row
+
+        matched = np.zeros(len(actual), dtype=bool)
+        for expected in candidates:
+            matched |= np.isclose(actual, expected, rtol=1e-9, atol=0.01)
+        for position in np.flatnonzero(~matched & ~np.isnan(actual)):
+            column = df.columns[position]
+            if numeric[column].notna().sum() > 1:
+                mismatches.append(
+                    f"{_data_row(row)}「{column}」: 記載 {actual[position]:g} / "
+                    f"明細の合計 {candidates[0][position]:g}"
+                )
+
+    if mismatches:
+        findings.append(
+            Finding(
+                "集計の検算",
+                None,
+                len(mismatches),
+                "合計行の値が明細の合計と一致しません",
+                mismatches[:_MAX_EXAMPLES],
+            )
+        )
+
+    # 合計列の検算（行方向）: 合計列より左にある、直前の合計列以降の数値列の和と比較
+    detail_start = 0
+    for position, column in enumerate(df.columns):
+        if not _TOTAL_COLUMN.search(str(column)):
+            continue
+
+        parts = [
+            name
+            for name in df.columns[detail_start:position]
+            if numeric[name].notna().any() and not _KEY_COLUMN.search(str(name))
+        ]
+        detail_start = position + 1
+        if len(parts) < 2:
+            continue
+
+        actual = numeric[column].to_numpy(dtype=float)
+        expected = numeric[parts].sum(axis=1, min_count=1).to_numpy(dtype=float)
+        # 数値以外の値を含む行は型の不一致として別に報告するため検算しない
+        has_text = (df[parts].notna() & numeric[parts].isna()).any(axis=1).to_numpy()
+        wrong = np.flatnonzero(
+            ~np.isnan(actual)
+            & ~np.isnan(expected)
+            & ~has_text
+            & ~np.isclose(actual, expected, rtol=1e-9, atol=0.01)
+        )
+        if len(wrong):
+            findings.append(
+                Finding(
+                    "集計の検算",
+                    str(column),
+                    len(wrong),
+                    f"合計列が{', '.join(map(str, parts))}の和と一致しません",
+                    _examples(
+                        wrong,
+                        lambda row: (
+                            f"{_data_row(row)}: 記載 {actual[row]:g} / 計算値 {expected[row]:g}"
+                        ),
+                    ),
+                )
+            )
+
+    return findings
+
+
+def _key_column(df: pd.DataFrame, total_rows: np.ndarray) -> Optional[str]:
+    """キー列を推定（見出しがID・番号などの列、なければほぼ一意な先頭列）"""
+    for column in df.columns:
+        if _KEY_COLUMN.search(str(column)):
+            return column
+
+    if len(df.columns) == 0:
+        return None
+    first = df[df.columns[0]][~total_rows].dropna()
+    if len(first) >= 10 and first.nunique() >= 0.95 * len(first):
+        return df.columns[0]
+    return None
+
+
+def check_duplicate_keys(df: pd.DataFrame, total_rows: np.ndarray) -> List[Finding]:
+    """キー列の値が重複していないか確認"""
+    column = _key_column(df, total_rows)
+    if column is None:
+        return []
+
+    keys = df[column].where(~total_rows)
+    duplicated = keys.notna() & keys.duplicated(keep=False)
+    if not duplicated.any():
+        return []
+
+    groups = keys[duplicated].groupby(keys[duplicated], sort=False).groups
+    examples = [
+        f"{value}: {', '.join(_data_row(int(row)) for row in rows[:_MAX_EXAMPLES])}"
+        for value, rows in list(groups.items())[:_MAX_EXAMPLES]
+    ]
+    return [
+        Finding(
+            "キーの重複",
+            str(column),
+            len(groups),
+            f"{len(groups)}種類の値が重複しています",
+            examples,
+        )
+    ]
+
+
+def check_consistency(
+    df: pd.DataFrame, numeric: pd.DataFrame, total_rows: np.ndarray
+) -> List[Finding]:
+    """
+    列内の型と書式の一貫性を確認する
+
+    数値列に文字列が混在している場合と、コードや日付などの書式（数字・英字の並び）が
+    大半と異なるセルを検出する。
+    """
+    findings: List[Finding] = []
+
+    for column in df.columns:
+        values = df[column][~total_rows]
+        present = values.notna()
+        count = int(present.sum())
+        if count < 5 or values.dtype != object:
+            continue
+
+        # 型の一貫性（大半が数値なのに数値でないセルがある）
+        is_number = numeric[column][~total_rows].notna()
+        number_ratio = is_number[present].mean()
+        if 0.8 <= number_ratio < 1:
+            wrong = np.flatnonzero((present & ~is_number).to_numpy())
+            findings.append(
+                Finding(
+                    "型の不一致",
+                    str(column),
+                    len(wrong),
+                    "数値列に数値以外の値が含まれています",
+                    _examples(
+                        wrong,
+                        lambda row: (
+                            f"{_data_row(values.index[row])}: {values.iloc[row]!r}"
+                        ),
+                    ),
+                )
+            )
+            continue
+
+        # 書式の一貫性（連続する数字を9、英字をaに置き換えたパターンで比較）
+        texts = values[present].astype(str)
+        if texts.str.len().median() > 20 or not texts.str.contains(r"\d").any():
+            continue
+        patterns = texts.str.replace(r"\d+", "9", regex=True).str.replace(
+            r"[A-Za-z]", "a", regex=True
+        )
+        frequencies = patterns.value_counts()
+        if frequencies.iloc[0] / count < 0.8 or len(frequencies) == 1:
+            continue
+
+        wrong_index = patterns.index[patterns != frequencies.index[0]]
+        findings.append(
+            Finding(
+                "書式の不一致",
+                str(column),
+                len(wrong_index),
+                f"大半の値と書式が異なります（主な書式: {frequencies.index[0]}）",
+                [
+                    f"{_data_row(index)}: {values[index]!r}"
+                    for index in wrong_index[:_MAX_EXAMPLES]
+                ],
+            )
+        )
+
+    return findings
+
+
+def check_required_cells(df: pd.DataFrame, total_rows: np.ndarray) -> List[Finding]:
+    """
+    必須セルの空欄を確認する
+
+    見出しに必須の記号がある列と、9割以上のセルが埋まっている列を必須とみなす。
+    """
+    findings: List[Finding] = []
+    details = df[~total_rows]
+    if len(details) < 5:
+        return findings
+
+    fill_ratio = details.notna().mean()
+    for column in df.columns:
+        required = _REQUIRED_MARK.search(str(column)) or fill_ratio[column] >= 0.9
+        empty = details[column].isna()
+        if not required or not empty.any() or fill_ratio[column] == 0:
+            continue
+
+        rows = details.index[empty.to_numpy()]
+        findings.append(
+            Finding(
+                "必須セルの空欄",
+                str(column),
+                len(rows),
+                "値が入力されていないセルがあります",
+                [_data_row(row) for row in rows[:_MAX_EXAMPLES]],
+            )
+        )
+
+    return findings
+
+
+def check_outliers(
+    df: pd.DataFrame, numeric: pd.DataFrame, total_rows: np.ndarray
+) -> List[Finding]:
+    """
+    数値列の外れ値を確認する（中央値と中央絶対偏差によるロバストなZスコア）
+    """
+    findings: List[Finding] = []
+    details = numeric[~total_rows]
+
+    for column in df.columns:
+        if _TOTAL_COLUMN.search(str(column)) or _KEY_COLUMN.search(str(column)):
+            continue
+
+        values = details[column].to_numpy(dtype=float)
+        valid = values[~np.isnan(values)]
+        if len(valid) < 10:
+            continue
+
+        median = np.median(valid)
+        mad = np.median(np.abs(valid - median))
+        if mad == 0:
+            continue
+
+        scores = np.abs(values - median) / (1.4826 * mad)
+        outliers = np.flatnonzero(scores > 3.5)
+        if len(outliers):
+            outliers = outliers[np.argsort(-scores[outliers])]
+            findings.append(
+                Finding(
+                    "外れ値",
+                    str(column),
+                    len(outliers),
+                    f"他の値から大きく外れています（中央値 {median:g}）",
+                    [
+                        f"{_data_row(details.index[row])}: {values[row]:g}"
+                        for row in outliers[:_MAX_EXAMPLES]
+                    ],
+                )
+            )
+
+    return findings
+
+
+def run_checks(df: pd.DataFrame) -> List[Finding]:
+    """
+    シートに全ルールを適用する
+
+    Args:
+        df: シートのDataFrame
+
+    Returns:
+        指摘事項のリスト
+    """
+    if df.empty:
+        return []
+
+    df = df.reset_index(drop=True)
+    numeric = _numeric_frame(df)
+    total_rows = _total_rows(df)
+
+    return [
+        *check_cross_footing(df, numeric, total_rows),
+        *check_duplicate_keys(df, total_rows),
+        *check_consistency(df, numeric, total_rows),
+        *check_required_cells(df, total_rows),
+        *check_outliers(df, numeric, total_rows),
+    ]
+
+
+def format_findings(findings: Dict[str, List[Finding]]) -> str:
+    """
+    シートごとの指摘事項を簡潔なレポートに整形する
+
+    Args:
+        findings: シート名と指摘事項のリストの対応
+
+    Returns:
+        レポートテキスト
+    """
+    lines = []
+    for sheet_name, sheet_findings in findings.items():
+        lines.append(f"[シート: {sheet_name}]")
+        if not sheet_findings:
+            lines.append("- 指摘事項はありません")
+        for finding in sheet_findings:
+            target = f"「{finding.column}」" if finding.column else ""
+            lines.append(
+                f"- {finding.rule}{target}: {finding.message}（{finding.count}件）"
+            )
+            lines.extend(f"    - {example}" for example in finding.examples)
+        lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,141 @@
+"""
+ドキュメント検索用の埋め込み（Embedding）生成
+オフラインで動作するハッシュ方式と、設定済みプロバイダーの埋め込みAPIを切り替えて使用する
+"""
+
+import zlib
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+from app.core.settings import get_settings
+from app.services.document_index import tokenize
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    特徴量ハッシングによる埋め込み（外部APIを使用しない既定の方式）
+
+    トークンをハッシュで固定次元に割り当てるため、語彙の学習や保存が不要。
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        """
+        テキストを正規化済みのfloat32行列に変換する
+
+        Args:
+            texts: テキストのリスト
+
+        Returns:
+            (テキスト数, 次元数) の行列
+        """
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(token.encode("utf-8")) for token in tokenize(text)),
+                dtype=np.uint32,
+            )
+            if len(hashes) == 0:
+                continue
+            # 最上位ビットを符号に使い、ハッシュ衝突による偏りを打ち消す
+            signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dimensions, signs)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_matrix(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_matrix([text])[0].tolist()
+
+
+def get_embeddings() -> Embeddings:
+    """
+    設定に基づいて埋め込みインスタンスを生成する
+
+    Returns:
+        Embeddings互換のインスタンス
+    """
+    settings = get_settings()
+    provider = settings.embedding_provider
+
+    # OpenAIのクライアントは読み込みに時間がかかるため、使用するプロバイダーのみインポートする
+    if provider == "azure":
+        from langchain_openai import AzureOpenAIEmbeddings
+
+        try:
+            return AzureOpenAIEmbeddings(
+                azure_deployment=settings.azure_openai_embedding_deployment_name,
+                api_version=settings.azure_openai_api_version,
+                api_key=settings.azure_openai_api_key,
+                azure_endpoint=settings.azure_openai_endpoint,
+            )
+        except Exception as e:
+            logger.error(f"Azure OpenAI Embeddings初期化エラー: {str(e)}")
+            raise ValueError(f"Azure OpenAI Embeddingsの初期化に失敗しました: {str(e)}")
+    elif provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        try:
+            return OpenAIEmbeddings(
+                model=settings.openai_embedding_model_name,
+                api_key=settings.openai_api_key,
+            )
+        except Exception as e:
+            logger.error(f"OpenAI Embeddings初期化エラー: {str(e)}")
+            raise ValueError(f"OpenAI Embeddingsの初期化に失敗しました: {str(e)}")
+    else:
+        # オフラインのハッシュ方式
+        return HashingEmbeddings(settings.embedding_dimensions)
+
+
+def get_embedding_model_id() -> str:
+    """
+    埋め込みモデルの識別子を取得する（モデルが変わったらインデックスを作り直すため）
+
+    Returns:
+        プロバイダーとモデルを表す文字列
+    """
+    settings = get_settings()
+    if settings.embedding_provider == "azure":
+        return f"azure:{settings.azure_openai_embedding_deployment_name}"
+    if settings.embedding_provider == "openai":
+        return f"openai:{settings.openai_embedding_model_name}"
+    return f"hashing:{settings.embedding_dimensions}"
+
+
+def embed_texts(embeddings: Embeddings, texts: List[str]) -> np.ndarray:
+    """
+    テキストをバッチ単位で埋め込み、正規化済みのfloat32行列として返す
+
+    Args:
+        embeddings: 埋め込みインスタンス
+        texts: テキストのリスト
+
+    Returns:
+        (テキスト数, 次元数) の行列（各行のL2ノルムは1）
+    """
+    if isinstance(embeddings, HashingEmbeddings):
+        return embeddings.embed_matrix(texts)
+
+    batch_size = max(1, get_settings().embedding_batch_size)
+    batches = [
+        np.asarray(embeddings.embed_documents(texts[i : i + batch_size]), np.float32)
+        for i in range(0, len(texts), batch_size)
+    ]
+    matrix = np.vstack(batches) if batches else np.zeros((0, 0), np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+@lru_cache()
+def get_cached_embeddings() -> Embeddings:
+    """埋め込みインスタンスを取得する（キャッシュ付き）"""
+    return get_embeddings()
@@ -0,0 +1,210 @@
+"""
+Excelブックのストリーミング読み込み
+ブックを1回だけ開き、全シートを同じハンドルから一定行数のブロックごとに読み込む
+"""
+
+import os
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+from openpyxl import load_workbook
+
+
+class ExcelSheet:
+    """シートの行を一定行数のDataFrameブロックとして順に返すクラス"""
+
+    def __init__(
+        self,
+        name: str,
+        columns: List[str],
+        rows: Iterator[Sequence[Any]],
+        block_rows: int,
+        max_rows: Optional[int],
+    ):
+        self.name = name
+        self.columns = columns
+        self.block_rows = block_rows
+        self.max_rows = max_rows
+        # 読み込み済みの行数と、上限で打ち切ったかどうか（ブロックを読み終えた後に確定）
+        self.row_count = 0
+        self.truncated = False
+        self._rows = rows
+
+    def iter_blocks(self) -> Iterator[pd.DataFrame]:
+        """
+        シートの行をブロックごとに返す（上限行数に達したら打ち切る）
+
+        Returns:
+            ブロックごとのDataFrameのイテレータ
+        """
+        while True:
+            limit = self.block_rows
+            if self.max_rows is not None:
+                limit = min(limit, self.max_rows - self.row_count)
+                if limit <= 0:
+                    # 上限の直後にまだ行が残っているか確認
+                    self.truncated = next(self._rows, None) is not None
+                    return
+
+            block = list(islice(self._rows, limit))
+            if not block:
+                return
+
+            self.row_count += len(block)
+            yield pd.DataFrame(block, columns=self.columns)
+
+    def read_frame(self) -> pd.DataFrame:
+        """
+        シート全体（上限行数まで）を1つのDataFrameとして読み込む
+
+        Returns:
+            シートのDataFrame
+        """
+        blocks = list(self.iter_blocks())
+        if not blocks:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(blocks, ignore_index=True)
+
+
+def _make_columns(header: Sequence[Any]) -> List[str]:
+    """見出し行から列名を作成（pandas.read_excelと同じく空欄・重複を補完）"""
+    columns: List[str] = []
+    seen: Dict[str, int] = {}
+    for index, value in enumerate(header):
+        name = f"Unnamed: {index}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _iter_values(rows: Iterator[Sequence[Any]], width: int) -> Iterator[Sequence[Any]]:
+    """空行を除いたセルの値を、見出しの列数に揃えて返す"""
+    for row in rows:
+        if all(value is None for value in row):
+            continue
+        if len(row) < width:
+            row = row + (None,) * (width - len(row))
+        yield row[:width]
+
+
+def _is_selected(name: str, index: int, sheets: Optional[List[str]]) -> bool:
+    """シート名または1始まりの番号が指定に含まれるか判定"""
+    if not sheets:
+        return True
+    return name in sheets or str(index) in sheets
+
+
+@contextmanager
+def open_excel(
+    file_path: str,
+    block_rows: int = 1000,
+    max_rows: Optional[int] = None,
+    sheets: Optional[List[str]] = None,
+    rows: Optional[List[Optional[int]]] = None,
+) -> Iterator[Iterator[ExcelSheet]]:
+    """
+    Excelブックを1回だけ開き、シートを順に読み込むイテレータを返す
+
+    .xlsxは読み取り専用モードで行をストリーミングし、シート全体をメモリに載せない。
+    読み取り専用モードに対応していない.xlsは開いたハンドルからシートごとに解析する。
+    指定されていないシートは解析しない。
+
+    Args:
+        file_path: Excelファイルのパス
+        block_rows: 1ブロックあたりの行数
+        max_rows: シートごとの最大行数（省略時は全行）
+        sheets: 読み込むシート名または1始まりの番号（省略時は全シート）
+        rows: 読み込むデータ行の範囲 [開始, 終了]（1始まり、見出し行を除く）
+
+    Returns:
+        ExcelSheetのイテレータ（with文の中でのみ有効）
+    """
+    if os.path.splitext(file_path)[1].lower() != ".xlsx":
+        with pd.ExcelFile(file_path) as excel:
+            yield _iter_legacy_sheets(excel, block_rows, max_rows, sheets, rows)
+        return
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield _iter_sheets(workbook, block_rows, max_rows, sheets, rows)
+    finally:
+        workbook.close()
+
+
+def _iter_sheets(
+    workbook: Any,
+    block_rows: int,
+    max_rows: Optional[int],
+    sheets: Optional[List[str]],
+    row_range: Optional[List[Optional[int]]],
+) -> Iterator[ExcelSheet]:
+    """読み取り専用ブックのシートを順に返す"""
+    for index, worksheet in enumerate(workbook.worksheets, 1):
+        if not _is_selected(worksheet.title, index, sheets):
+            continue
+
+        if row_range:
+            # 見出し行を読んだ後、指定範囲の行のみを読み込む（シート上の行は見出し分ずれる）
+            start, end = row_range
+            columns = _make_columns(
+                next(worksheet.iter_rows(max_row=1, values_only=True), ())
+            )
+            rows = worksheet.iter_rows(
+                min_row=start + 1,
+                max_row=end + 1 if end else None,
+                values_only=True,
+            )
+        else:
+            # 見出し行とデータ行を同じ行イテレータから読み、シートのXMLを1回だけ走査する
+            rows = worksheet.iter_rows(values_only=True)
+            columns = _make_columns(next(rows, ()))
+
+        yield ExcelSheet(
+            worksheet.title,
+            columns,
+            _iter_values(rows, len(columns)),
+            block_rows,
+            max_rows,
+        )
+
+
+def _iter_legacy_sheets(
+    excel: pd.ExcelFile,
+    block_rows: int,
+    max_rows: Optional[int],
+    sheets: Optional[List[str]],
+    row_range: Optional[List[Optional[int]]],
+) -> Iterator[ExcelSheet]:
+    """.xlsのシートを開いたハンドルから順に返す"""
+    start, end = row_range or (1, None)
+    for index, sheet_name in enumerate(excel.sheet_names, 1):
+        if not _is_selected(str(sheet_name), index, sheets):
+            continue
+
+        # 打ち切りを判定できるよう上限より1行多く読む
+        limits = [
+            limit
+            for limit in (
+                max_rows + 1 if max_rows is not None else None,
+                end - start + 1 if end else None,
+            )
+            if limit is not None
+        ]
+        df = excel.parse(
+            sheet_name,
+            skiprows=range(1, start) if start > 1 else None,
+            nrows=min(limits) if limits else None,
+        )
+        yield ExcelSheet(
+            str(sheet_name),
+            [str(column) for column in df.columns],
+            df.itertuples(index=False, name=None),
+            block_rows,
+            max_rows,
+        )
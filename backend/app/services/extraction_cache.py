@@ -0,0 +1,226 @@
+"""
+ファイル抽出結果のキャッシュ
+コンテンツハッシュ・抽出器バージョン・オプションをキーに抽出済みテキストを保存する
+（メモリ上のLRUと、zstd圧縮したディスクキャッシュの2段構成）
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import zstandard
+from app.config import EXTRACTION_CACHE_DIR
+from app.core.settings import get_settings
+from loguru import logger
+
+
+class ExtractionCache:
+    """抽出済みテキストのキャッシュクラス"""
+
+    def __init__(self, cache_dir: str, memory_limit_bytes: int, disk_limit_bytes: int):
+        self.cache_dir = cache_dir
+        self.memory_limit_bytes = memory_limit_bytes
+        self.disk_limit_bytes = disk_limit_bytes
+        self._lock = threading.Lock()
+        # メモリ上のエントリ（値はテキストとUTF-8でのバイト数）
+        self._memory: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        # ディスク上のエントリ（最終アクセス順、値はファイルサイズ）
+        self._disk_entries: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_disk_index()
+
+    def _load_disk_index(self) -> None:
+        """既存のキャッシュファイルを最終アクセスの古い順に読み込む"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".zst"):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk_entries[key] = size
+            self._disk_bytes += size
+
+    @staticmethod
+    def make_key(content_hash: str, version: str, options: Dict[str, Any]) -> str:
+        """キャッシュキーを生成（内容ごとに削除できるよう、コンテンツハッシュを先頭に置く）"""
+        raw = f"{version}:{json.dumps(options, sort_keys=True)}"
+        return f"{content_hash}-{hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.zst")
+
+    def get(
+        self, content_hash: str, version: str, options: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        キャッシュから抽出結果を取得する
+
+        Args:
+            content_hash: ファイル内容のハッシュ
+            version: 抽出器のバージョン
+            options: 抽出オプション
+
+        Returns:
+            抽出済みテキスト（キャッシュにない場合はNone）
+        """
+        key = self.make_key(content_hash, version, options)
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+
+            # インデックスにないエントリも、他のワーカープロセスが書き込んでいれば使用する
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                text = zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+                os.utime(path)
+            except FileNotFoundError:
+                self._disk_bytes -= self._disk_entries.pop(key, 0)
+                self.stats["misses"] += 1
+                return None
+            except (OSError, zstandard.ZstdError, UnicodeDecodeError) as e:
+                logger.warning(f"抽出キャッシュの読み込みエラー: {str(e)}")
+                self._disk_bytes -= self._disk_entries.pop(key, 0)
+                self.stats["misses"] += 1
+                return None
+
+            self._disk_bytes += len(data) - self._disk_entries.pop(key, 0)
+            self._disk_entries[key] = len(data)
+            self._remember(key, text)
+            self.stats["disk_hits"] += 1
+            return text
+
+    def put(
+        self, content_hash: str, version: str, options: Dict[str, Any], text: str
+    ) -> None:
+        """
+        抽出結果をキャッシュに保存する
+
+        Args:
+            content_hash: ファイル内容のハッシュ
+            version: 抽出器のバージョン
+            options: 抽出オプション
+            text: 抽出済みテキスト
+        """
+        key = self.make_key(content_hash, version, options)
+        encoded = text.encode("utf-8")
+        data = zstandard.ZstdCompressor(level=3).compress(encoded)
+
+        with self._lock:
+            path = self._path(key)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except OSError as e:
+                logger.warning(f"抽出キャッシュの書き込みエラー: {str(e)}")
+                return
+
+            self._disk_bytes += len(data) - self._disk_entries.pop(key, 0)
+            self._disk_entries[key] = len(data)
+            self._remember(key, text, len(encoded))
+            self._evict_disk()
+
+    def _remember(self, key: str, text: str, size: Optional[int] = None) -> None:
+        """メモリ上のLRUに追加し、上限を超えた分を削除（サイズはUTF-8のバイト数）"""
+        if size is None:
+            size = len(text.encode("utf-8"))
+        if size > self.memory_limit_bytes:
+            return
+
+        self._forget(key)
+        self._memory[key] = (text, size)
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.memory_limit_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+
+    def _forget(self, key: str) -> None:
+        """メモリ上のエントリを削除"""
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[1]
+
+    def discard(self, content_hash: str) -> int:
+        """
+        ファイル内容に対応する抽出結果をすべて削除する（元のファイルを削除した後に使用）
+
+        Args:
+            content_hash: ファイル内容のハッシュ
+
+        Returns:
+            削除したエントリ数
+        """
+        prefix = f"{content_hash}-"
+        with self._lock:
+            keys = {key for key in self._disk_entries if key.startswith(prefix)}
+            # 他のワーカープロセスが書き込んだエントリも削除する
+            try:
+                with os.scandir(os.path.dirname(self._path(prefix))) as entries:
+                    keys.update(
+                        entry.name[:-4]
+                        for entry in entries
+                        if entry.name.startswith(prefix) and entry.name.endswith(".zst")
+                    )
+            except FileNotFoundError:
+                pass
+
+            for key in keys:
+                self._disk_bytes -= self._disk_entries.pop(key, 0)
+                self._forget(key)
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+        return len(keys)
+
+    def _evict_disk(self) -> None:
+        """ディスク上限を超えた分を最終アクセスの古いものから削除"""
+        while self._disk_bytes > self.disk_limit_bytes and self._disk_entries:
+            key, size = self._disk_entries.popitem(last=False)
+            self._disk_bytes -= size
+            self._forget(key)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self.stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュの統計情報を取得"""
+        with self._lock:
+            return {
+                **self.stats,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk_entries),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+@lru_cache()
+def get_extraction_cache() -> ExtractionCache:
+    """ExtractionCacheのインスタンスを取得する（キャッシュ付き）"""
+    settings = get_settings()
+    return ExtractionCache(
+        EXTRACTION_CACHE_DIR,
+        settings.extraction_cache_memory_bytes,
+        settings.extraction_cache_disk_bytes,
+    )
@@ -0,0 +1,101 @@
+"""
+アップロード時のバックグラウンド抽出
+ファイル保存直後に抽出を開始し、ツール実行時には完了済みの結果を利用する
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from app.core.settings import get_settings
+from app.services.upload_store import (
+    EXTRACTION_COMPLETED,
+    EXTRACTION_FAILED,
+    EXTRACTION_PENDING,
+    EXTRACTION_UNSUPPORTED,
+    get_upload_store,
+)
+from loguru import logger
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending: Dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """抽出用のワーカープールを取得"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_settings().extraction_workers,
+            thread_name_prefix="extraction",
+        )
+    return _executor
+
+
+def _extract(file_path: str) -> str:
+    """ワーカー上で抽出を実行し、結果を抽出キャッシュに保存する"""
+    from app.agent.tools.file_processor import FileProcessorTool
+
+    try:
+        content = FileProcessorTool().extract(file_path)
+    except Exception:
+        get_upload_store().set_extraction_status(file_path, EXTRACTION_FAILED)
+        raise
+
+    get_upload_store().set_extraction_status(file_path, EXTRACTION_COMPLETED)
+    logger.info(f"バックグラウンド抽出が完了しました: {os.path.basename(file_path)}")
+    return content
+
+
+def schedule_extraction(file_path: str) -> Optional[Future]:
+    """
+    ファイルの抽出をバックグラウンドで開始する
+
+    Args:
+        file_path: 保存済みファイルのパス
+
+    Returns:
+        抽出処理のFuture（抽出対象外のファイルの場合はNone）
+    """
+    from app.agent.tools.file_processor import FileProcessorTool
+
+    key = os.path.abspath(file_path)
+    if not FileProcessorTool.supports(file_path):
+        get_upload_store().set_extraction_status(key, EXTRACTION_UNSUPPORTED)
+        return None
+
+    with _lock:
+        future = _pending.get(key)
+        if future is not None:
+            return future
+        get_upload_store().set_extraction_status(key, EXTRACTION_PENDING)
+        future = _get_executor().submit(_extract, key)
+        _pending[key] = future
+
+    # 完了済みのFutureではコールバックが即座に実行されるため、ロックの外で登録する
+    future.add_done_callback(lambda done: _release(key, done))
+    return future
+
+
+def _release(key: str, future: Future) -> None:
+    """完了した抽出を待機リストから削除（結果は抽出キャッシュから取得される）"""
+    with _lock:
+        # 後から同じファイルの抽出が登録されていれば残す
+        if _pending.get(key) is future:
+            del _pending[key]
+
+
+def get_pending_extraction(file_path: str) -> Optional[Future]:
+    """実行中のバックグラウンド抽出を取得（存在しない場合はNone）"""
+    with _lock:
+        return _pending.get(os.path.abspath(file_path))
+
+
+def shutdown_extraction_workers() -> None:
+    """ワーカープールを停止する"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
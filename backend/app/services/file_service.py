@@ -1,59 +1,156 @@
+import asyncio
+import hashlib
 import os
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import aiofiles
+import aiofiles.os
 from app.config import UPLOAD_DIR
 from app.core.settings import get_settings
-from app.models.chat import FileInfo
+from app.models.chat import ChunkedUploadStatus, FileInfo
+from app.services.upload_gc import discard_derived_data
+from app.services.upload_store import PARTIAL_DIR, get_upload_store
 from fastapi import HTTPException, UploadFile, status
 from loguru import logger
 
+# アップロードを読み書きするチャンクサイズ
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
-async def save_uploaded_file(file: UploadFile) -> str:
+# 分割アップロードごとのチャンク書き込みのロック（同じ位置への同時書き込みを防ぐ）
+_chunk_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def _stream_to_temp_file(file: UploadFile, max_size: int) -> Tuple[str, int, str]:
     """
-    アップロードされたファイルを保存し、ファイルパスを返す
+    アップロードをチャンク単位で一時ファイルに書き込む
+
+    メモリ上には1チャンク分のみを保持し、書き込みと同時にハッシュを計算する。
+    上限サイズを超えた時点で書き込みを中止する。
 
     Args:
         file: アップロードされたファイル
+        max_size: 許可する最大サイズ（バイト）
 
     Returns:
-        保存されたファイルのパス
+        (一時ファイルのパス, ファイルサイズ, SHA-256ハッシュ)
 
     Raises:
-        HTTPException: ファイル保存に失敗した場合
+        HTTPException: サイズ超過または書き込みに失敗した場合
     """
-    settings = get_settings()
+    # 書き込み途中のファイルが配信されないよう、公開ディレクトリの外に書き込む
+    temp_path = os.path.join(PARTIAL_DIR, f".{uuid.uuid4().hex}.part")
+    await aiofiles.os.makedirs(PARTIAL_DIR, exist_ok=True)
+    hasher = hashlib.sha256()
+    size = 0
 
-    # ファイル拡張子の確認
-    file_ext = Path(file.filename).suffix.replace(".", "").lower()
-    if file_ext not in settings.allowed_extensions:
+    try:
+        async with aiofiles.open(temp_path, "wb") as out_file:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"ファイルサイズが大きすぎます。上限: {max_size / (1024 * 1024)}MB",
+                    )
+                hasher.update(chunk)
+                await out_file.write(chunk)
+    except HTTPException:
+        await _remove_quietly(temp_path)
+        raise
+    except Exception as e:
+        await _remove_quietly(temp_path)
+        logger.error(f"ファイル保存エラー: {str(e)}")
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"ファイル形式が許可されていません。許可される拡張子: {', '.join(settings.allowed_extensions)}",
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"ファイル保存中にエラーが発生しました: {str(e)}",
         )
 
-    # ファイルサイズの確認
-    content = await file.read()
-    await file.seek(0)  # ファイルポインタをリセット
-    if len(content) > settings.max_upload_size:
+    return temp_path, size, hasher.hexdigest()
+
+
+async def _remove_quietly(file_path: str) -> None:
+    """ファイルが存在すれば削除する（エラーは無視）"""
+    try:
+        await aiofiles.os.remove(file_path)
+    except OSError:
+        pass
+
+
+def _validate_extension(filename: str) -> str:
+    """
+    ファイル名の拡張子が許可されているか確認する
+
+    Args:
+        filename: ファイル名
+
+    Returns:
+        小文字の拡張子（ドットなし）
+
+    Raises:
+        HTTPException: 許可されていない拡張子の場合
+    """
+    allowed_extensions = get_settings().allowed_extensions
+    file_ext = Path(filename).suffix.replace(".", "").lower()
+    if file_ext not in allowed_extensions:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"ファイルサイズが大きすぎます。上限: {settings.max_upload_size / (1024 * 1024)}MB",
+            detail=f"ファイル形式が許可されていません。許可される拡張子: {', '.join(allowed_extensions)}",
         )
+    return file_ext
+
 
-    # ユニークなファイル名の生成
-    unique_filename = f"{uuid.uuid4().hex}_{Path(file.filename).name}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
+async def _register_upload(
+    temp_path: str,
+    filename: str,
+    file_size: int,
+    content_hash: str,
+    session_id: Optional[str],
+) -> str:
+    """
+    書き込み済みの一時ファイルをアップロードとして登録し、ファイルパスを返す
+
+    Args:
+        temp_path: 書き込み済みの一時ファイルのパス
+        filename: 元のファイル名
+        file_size: ファイルサイズ
+        content_hash: 内容のSHA-256ハッシュ
+        session_id: アップロードしたセッションのID
+
+    Returns:
+        保存されたファイルのパス
+
+    Raises:
+        HTTPException: 登録に失敗した場合
+    """
+    # ユニークなファイル名の生成（1ディレクトリのエントリ数を抑えるためIDの先頭2文字で分散）
+    file_id = uuid.uuid4().hex
+    filename = Path(filename).name
+    file_path = os.path.join(UPLOAD_DIR, file_id[:2], f"{file_id}_{filename}")
 
     try:
-        # ファイルを保存
-        async with aiofiles.open(file_path, "wb") as out_file:
-            await out_file.write(content)
+        # 内容のハッシュでblobとして登録（同一内容のファイルは実体を共有）
+        deduplicated = await asyncio.to_thread(
+            get_upload_store().add_upload,
+            file_id,
+            filename,
+            file_path,
+            content_hash,
+            file_size,
+            temp_path,
+            Path(filename).suffix.replace(".", "").lower(),
+            session_id,
+        )
 
-        logger.info(f"ファイルを保存しました: {file_path}")
+        logger.info(
+            f"ファイルを保存しました: {file_path} ({file_size}バイト, sha256={content_hash}"
+            f"{', 既存の内容と重複' if deduplicated else ''})"
+        )
         return file_path
     except Exception as e:
+        await _remove_quietly(temp_path)
         logger.error(f"ファイル保存エラー: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -61,16 +158,342 @@ async def save_uploaded_file(file: UploadFile) -> str:
         )
 
 
+async def save_uploaded_file(file: UploadFile, session_id: Optional[str] = None) -> str:
+    """
+    アップロードされたファイルを保存し、ファイルパスを返す
+
+    Args:
+        file: アップロードされたファイル
+        session_id: アップロードしたセッションのID（オプション）
+
+    Returns:
+        保存されたファイルのパス
+
+    Raises:
+        HTTPException: ファイル保存に失敗した場合
+    """
+    # ファイル拡張子の確認
+    _validate_extension(file.filename)
+
+    # 一時ファイルへストリーミング保存（サイズ超過時は途中で中止）
+    temp_path, file_size, content_hash = await _stream_to_temp_file(
+        file, get_settings().max_upload_size
+    )
+
+    return await _register_upload(
+        temp_path, file.filename, file_size, content_hash, session_id
+    )
+
+
+async def save_uploaded_files(
+    files: List[UploadFile], session_id: Optional[str] = None
+) -> List[str]:
+    """
+    複数のアップロードファイルを並行して保存し、ファイルパスを返す
+
+    同時に保存するファイル数は設定値で制限する。いずれかの保存に失敗した場合は、
+    保存済みのファイルを削除してから例外を送出する。
+
+    Args:
+        files: アップロードされたファイルのリスト
+        session_id: アップロードしたセッションのID（オプション）
+
+    Returns:
+        保存されたファイルのパス（filesと同じ順序）
+
+    Raises:
+        HTTPException: いずれかのファイルの保存に失敗した場合
+    """
+    semaphore = asyncio.Semaphore(get_settings().upload_save_concurrency)
+
+    async def save(file: UploadFile) -> str:
+        async with semaphore:
+            return await save_uploaded_file(file, session_id)
+
+    results = await asyncio.gather(
+        *(save(file) for file in files), return_exceptions=True
+    )
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        await asyncio.gather(
+            *(
+                delete_file(result)
+                for result in results
+                if not isinstance(result, BaseException)
+            )
+        )
+        raise errors[0]
+
+    return list(results)
+
+
+def _to_chunked_status(upload: Dict[str, Any]) -> ChunkedUploadStatus:
+    """分割アップロードの登録情報を状態モデルに変換"""
+    return ChunkedUploadStatus(
+        upload_id=upload["upload_id"],
+        filename=upload["filename"],
+        size=upload["size"],
+        received=upload["received"],
+        chunk_size=get_settings().upload_chunk_size,
+    )
+
+
+async def _get_chunked_upload(upload_id: str) -> Dict[str, Any]:
+    """分割アップロードの登録情報を取得（存在しない場合は404）"""
+    upload = await asyncio.to_thread(get_upload_store().get_chunked_upload, upload_id)
+    if upload is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="分割アップロードが見つかりません。最初からアップロードし直してください",
+        )
+    return upload
+
+
+@asynccontextmanager
+async def _lock_chunked_upload(upload_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    分割アップロードのロックを取得し、ロック中に最新の登録情報を返す
+
+    存在しないIDに対してはロックを作成しない（任意のIDによるロックの蓄積を防ぐ）。
+    """
+    await _get_chunked_upload(upload_id)
+    async with _chunk_locks.setdefault(upload_id, asyncio.Lock()):
+        try:
+            upload = await _get_chunked_upload(upload_id)
+        except HTTPException:
+            _chunk_locks.pop(upload_id, None)
+            raise
+        yield upload
+
+
+def release_chunk_locks(upload_ids: List[str]) -> None:
+    """
+    削除された分割アップロードのロックを破棄する（期限切れの削除後に使用）
+
+    Args:
+        upload_ids: 分割アップロードのID
+    """
+    for upload_id in upload_ids:
+        _chunk_locks.pop(upload_id, None)
+
+
+async def init_chunked_upload(
+    filename: str, size: int, session_id: Optional[str] = None
+) -> ChunkedUploadStatus:
+    """
+    分割アップロードを開始する
+
+    Args:
+        filename: 元のファイル名
+        size: ファイル全体のサイズ（バイト）
+        session_id: アップロードしたセッションのID（オプション）
+
+    Returns:
+        分割アップロードの状態
+
+    Raises:
+        HTTPException: 拡張子・サイズが許可されていない場合
+    """
+    _validate_extension(filename)
+
+    max_size = get_settings().max_chunked_upload_size
+    if size <= 0 or size > max_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"ファイルサイズが不正です。上限: {max_size / (1024 * 1024)}MB",
+        )
+
+    upload_id = uuid.uuid4().hex
+    temp_path = os.path.join(PARTIAL_DIR, f"{upload_id}.part")
+    await aiofiles.os.makedirs(PARTIAL_DIR, exist_ok=True)
+    async with aiofiles.open(temp_path, "wb"):
+        pass
+
+    await asyncio.to_thread(
+        get_upload_store().create_chunked_upload,
+        upload_id,
+        Path(filename).name,
+        size,
+        temp_path,
+        session_id,
+    )
+    logger.info(
+        f"分割アップロードを開始しました: {upload_id} ({filename}, {size}バイト)"
+    )
+    return await get_chunked_upload_status(upload_id)
+
+
+async def get_chunked_upload_status(upload_id: str) -> ChunkedUploadStatus:
+    """
+    分割アップロードの状態を取得する（再開時は受信済みバイト数から送信を再開する）
+
+    Args:
+        upload_id: 分割アップロードのID
+
+    Returns:
+        分割アップロードの状態
+    """
+    return _to_chunked_status(await _get_chunked_upload(upload_id))
+
+
+async def write_upload_chunk(
+    upload_id: str, offset: int, chunks: AsyncIterator[bytes]
+) -> ChunkedUploadStatus:
+    """
+    受信したチャンクを一時ファイルの指定位置に直接書き込む
+
+    メモリ上には受信した分のみを保持する。通信が途中で切断された場合も、
+    書き込めた分までを受信済みとして記録し、その位置から再開できるようにする。
+
+    Args:
+        upload_id: 分割アップロードのID
+        offset: チャンクの書き込み開始位置（受信済みバイト数以下であること）
+        chunks: リクエスト本文のストリーム
+
+    Returns:
+        分割アップロードの状態
+
+    Raises:
+        HTTPException: 位置・サイズが不正な場合
+    """
+    chunk_limit = get_settings().upload_chunk_size
+
+    async with _lock_chunked_upload(upload_id) as upload:
+        if offset < 0 or offset > upload["received"]:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"書き込み位置が不正です。再開位置: {upload['received']}",
+            )
+
+        written = 0
+        try:
+            async with aiofiles.open(upload["temp_path"], "r+b") as out_file:
+                await out_file.seek(offset)
+                async for data in chunks:
+                    if written + len(data) > chunk_limit:
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"チャンクが大きすぎます。上限: {chunk_limit}バイト",
+                        )
+                    if offset + written + len(data) > upload["size"]:
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="チャンクがファイルサイズを超えています",
+                        )
+                    await out_file.write(data)
+                    written += len(data)
+        finally:
+            # 切断・エラー時も書き込めた分までは再送不要
+            upload["received"] = max(upload["received"], offset + written)
+            await asyncio.to_thread(
+                get_upload_store().update_chunked_upload,
+                upload_id,
+                upload["received"],
+            )
+
+    return _to_chunked_status(upload)
+
+
+def _hash_file(file_path: str) -> str:
+    """ファイルのSHA-256ハッシュを計算"""
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+async def finalize_chunked_upload(upload_id: str, sha256: str) -> str:
+    """
+    全チャンクの受信を確認し、内容のハッシュを検証してアップロードとして登録する
+
+    Args:
+        upload_id: 分割アップロードのID
+        sha256: クライアントが計算したファイル全体のSHA-256ハッシュ
+
+    Returns:
+        保存されたファイルのパス
+
+    Raises:
+        HTTPException: 未受信のチャンクがある、またはハッシュが一致しない場合
+    """
+    async with _lock_chunked_upload(upload_id) as upload:
+        if upload["received"] < upload["size"]:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"未受信のチャンクがあります。再開位置: {upload['received']}",
+            )
+
+        content_hash = await asyncio.to_thread(_hash_file, upload["temp_path"])
+        if content_hash != sha256.strip().lower():
+            await abort_chunked_upload(upload_id)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="ファイルのハッシュが一致しません。最初からアップロードし直してください",
+            )
+
+        await asyncio.to_thread(get_upload_store().delete_chunked_upload, upload_id)
+        _chunk_locks.pop(upload_id, None)
+
+    return await _register_upload(
+        upload["temp_path"],
+        upload["filename"],
+        upload["size"],
+        content_hash,
+        upload["session_id"],
+    )
+
+
+async def abort_chunked_upload(upload_id: str) -> bool:
+    """
+    分割アップロードを中止し、一時ファイルを削除する
+
+    Args:
+        upload_id: 分割アップロードのID
+
+    Returns:
+        分割アップロードが存在し削除された場合はTrue
+    """
+    upload = await asyncio.to_thread(get_upload_store().get_chunked_upload, upload_id)
+    if upload is None:
+        return False
+
+    await asyncio.to_thread(get_upload_store().delete_chunked_upload, upload_id)
+    await _remove_quietly(upload["temp_path"])
+    _chunk_locks.pop(upload_id, None)
+    logger.info(f"分割アップロードを中止しました: {upload_id}")
+    return True
+
+
+def _to_file_info(upload: Dict[str, Any]) -> FileInfo:
+    """アップロードの登録情報をファイル情報に変換"""
+    return FileInfo(
+        file_id=upload["file_id"],
+        filename=upload["filename"],
+        file_path=upload["file_path"],
+        file_size=upload["size"],
+        file_type=upload["content_type"],
+        extraction_status=upload["extraction_status"],
+    )
+
+
 async def get_file_info(file_path: str) -> FileInfo:
     """
     ファイルパスからファイル情報を取得する
 
+    登録済みのアップロードはカタログから取得し、ファイルシステムを参照しない。
+
     Args:
         file_path: ファイルパス
 
     Returns:
         ファイル情報
     """
+    upload = await asyncio.to_thread(get_upload_store().get_upload_by_path, file_path)
+    if upload is not None:
+        return _to_file_info(upload)
+
     if not os.path.exists(file_path):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="ファイルが見つかりません"
@@ -90,6 +513,85 @@ async def get_file_info(file_path: str) -> FileInfo:
     )
 
 
+async def resolve_uploads(file_ids: List[str], session_id: str) -> List[FileInfo]:
+    """
+    アップロードIDから登録済みのファイル情報を取得する（再アップロードせずに添付するため）
+
+    Args:
+        file_ids: アップロードIDのリスト
+        session_id: 参照するセッションのID（このセッションのアップロードのみ参照可能）
+
+    Returns:
+        指定順のファイル情報（重複したIDは1つにまとめる）
+
+    Raises:
+        HTTPException: 存在しない・参照できないアップロードが含まれる場合
+    """
+    file_ids = list(dict.fromkeys(file_ids))
+    uploads = await asyncio.to_thread(get_upload_store().get_uploads, file_ids)
+
+    missing = [
+        file_id
+        for file_id in file_ids
+        if file_id not in uploads
+        or uploads[file_id]["session_id"] != session_id
+        or not os.path.exists(uploads[file_id]["file_path"])
+    ]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"指定されたファイルが見つかりません: {', '.join(missing)}",
+        )
+
+    # 最近利用したアップロードを保持期間・容量上限による削除の対象から外す
+    await asyncio.to_thread(get_upload_store().touch_uploads, file_ids)
+
+    return [_to_file_info(uploads[file_id]) for file_id in file_ids]
+
+
+async def get_upload_content(file_id: str, session_id: str) -> Tuple[str, str]:
+    """
+    セッションのアップロードの実体（blob）のパスを取得する（ダウンロード用）
+
+    Args:
+        file_id: アップロードID
+        session_id: 参照するセッションのID（他のセッションのアップロードは参照不可）
+
+    Returns:
+        (blobのパス, 元のファイル名)
+
+    Raises:
+        HTTPException: 存在しない・参照できないアップロードの場合
+    """
+    store = get_upload_store()
+    upload = await asyncio.to_thread(store.get_upload, file_id)
+    blob_path = store.blob_path(upload["content_hash"]) if upload else None
+    if (
+        upload is None
+        or upload["session_id"] != session_id
+        or not os.path.exists(blob_path)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"指定されたファイルが見つかりません: {file_id}",
+        )
+    return blob_path, upload["filename"]
+
+
+async def list_uploaded_files(session_id: str) -> List[FileInfo]:
+    """
+    セッションのアップロード一覧を取得する
+
+    Args:
+        session_id: セッションID
+
+    Returns:
+        新しい順のファイル情報
+    """
+    uploads = await asyncio.to_thread(get_upload_store().list_uploads, session_id)
+    return [_to_file_info(upload) for upload in uploads]
+
+
 async def delete_file(file_path: str) -> bool:
     """
     ファイルを削除する
@@ -101,6 +603,16 @@ async def delete_file(file_path: str) -> bool:
         削除成功の場合はTrue
     """
     try:
+        # 登録済みのアップロードは参照カウントを減らし、不要になったblobも削除
+        file_id = os.path.basename(file_path).split("_")[0]
+        released, removed = await asyncio.to_thread(
+            get_upload_store().release_upload, file_id
+        )
+        if released:
+            await asyncio.to_thread(discard_derived_data, removed)
+            logger.info(f"ファイルを削除しました: {file_path}")
+            return True
+
         if os.path.exists(file_path):
             os.remove(file_path)
             logger.info(f"ファイルを削除しました: {file_path}")
@@ -109,3 +621,26 @@ async def delete_file(file_path: str) -> bool:
     except Exception as e:
         logger.error(f"ファイル削除エラー: {str(e)}")
         return False
+
+
+async def delete_session_uploads(session_id: str) -> int:
+    """
+    セッションのアップロードをすべて削除する
+
+    Args:
+        session_id: セッションID
+
+    Returns:
+        削除したアップロード数
+    """
+    store = get_upload_store()
+    released, removed = await asyncio.to_thread(
+        store.release_session_uploads, session_id
+    )
+    await asyncio.to_thread(store.forget_session, session_id)
+    await asyncio.to_thread(discard_derived_data, removed)
+    if released:
+        logger.info(
+            f"セッション {session_id} のアップロードを削除しました: {len(released)}件"
+        )
+    return len(released)
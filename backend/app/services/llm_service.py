@@ -1,11 +1,9 @@
 from typing import Any, Dict, List, Optional
 
 import requests
-from langchain_community.chat_models import AzureChatOpenAI
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from langchain_core.outputs import ChatGeneration, ChatResult
-from langchain_openai import ChatOpenAI
 from loguru import logger
 
 
@@ -157,7 +155,10 @@ def get_llm(config: Dict[str, Any]) -> Any:
     """
     provider = config.get("provider", "azure")
 
+    # OpenAIのクライアントは読み込みに時間がかかるため、使用するプロバイダーのみインポートする
     if provider == "azure":
+        from langchain_community.chat_models import AzureChatOpenAI
+
         try:
             return AzureChatOpenAI(
                 deployment_name=config.get("deployment_name", ""),
@@ -170,6 +171,8 @@ def get_llm(config: Dict[str, Any]) -> Any:
             logger.error(f"Azure OpenAI初期化エラー: {str(e)}")
             raise ValueError(f"Azure OpenAIの初期化に失敗しました: {str(e)}")
     elif provider == "openai":
+        from langchain_openai import ChatOpenAI
+
         try:
             return ChatOpenAI(
                 model_name=config.get("model_name", "gpt-3.5-turbo"),
@@ -0,0 +1,276 @@
+"""
+ドキュメント解析用のプロセスプール
+CPU負荷の高い解析をAPIプロセスから分離し、タイムアウト・メモリ上限・
+ワーカーの定期的な再起動を適用する
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, List, Tuple
+
+from app.core.settings import get_settings
+from loguru import logger
+
+# ワーカーがジョブを受け取ってから開始を通知するまでの待ち時間（プロセスの起動・
+# モジュールのインポートを含むため、ジョブのタイムアウトとは別に扱う）
+_START_TIMEOUT_SECONDS = 60.0
+
+
+class ParserTimeoutError(Exception):
+    """解析ジョブがタイムアウトした場合の例外"""
+
+
+class ParserCrashError(Exception):
+    """解析ワーカーが異常終了した場合の例外"""
+
+
+def _init_worker(memory_limit_bytes: int) -> None:
+    """ワーカープロセスの初期化（メモリ上限の設定）"""
+    if memory_limit_bytes <= 0:
+        return
+
+    try:
+        import resource
+    except ImportError:
+        # Windowsではメモリ上限を設定できない
+        return
+
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+
+
+def _worker_main(conn: Any, memory_limit_bytes: int) -> None:
+    """
+    ワーカープロセスのメインループ
+
+    ジョブを受け取るたびに開始を通知し、実行結果（または例外）を返す。
+    Noneを受け取るか接続が閉じられると終了する。
+    """
+    _init_worker(memory_limit_bytes)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        except Exception as e:
+            # 関数のインポートに失敗した場合など
+            conn.send(("error", e))
+            continue
+        if task is None:
+            break
+
+        fn, args = task
+        conn.send(("started", None))
+        try:
+            result = ("ok", fn(*args))
+        except Exception as e:
+            result = ("error", e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # 戻り値・例外をpickleできない場合
+            conn.send(("error", RuntimeError(str(e))))
+
+
+class _Worker:
+    """1つのジョブを同時に実行するワーカープロセス"""
+
+    def __init__(self, context: Any, memory_limit_bytes: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_limit_bytes), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self) -> None:
+        """ワーカーを正常終了させる"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.conn.close()
+
+    def kill(self) -> None:
+        """ワーカーを強制終了する（ハングしたジョブの中断）"""
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ParserPool:
+    """解析ジョブを実行するプロセスプール"""
+
+    def __init__(
+        self,
+        size: int,
+        timeout_seconds: float,
+        memory_limit_bytes: int,
+        max_jobs_per_worker: int,
+    ):
+        self.size = size
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_bytes = memory_limit_bytes
+        self.max_jobs_per_worker = max_jobs_per_worker
+        # 親プロセスのスレッド・ロックの状態を引き継がないようspawnで起動する
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: List[_Worker] = []
+        self._slots = threading.BoundedSemaphore(max(size, 1))
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _acquire(self) -> _Worker:
+        """空いているワーカーを取得（なければ起動）。空きがない場合は待機する"""
+        self._slots.acquire()
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.kill()
+
+        try:
+            return _Worker(self._context, self.memory_limit_bytes)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, worker: _Worker, healthy: bool) -> None:
+        """ワーカーをプールに戻す（異常時・処理件数の上限到達時は終了させる）"""
+        reusable = (
+            healthy
+            and not self._closed
+            and not (
+                self.max_jobs_per_worker and worker.jobs >= self.max_jobs_per_worker
+            )
+        )
+        with self._lock:
+            if reusable:
+                self._idle.append(worker)
+        if not reusable:
+            if healthy:
+                worker.stop()
+            else:
+                worker.kill()
+        self._slots.release()
+
+    def _receive(self, worker: _Worker, timeout: float) -> Tuple[str, Any]:
+        """ワーカーからの通知を待つ"""
+        if not worker.conn.poll(timeout):
+            raise ParserTimeoutError(
+                f"parser timeout: ファイルの解析が{self.timeout_seconds}秒以内に完了しませんでした"
+            )
+        try:
+            return worker.conn.recv()
+        except (EOFError, OSError):
+            raise ParserCrashError("解析ワーカーが異常終了しました")
+
+    def _execute(self, fn: Callable[..., Any], args: Tuple[Any, ...]) -> Any:
+        """
+        1つの解析ジョブをワーカーで実行する
+
+        タイムアウトはワーカーがジョブを開始した時点から計測し、
+        タイムアウト・異常終了したワーカーのみを終了させる。
+        """
+        worker = self._acquire()
+        healthy = False
+        try:
+            try:
+                worker.conn.send((fn, args))
+            except OSError:
+                raise ParserCrashError("解析ワーカーが異常終了しました")
+            worker.jobs += 1
+
+            status, payload = self._receive(worker, _START_TIMEOUT_SECONDS)
+            if status == "started":
+                status, payload = self._receive(worker, self.timeout_seconds)
+            # メモリ上限に達したワーカーは断片化したメモリを解放するため再起動する
+            healthy = not isinstance(payload, MemoryError)
+
+        except ParserTimeoutError:
+            logger.error(f"解析ジョブがタイムアウトしました: {self.timeout_seconds}秒")
+            raise
+        except ParserCrashError:
+            logger.error("解析ワーカーが異常終了しました")
+            raise
+        finally:
+            self._release(worker, healthy)
+
+        if status == "error":
+            if isinstance(payload, MemoryError):
+                logger.error("解析ワーカーがメモリ上限に達しました")
+                raise MemoryError("parser memory limit exceeded")
+            raise payload
+        return payload
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        解析ジョブをワーカープロセスで実行し、結果を返す
+
+        Args:
+            fn: モジュールレベルの関数（ワーカーへpickleで渡される）
+            *args: 関数の引数
+
+        Returns:
+            関数の戻り値
+
+        Raises:
+            ParserTimeoutError: タイムアウトした場合
+            ParserCrashError: ワーカーが異常終了した場合
+        """
+        if self.size <= 0:
+            # プールが無効な場合はプロセス内で実行
+            return fn(*args)
+        return self._execute(fn, args)
+
+    def map(
+        self, fn: Callable[..., Any], args_list: List[Tuple[Any, ...]]
+    ) -> List[Any]:
+        """
+        複数の解析ジョブを並列に実行し、投入順に結果を返す
+
+        Args:
+            fn: モジュールレベルの関数（ワーカーへpickleで渡される）
+            args_list: ジョブごとの引数のリスト
+
+        Returns:
+            ジョブごとの戻り値のリスト（args_listと同じ順序）
+
+        Raises:
+            ParserTimeoutError: いずれかのジョブがタイムアウトした場合
+            ParserCrashError: ワーカーが異常終了した場合
+        """
+        if self.size <= 0:
+            # プールが無効な場合はプロセス内で実行
+            return [fn(*args) for args in args_list]
+
+        threads = ThreadPoolExecutor(max_workers=max(min(len(args_list), self.size), 1))
+        futures = [threads.submit(self._execute, fn, args) for args in args_list]
+        try:
+            return [future.result() for future in futures]
+        finally:
+            # 失敗時に未開始のジョブが無駄に実行されないようにする
+            threads.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        """プロセスプールを停止する（実行中のジョブは完了後にワーカーを終了する）"""
+        with self._lock:
+            self._closed = True
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.stop()
+
+
+@lru_cache()
+def get_parser_pool() -> ParserPool:
+    """ParserPoolのインスタンスを取得する（キャッシュ付き）"""
+    settings = get_settings()
+    return ParserPool(
+        size=settings.parser_pool_size,
+        timeout_seconds=settings.parser_job_timeout_seconds,
+        memory_limit_bytes=settings.parser_memory_limit_mb * 1024 * 1024,
+        max_jobs_per_worker=settings.parser_max_jobs_per_worker,
+    )
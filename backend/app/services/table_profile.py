@@ -0,0 +1,194 @@
+"""
+表データの統計プロファイル
+CSV・Excelをブロックごとに読み込みながら列ごとの統計量を集計し、全行を出力する代わりに
+数KB程度の要約を作成する
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import (
+    is_bool_dtype,
+    is_datetime64_any_dtype,
+    is_numeric_dtype,
+)
+
+# 分位点の計算に使うサンプル行数（これ以下の行数なら分位点は厳密値）
+_RESERVOIR_ROWS = 10000
+
+# 代表サンプルとして出力する行数
+_SAMPLE_ROWS = 5
+
+# 頻出値として出力する件数と、値の出現数を数え続ける種類数の上限
+_TOP_VALUES = 5
+_MAX_TRACKED_VALUES = 10000
+
+
+class _ColumnStats:
+    """1列分の集計値"""
+
+    def __init__(self):
+        self.dtypes: List[str] = []
+        self.count = 0
+        self.nulls = 0
+        self.numeric = True
+        # 数値の件数・平均・偏差平方和（ブロックごとの値をChanの方法で統合する）
+        self.numeric_count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min: Any = None
+        self.max: Any = None
+        # 値ごとの出現数（種類が上限を超えたらNoneにして集計をやめる）
+        self.value_counts: Optional[Dict[Any, int]] = {}
+
+    def update(self, values: pd.Series) -> None:
+        """ブロック内の列の値を集計に加える"""
+        dtype = str(values.dtype)
+        if dtype not in self.dtypes:
+            self.dtypes.append(dtype)
+
+        present = values.dropna()
+        self.count += len(values)
+        self.nulls += len(values) - len(present)
+        if present.empty:
+            return
+
+        is_number = is_numeric_dtype(values) and not is_bool_dtype(values)
+        self.numeric = self.numeric and is_number
+        if is_number:
+            self._merge_numbers(present.to_numpy(dtype=float))
+
+        if is_number or is_datetime64_any_dtype(values):
+            low, high = present.min(), present.max()
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+
+        if self.value_counts is not None and not is_number:
+            for value, count in present.value_counts(sort=False).items():
+                self.value_counts[value] = self.value_counts.get(value, 0) + count
+            if len(self.value_counts) > _MAX_TRACKED_VALUES:
+                self.value_counts = None
+
+    def _merge_numbers(self, numbers: np.ndarray) -> None:
+        """
+        ブロックの数値の平均・偏差平方和を集計に統合する
+
+        値の合計と二乗和から分散を求めると、平均に比べて分散が小さい列で桁落ちするため、
+        ブロック内の偏差平方和を求めてから並列版のWelfordの方法（Chan et al.）で統合する。
+        """
+        count = len(numbers)
+        mean = float(numbers.mean())
+        m2 = float(np.square(numbers - mean).sum())
+
+        total = self.numeric_count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.numeric_count * count / total
+        self.numeric_count = total
+
+
+class TableProfiler:
+    """
+    表データをブロックごとに受け取り、列ごとの統計量を集計するクラス
+
+    全行を保持せず、分位点と代表サンプルは一様な無作為抽出（リザーバーサンプリング）
+    で保持した行から計算するため、メモリ使用量は行数に依存しない。
+    """
+
+    def __init__(self, seed: int = 0):
+        self.row_count = 0
+        self.columns: Dict[str, _ColumnStats] = {}
+        self._rng = np.random.default_rng(seed)
+        self._reservoir: Optional[pd.DataFrame] = None
+        self._reservoir_keys = np.empty(0)
+
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        ブロックを集計に加える
+
+        Args:
+            df: 表データのブロック
+        """
+        if df.empty:
+            for column in df.columns:
+                self.columns.setdefault(str(column), _ColumnStats())
+            return
+
+        df = df.reset_index(drop=True)
+        df.columns = [str(column) for column in df.columns]
+        self.row_count += len(df)
+        for column in df.columns:
+            self.columns.setdefault(column, _ColumnStats()).update(df[column])
+
+        # 乱数キーの小さい順に上限行数を残すことで、全体からの無作為抽出と同等になる
+        keys = self._rng.random(len(df))
+        if self._reservoir is None:
+            candidates, candidate_keys = df, keys
+        else:
+            candidates = pd.concat([self._reservoir, df], ignore_index=True)
+            candidate_keys = np.concatenate([self._reservoir_keys, keys])
+        keep = np.argsort(candidate_keys, kind="stable")[:_RESERVOIR_ROWS]
+        self._reservoir = candidates.iloc[keep].reset_index(drop=True)
+        self._reservoir_keys = candidate_keys[keep]
+
+    def render(self) -> str:
+        """
+        集計結果をテキストに整形する
+
+        Returns:
+            列ごとの統計量と代表サンプル
+        """
+        lines = [f"レコード数: {self.row_count}", f"カラム数: {len(self.columns)}", ""]
+
+        for name, stats in self.columns.items():
+            lines.append(f"[カラム] {name} ({', '.join(stats.dtypes) or '不明'})")
+            null_ratio = stats.nulls / stats.count if stats.count else 0.0
+            lines.append(f"- 欠損: {stats.nulls} ({null_ratio:.1%})")
+
+            present = stats.count - stats.nulls
+            if stats.numeric and present:
+                # 標本標準偏差（pandasのstdと同じく自由度n-1で割る）
+                variance = (
+                    stats.m2 / (stats.numeric_count - 1)
+                    if stats.numeric_count > 1
+                    else 0.0
+                )
+                lines.append(
+                    f"- 最小: {stats.min:g} / 最大: {stats.max:g} / "
+                    f"平均: {stats.mean:g} / 標準偏差: {variance**0.5:g}"
+                )
+                values = pd.to_numeric(self._reservoir[name], errors="coerce").dropna()
+                if not values.empty:
+                    quantiles = np.quantile(
+                        values.to_numpy(dtype=float), [0.25, 0.5, 0.75]
+                    )
+                    lines.append(
+                        "- 分位点: "
+                        + " / ".join(
+                            f"{label}: {value:g}"
+                            for label, value in zip(("25%", "50%", "75%"), quantiles)
+                        )
+                    )
+            elif stats.min is not None:
+                lines.append(f"- 最小: {stats.min} / 最大: {stats.max}")
+
+            if stats.value_counts is None:
+                lines.append(f"- ユニーク数: {_MAX_TRACKED_VALUES}超")
+            elif stats.value_counts:
+                top = sorted(
+                    stats.value_counts.items(), key=lambda item: item[1], reverse=True
+                )[:_TOP_VALUES]
+                lines.append(f"- ユニーク数: {len(stats.value_counts)}")
+                lines.append(
+                    "- 上位の値: "
+                    + ", ".join(f"{value} ({count})" for value, count in top)
+                )
+            lines.append("")
+
+        if self._reservoir is not None and not self._reservoir.empty:
+            sample = self._reservoir.head(_SAMPLE_ROWS)
+            lines.append(f"代表サンプル（無作為抽出 {len(sample)}行）:")
+            lines.append(sample.to_string(index=False))
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,126 @@
+"""
+ツール実行結果のキャッシュ
+決定的な出力を返すツールの結果をセッション間で共有し、同じ入力での再実行を省略する
+"""
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.core.settings import get_settings
+
+
+class _Entry(NamedTuple):
+    """キャッシュのエントリ"""
+
+    tool_name: str
+    output: str
+    size: int  # UTF-8でのバイト数
+    expires_at: float
+
+
+class ToolResultCache:
+    """有効期限と合計サイズの上限を持つ、ツール実行結果のLRUキャッシュ"""
+
+    def __init__(self, max_bytes: int, default_ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.default_ttl_seconds = default_ttl_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # ツールごとの統計（hits, misses, stores, evictions, expired）
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+        )
+
+    def get(self, tool_name: str, key: str) -> Optional[str]:
+        """
+        キャッシュから実行結果を取得する
+
+        Args:
+            tool_name: ツール名
+            key: キャッシュキー
+
+        Returns:
+            実行結果（キャッシュにない・期限切れの場合はNone）
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at < time.monotonic():
+                self._remove(key)
+                self._stats[tool_name]["expired"] += 1
+                entry = None
+
+            if entry is None:
+                self._stats[tool_name]["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats[tool_name]["hits"] += 1
+            return entry.output
+
+    def put(
+        self,
+        tool_name: str,
+        key: str,
+        output: str,
+        ttl_seconds: Optional[float] = None,
+    ) -> None:
+        """
+        実行結果をキャッシュに保存し、上限を超えた分を古いものから削除する
+
+        Args:
+            tool_name: ツール名
+            key: キャッシュキー
+            output: 実行結果
+            ttl_seconds: 有効期間（秒、省略時は既定値）
+        """
+        size = len(output.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        ttl = self.default_ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(tool_name, output, size, time.monotonic() + ttl)
+            self._bytes += size
+            self._stats[tool_name]["stores"] += 1
+
+            while self._bytes > self.max_bytes:
+                evicted_key, evicted = next(iter(self._entries.items()))
+                self._remove(evicted_key)
+                self._stats[evicted.tool_name]["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        """エントリを削除（ロックを取得した状態で呼び出す）"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュの統計情報を取得（ツールごとのヒット率を含む）"""
+        with self._lock:
+            tools = {}
+            for tool_name, stats in self._stats.items():
+                lookups = stats["hits"] + stats["misses"]
+                tools[tool_name] = {
+                    **stats,
+                    "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+                }
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "tools": tools,
+            }
+
+
+@lru_cache()
+def get_tool_result_cache() -> ToolResultCache:
+    """ToolResultCacheのインスタンスを取得する（キャッシュ付き）"""
+    settings = get_settings()
+    return ToolResultCache(
+        settings.tool_cache_max_bytes, settings.tool_cache_ttl_seconds
+    )
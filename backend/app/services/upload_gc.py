@@ -0,0 +1,176 @@
+"""
+アップロードのバックグラウンド削除
+保持期間を過ぎたアップロードと容量上限を超えた分を削除し、内容から派生した抽出結果・検索インデックスも削除する
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+from app.config import UPLOAD_DIR
+from app.core.settings import get_settings
+from app.services.extraction_cache import get_extraction_cache
+from app.services.upload_store import PARTIAL_DIR, get_upload_store
+from loguru import logger
+
+# 書き込みが中断された一時ファイルを削除するまでの時間（秒）
+_STALE_TEMP_SECONDS = 3600
+
+_gc_task: Optional[asyncio.Task] = None
+
+
+def discard_derived_data(content_hashes: List[str]) -> None:
+    """
+    削除したblobの内容から派生した抽出結果と検索インデックスを削除する
+
+    Args:
+        content_hashes: 削除したblobのハッシュ
+    """
+    from app.services.vector_index import get_vector_index_store
+
+    for content_hash in content_hashes:
+        get_extraction_cache().discard(content_hash)
+        get_vector_index_store().discard(content_hash)
+
+
+def _remove_stale_temp_files(cutoff: float) -> int:
+    """書き込みが中断されたまま残った一時ファイルを削除（分割アップロードの一時ファイルは除く）"""
+    if not os.path.isdir(PARTIAL_DIR):
+        return 0
+
+    removed = 0
+    with os.scandir(PARTIAL_DIR) as entries:
+        for entry in entries:
+            if not (entry.name.startswith(".") and entry.name.endswith(".part")):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def _remove_untracked_files(cutoff: float) -> int:
+    """
+    どのアップロードにも登録されていないファイルを削除する
+
+    以前のバージョンで保存したファイル（UPLOAD_DIR直下の{uuid}_{ファイル名}）や、
+    登録の途中で中断したファイルが対象。作成中のハードリンクを削除しないよう、
+    inodeの変更時刻（リンクの作成で更新される）が十分古いものだけを削除する。
+    """
+    candidates: List[str] = []
+    for root, dirs, files in os.walk(UPLOAD_DIR):
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        for name in files:
+            # 以前は公開ディレクトリに書き込んでいた一時ファイル（.{uuid}.part）も対象とする
+            if name.startswith(".") and not name.endswith(".part"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                if os.stat(path).st_ctime < cutoff:
+                    candidates.append(os.path.abspath(path))
+            except FileNotFoundError:
+                pass
+
+    # 走査の後に登録を取得し、走査中に登録されたファイルを削除しないようにする
+    tracked = get_upload_store().get_upload_paths()
+    removed = 0
+    for path in candidates:
+        if path in tracked:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def collect_upload_garbage() -> Dict[str, int]:
+    """
+    保持期間を過ぎたアップロードと、容量上限を超えた分のアップロードを削除する
+
+    Returns:
+        削除件数（期限切れ・容量超過のアップロード数、blob数、一時ファイル数、
+        未登録のファイル数、再開されなかった分割アップロード数）
+    """
+    settings = get_settings()
+    store = get_upload_store()
+    now = time.time()
+
+    session_active_cutoff = now - settings.session_max_age_seconds
+    expired = store.find_expired_uploads(
+        now - settings.upload_retention_seconds,
+        now - settings.upload_session_retention_seconds,
+        session_active_cutoff,
+    )
+    released, removed = store.release_uploads(expired)
+    store.expire_sessions(session_active_cutoff)
+
+    # 容量上限を超えていれば、最終利用の古いものから削除
+    evicted, evicted_blobs = store.evict_to_quota(settings.upload_disk_quota_bytes)
+    removed += evicted_blobs
+
+    discard_derived_data(removed)
+
+    # 期限切れの分割アップロードは書き込み用のロックも破棄する
+    from app.services.file_service import release_chunk_locks
+
+    partial_uploads = store.expire_chunked_uploads(
+        now - settings.chunked_upload_expiry_seconds
+    )
+    release_chunk_locks(partial_uploads)
+
+    result = {
+        "expired": len(released),
+        "evicted": len(evicted),
+        "blobs": len(removed),
+        "temp_files": _remove_stale_temp_files(now - _STALE_TEMP_SECONDS),
+        "untracked_files": _remove_untracked_files(
+            now - settings.upload_session_retention_seconds
+        ),
+        "partial_uploads": len(partial_uploads),
+    }
+    if any(result.values()):
+        logger.info(
+            f"アップロードを削除しました: 期限切れ {result['expired']}件, "
+            f"容量超過 {result['evicted']}件, blob {result['blobs']}件, "
+            f"一時ファイル {result['temp_files']}件, "
+            f"未登録のファイル {result['untracked_files']}件, "
+            f"分割アップロード {result['partial_uploads']}件"
+        )
+    return result
+
+
+async def _gc_loop(interval_seconds: int) -> None:
+    """アップロードを定期的に削除するバックグラウンドループ"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(collect_upload_garbage)
+        except Exception as e:
+            logger.error(f"アップロード削除エラー: {str(e)}")
+
+
+def start_upload_gc() -> None:
+    """バックグラウンドのアップロード削除を開始する"""
+    global _gc_task
+    if _gc_task is None or _gc_task.done():
+        interval = get_settings().upload_gc_interval_seconds
+        _gc_task = asyncio.create_task(_gc_loop(interval))
+        logger.info(f"アップロードの定期削除を開始しました（間隔: {interval}秒）")
+
+
+async def stop_upload_gc() -> None:
+    """バックグラウンドのアップロード削除を停止する"""
+    global _gc_task
+    if _gc_task is not None:
+        _gc_task.cancel()
+        try:
+            await _gc_task
+        except asyncio.CancelledError:
+            pass
+        _gc_task = None
@@ -0,0 +1,622 @@
+"""
+コンテンツアドレス方式のアップロードストレージ
+同一内容のファイルは1つの実体（blob）を共有し、参照カウントで削除を管理する
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.config import DATA_DIR
+from loguru import logger
+
+UPLOAD_DB_PATH = os.path.join(DATA_DIR, "uploads.sqlite")
+# 内容のハッシュから推測できるため、blobは公開ディレクトリの外に置く
+BLOB_DIR = os.path.join(DATA_DIR, "upload_blobs")
+# 受信途中の分割アップロード（公開ディレクトリの外に置く）
+PARTIAL_DIR = os.path.join(DATA_DIR, "upload_partial")
+
+# 削除時に1トランザクションで処理するアップロード数（アップロードの待ち時間を抑える）
+_RELEASE_BATCH_SIZE = 100
+
+# 抽出状態
+EXTRACTION_PENDING = "pending"
+EXTRACTION_COMPLETED = "completed"
+EXTRACTION_FAILED = "failed"
+EXTRACTION_UNSUPPORTED = "unsupported"
+
+
+class UploadStore:
+    """アップロードの実体（blob）と参照（file_id）を管理するクラス"""
+
+    def __init__(self, db_path: str, blob_dir: str):
+        self.db_path = db_path
+        self.blob_dir = blob_dir
+        self._lock = threading.Lock()
+        # 複数ワーカーから同時に書き込まれるため、トランザクションは明示的に管理する
+        self._conn = sqlite3.connect(
+            db_path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._setup()
+
+    def _setup(self) -> None:
+        """テーブルとインデックスを作成"""
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                content_hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                ref_count INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS uploads (
+                file_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                content_hash TEXT NOT NULL REFERENCES blobs(content_hash),
+                created_at REAL NOT NULL,
+                size INTEGER,
+                content_type TEXT,
+                session_id TEXT,
+                extraction_status TEXT,
+                last_accessed_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS chunked_uploads (
+                upload_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                received INTEGER NOT NULL,
+                temp_path TEXT NOT NULL,
+                session_id TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunked_uploads_updated_at
+                ON chunked_uploads(updated_at);
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_seen_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_uploads_file_path ON uploads(file_path);
+            CREATE INDEX IF NOT EXISTS idx_uploads_content_hash ON uploads(content_hash);
+            CREATE INDEX IF NOT EXISTS idx_uploads_session_id
+                ON uploads(session_id, created_at);
+            CREATE INDEX IF NOT EXISTS idx_uploads_last_accessed_at
+                ON uploads(last_accessed_at);
+            """
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """書き込みトランザクション（他ワーカーとの競合を防ぐため即時ロック）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def blob_path(self, content_hash: str) -> str:
+        """コンテンツハッシュからblobのパスを取得"""
+        return os.path.join(self.blob_dir, content_hash[:2], content_hash)
+
+    def add_upload(
+        self,
+        file_id: str,
+        filename: str,
+        file_path: str,
+        content_hash: str,
+        size: int,
+        temp_path: str,
+        content_type: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> bool:
+        """
+        書き込み済みの一時ファイルをblobとして登録し、アップロードの参照を作成する
+
+        同じ内容のblobが既に存在する場合は一時ファイルを破棄して共有する。
+        アップロードのパスはblobへのハードリンクとして作成する。
+
+        Args:
+            file_id: アップロードID
+            filename: 元のファイル名
+            file_path: アップロードとして公開するパス
+            content_hash: 内容のSHA-256ハッシュ
+            size: ファイルサイズ
+            temp_path: 書き込み済みの一時ファイルのパス
+            content_type: ファイルの種類（拡張子）
+            session_id: アップロードしたセッションのID
+
+        Returns:
+            既存のblobと重複していた場合はTrue
+        """
+        blob_path = self.blob_path(content_hash)
+
+        with self._transaction() as conn:
+            deduplicated = os.path.exists(blob_path)
+            if deduplicated:
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                # 一時ファイルが別のファイルシステムにある場合はコピーして移動する
+                shutil.move(temp_path, blob_path)
+
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            _link_or_copy(blob_path, file_path)
+
+            now = time.time()
+            if session_id is not None:
+                _touch_session(conn, session_id, now)
+            conn.execute(
+                """
+                INSERT INTO blobs (content_hash, size, ref_count, created_at)
+                VALUES (?, ?, 1, ?)
+                ON CONFLICT(content_hash) DO UPDATE SET ref_count = ref_count + 1
+                """,
+                (content_hash, size, now),
+            )
+            conn.execute(
+                """
+                INSERT INTO uploads (
+                    file_id, filename, file_path, content_hash, created_at,
+                    size, content_type, session_id, last_accessed_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    file_id,
+                    filename,
+                    file_path,
+                    content_hash,
+                    now,
+                    size,
+                    content_type,
+                    session_id,
+                    now,
+                ),
+            )
+
+        return deduplicated
+
+    def release_upload(self, file_id: str) -> Tuple[bool, List[str]]:
+        """
+        アップロードの参照を削除し、参照がなくなったblobを削除する
+
+        Args:
+            file_id: アップロードID
+
+        Returns:
+            (アップロードが存在し削除された場合はTrue, 削除したblobのハッシュ)
+        """
+        released, removed = self.release_uploads([file_id])
+        return bool(released), removed
+
+    def release_uploads(self, file_ids: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        複数のアップロードの参照を削除し、参照がなくなったblobを削除する
+
+        Args:
+            file_ids: アップロードIDのリスト
+
+        Returns:
+            (削除したアップロードID, 削除したblobのハッシュ)
+        """
+        released: List[str] = []
+        removed: List[str] = []
+        for start in range(0, len(file_ids), _RELEASE_BATCH_SIZE):
+            with self._transaction() as conn:
+                for file_id in file_ids[start : start + _RELEASE_BATCH_SIZE]:
+                    row = conn.execute(
+                        "SELECT file_id, file_path, content_hash FROM uploads "
+                        "WHERE file_id = ?",
+                        (file_id,),
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    released.append(file_id)
+                    if self._release(conn, row):
+                        removed.append(row["content_hash"])
+        return released, removed
+
+    def _release(self, conn: sqlite3.Connection, row: sqlite3.Row) -> int:
+        """
+        トランザクション内でアップロードの参照を1件削除する
+
+        Returns:
+            参照がなくなり削除したblobのサイズ（blobが残る場合は0）
+        """
+        conn.execute("DELETE FROM uploads WHERE file_id = ?", (row["file_id"],))
+        conn.execute(
+            "UPDATE blobs SET ref_count = ref_count - 1 WHERE content_hash = ?",
+            (row["content_hash"],),
+        )
+        blob = conn.execute(
+            "SELECT size, ref_count FROM blobs WHERE content_hash = ?",
+            (row["content_hash"],),
+        ).fetchone()
+
+        _remove_if_exists(row["file_path"])
+
+        if blob is None or blob["ref_count"] > 0:
+            return 0
+
+        conn.execute("DELETE FROM blobs WHERE content_hash = ?", (row["content_hash"],))
+        _remove_if_exists(self.blob_path(row["content_hash"]))
+        logger.info(f"参照がなくなったblobを削除しました: {row['content_hash']}")
+        return blob["size"]
+
+    def find_expired_uploads(
+        self,
+        cutoff: float,
+        session_cutoff: float,
+        session_active_cutoff: float,
+    ) -> List[str]:
+        """
+        保持期間を過ぎたアップロードを取得する
+
+        セッションに紐づくアップロードは、セッションが終了していれば短い保持期間で期限切れとする。
+        セッションの実行状態は全ワーカーで共有するため、このストアの最終利用時刻で判定する。
+
+        Args:
+            cutoff: この時刻より前に最後に利用されたアップロードは期限切れ
+            session_cutoff: 終了したセッションのアップロードに適用する時刻
+            session_active_cutoff: この時刻より前に最後に利用されたセッションは終了とみなす
+
+        Returns:
+            期限切れのアップロードIDのリスト
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT uploads.file_id FROM uploads
+                LEFT JOIN sessions ON sessions.session_id = uploads.session_id
+                WHERE uploads.last_accessed_at < ?
+                    OR (
+                        uploads.session_id IS NOT NULL
+                        AND uploads.last_accessed_at < ?
+                        AND COALESCE(sessions.last_seen_at, 0) < ?
+                    )
+                """,
+                (cutoff, session_cutoff, session_active_cutoff),
+            ).fetchall()
+        return [row["file_id"] for row in rows]
+
+    def touch_session(self, session_id: str) -> None:
+        """
+        セッションの最終利用時刻を更新する（全ワーカーで共有する実行状態）
+
+        Args:
+            session_id: セッションID
+        """
+        with self._transaction() as conn:
+            _touch_session(conn, session_id, time.time())
+
+    def forget_session(self, session_id: str) -> None:
+        """削除したセッションの実行状態を破棄する"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            )
+
+    def expire_sessions(self, cutoff: float) -> int:
+        """
+        一定時間利用されていないセッションの実行状態を削除する
+
+        Args:
+            cutoff: この時刻より前に最後に利用されたセッションを削除
+
+        Returns:
+            削除したセッション数
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM sessions WHERE last_seen_at < ?", (cutoff,)
+            )
+        return cursor.rowcount
+
+    def get_upload_paths(self) -> Set[str]:
+        """登録されているアップロードのパスをすべて取得"""
+        with self._lock:
+            rows = self._conn.execute("SELECT file_path FROM uploads").fetchall()
+        return {os.path.abspath(row["file_path"]) for row in rows}
+
+    def evict_to_quota(self, quota_bytes: int) -> Tuple[List[str], List[str]]:
+        """
+        blobの合計サイズが上限を超えている間、最終利用の古いアップロードから削除する
+
+        blobは複数のアップロードで共有されるため、参照がなくなった時点で容量が解放される。
+
+        Args:
+            quota_bytes: blobの合計サイズの上限（バイト）
+
+        Returns:
+            (削除したアップロードID, 削除したblobのハッシュ)
+        """
+        released: List[str] = []
+        removed: List[str] = []
+        total = self.get_total_size()
+        while total > quota_bytes:
+            with self._transaction() as conn:
+                rows = conn.execute(
+                    "SELECT file_id, file_path, content_hash FROM uploads "
+                    "ORDER BY last_accessed_at LIMIT ?",
+                    (_RELEASE_BATCH_SIZE,),
+                ).fetchall()
+                for row in rows:
+                    if total <= quota_bytes:
+                        break
+                    released.append(row["file_id"])
+                    freed = self._release(conn, row)
+                    if freed:
+                        total -= freed
+                        removed.append(row["content_hash"])
+            if not rows:
+                break
+
+        return released, removed
+
+    def release_session_uploads(self, session_id: str) -> Tuple[List[str], List[str]]:
+        """
+        セッションのアップロードをすべて削除する
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            (削除したアップロードID, 削除したblobのハッシュ)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_id FROM uploads WHERE session_id = ?", (session_id,)
+            ).fetchall()
+        return self.release_uploads([row["file_id"] for row in rows])
+
+    def touch_uploads(self, file_ids: List[str]) -> None:
+        """
+        アップロードの最終利用時刻を更新する（保持期間・容量上限の判定に使用）
+
+        Args:
+            file_ids: アップロードIDのリスト
+        """
+        if not file_ids:
+            return
+        placeholders = ", ".join("?" * len(file_ids))
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE uploads SET last_accessed_at = ? "
+                f"WHERE file_id IN ({placeholders})",
+                [time.time(), *file_ids],
+            )
+
+    def create_chunked_upload(
+        self,
+        upload_id: str,
+        filename: str,
+        size: int,
+        temp_path: str,
+        session_id: Optional[str] = None,
+    ) -> None:
+        """
+        分割アップロードを登録する
+
+        Args:
+            upload_id: 分割アップロードのID
+            filename: 元のファイル名
+            size: ファイル全体のサイズ
+            temp_path: 受信したチャンクを書き込む一時ファイルのパス
+            session_id: アップロードしたセッションのID
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO chunked_uploads (
+                    upload_id, filename, size, received, temp_path, session_id,
+                    created_at, updated_at
+                )
+                VALUES (?, ?, ?, 0, ?, ?, ?, ?)
+                """,
+                (upload_id, filename, size, temp_path, session_id, now, now),
+            )
+
+    def get_chunked_upload(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """分割アップロードのIDから登録情報を取得"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM chunked_uploads WHERE upload_id = ?", (upload_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def update_chunked_upload(self, upload_id: str, received: int) -> None:
+        """
+        分割アップロードの受信済みバイト数を更新する
+
+        Args:
+            upload_id: 分割アップロードのID
+            received: 先頭から連続して受信済みのバイト数
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE chunked_uploads SET received = ?, updated_at = ? "
+                "WHERE upload_id = ?",
+                (received, time.time(), upload_id),
+            )
+
+    def delete_chunked_upload(self, upload_id: str) -> bool:
+        """
+        分割アップロードの登録を削除する（一時ファイルは呼び出し側で削除または移動する）
+
+        Args:
+            upload_id: 分割アップロードのID
+
+        Returns:
+            登録が存在し削除された場合はTrue
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM chunked_uploads WHERE upload_id = ?", (upload_id,)
+            )
+        return cursor.rowcount > 0
+
+    def expire_chunked_uploads(self, cutoff: float) -> List[str]:
+        """
+        一定時間更新されていない分割アップロードを一時ファイルとともに削除する
+
+        Args:
+            cutoff: この時刻より前に最後に更新された分割アップロードを削除
+
+        Returns:
+            削除した分割アップロードのID
+        """
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT upload_id, temp_path FROM chunked_uploads WHERE updated_at < ?",
+                (cutoff,),
+            ).fetchall()
+            for row in rows:
+                conn.execute(
+                    "DELETE FROM chunked_uploads WHERE upload_id = ?",
+                    (row["upload_id"],),
+                )
+                _remove_if_exists(row["temp_path"])
+        return [row["upload_id"] for row in rows]
+
+    def get_total_size(self) -> int:
+        """blobの合計サイズ（バイト）を取得"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()[0]
+
+    def get_upload(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """アップロードIDから登録情報を取得"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM uploads WHERE file_id = ?", (file_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_upload_by_path(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """アップロードのパスから登録情報を取得"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM uploads WHERE file_path = ?", (file_path,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_uploads(self, file_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        複数のアップロードIDから登録情報をまとめて取得する
+
+        Args:
+            file_ids: アップロードIDのリスト
+
+        Returns:
+            アップロードIDをキーとした登録情報（存在しないIDは含まない）
+        """
+        if not file_ids:
+            return {}
+        placeholders = ", ".join("?" * len(file_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM uploads WHERE file_id IN ({placeholders})",
+                list(file_ids),
+            ).fetchall()
+        return {row["file_id"]: dict(row) for row in rows}
+
+    def list_uploads(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        セッションのアップロードを新しい順に取得する
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            登録情報のリスト
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM uploads WHERE session_id = ? ORDER BY created_at DESC",
+                (session_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def set_extraction_status(self, file_path: str, extraction_status: str) -> None:
+        """
+        アップロードの抽出状態を更新する（未登録のパスは無視）
+
+        Args:
+            file_path: アップロードのパス
+            extraction_status: 抽出状態
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE uploads SET extraction_status = ? WHERE file_path = ?",
+                (extraction_status, file_path),
+            )
+
+
+def _touch_session(conn: sqlite3.Connection, session_id: str, now: float) -> None:
+    """トランザクション内でセッションの最終利用時刻を更新する"""
+    conn.execute(
+        """
+        INSERT INTO sessions (session_id, last_seen_at) VALUES (?, ?)
+        ON CONFLICT(session_id) DO UPDATE SET last_seen_at = excluded.last_seen_at
+        """,
+        (session_id, now),
+    )
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """ハードリンクを作成（未対応のファイルシステムではコピー）"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _remove_if_exists(file_path: str) -> None:
+    """ファイルが存在すれば削除"""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def get_content_hash(file_path: str) -> str:
+    """
+    ファイルのコンテンツハッシュを取得する
+
+    登録済みのアップロードはストアから取得し、それ以外はファイルを読んで計算する。
+
+    Args:
+        file_path: ファイルパス
+
+    Returns:
+        SHA-256ハッシュ（16進文字列）
+    """
+    upload = get_upload_store().get_upload_by_path(os.path.abspath(file_path))
+    if upload is not None:
+        return upload["content_hash"]
+
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+@lru_cache()
+def get_upload_store() -> UploadStore:
+    """UploadStoreのインスタンスを取得する（キャッシュ付き）"""
+    return UploadStore(UPLOAD_DB_PATH, BLOB_DIR)
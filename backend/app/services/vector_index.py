@@ -0,0 +1,186 @@
+"""
+ドキュメントチャンクのベクトルインデックス
+チャンクの埋め込みを1つの連続したfloat32行列として保存し、メモリマップで読み込んで
+行列積1回で類似度を計算する
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, List, Tuple
+
+import numpy as np
+from app.config import VECTOR_INDEX_DIR
+from app.core.settings import get_settings
+from loguru import logger
+
+
+class VectorIndex:
+    """正規化済み埋め込み行列に対するコサイン類似度検索"""
+
+    def __init__(self, matrix: np.ndarray):
+        self.matrix = matrix
+
+    def search_batch(
+        self, queries: np.ndarray, top_k: int = 5
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        複数のクエリをまとめて検索する
+
+        Args:
+            queries: (クエリ数, 次元数) のクエリ埋め込み
+            top_k: クエリごとに返すチャンク数
+
+        Returns:
+            クエリごとの (チャンク番号, スコア) のリスト（スコアの高い順）
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        queries = queries / np.maximum(
+            np.linalg.norm(queries, axis=1, keepdims=True), 1e-12
+        )
+
+        chunk_count = self.matrix.shape[0]
+        if chunk_count == 0:
+            return [[] for _ in range(len(queries))]
+
+        # (クエリ数, チャンク数) の類似度を1回の行列積で計算
+        scores = queries @ self.matrix.T
+        k = min(top_k, chunk_count)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return [
+            [(int(i), float(s)) for i, s in zip(ids, row_scores)]
+            for ids, row_scores in zip(top, top_scores)
+        ]
+
+    def search(self, query: np.ndarray, top_k: int = 5) -> List[Tuple[int, float]]:
+        """
+        クエリに類似するチャンクを検索する
+
+        Args:
+            query: クエリの埋め込み
+            top_k: 返すチャンク数
+
+        Returns:
+            (チャンク番号, スコア) のリスト（スコアの高い順）
+        """
+        return self.search_batch(query, top_k)[0]
+
+
+class VectorIndexStore:
+    """ベクトルインデックスをディスクに保存し、開いたインデックスをLRUで保持するクラス"""
+
+    def __init__(self, index_dir: str, max_entries: int):
+        self.index_dir = index_dir
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[str, VectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(index_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.index_dir, key[:2], f"{key}.npy")
+
+    @staticmethod
+    def make_key(document_key: str, model_id: str) -> str:
+        """
+        ドキュメントと埋め込みモデルからインデックスのキーを生成
+
+        document_keyは「コンテンツハッシュ:抽出器バージョン」の形式で、
+        内容ごとに削除できるようコンテンツハッシュをキーの先頭に置く。
+        """
+        content_hash = document_key.split(":", 1)[0]
+        digest = hashlib.sha256(f"{document_key}:{model_id}".encode("utf-8"))
+        return f"{content_hash}-{digest.hexdigest()[:32]}"
+
+    def get_or_build(
+        self, key: str, embed: Callable[[], np.ndarray], chunk_count: int
+    ) -> VectorIndex:
+        """
+        インデックスを取得する（保存済みでなければ埋め込みを計算して保存）
+
+        Args:
+            key: インデックスのキー
+            embed: チャンクの埋め込み行列を返す関数
+            chunk_count: チャンク数（保存済み行列の検証に使用）
+
+        Returns:
+            ベクトルインデックス
+        """
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+
+        path = self._path(key)
+        matrix = None
+        if os.path.exists(path):
+            try:
+                matrix = np.load(path, mmap_mode="r")
+            except (OSError, ValueError) as e:
+                logger.warning(f"ベクトルインデックスの読み込みエラー: {str(e)}")
+
+        if matrix is None or matrix.shape[0] != chunk_count:
+            matrix = self._save(path, embed())
+
+        index = VectorIndex(matrix)
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index
+
+    def discard(self, content_hash: str) -> int:
+        """
+        ファイル内容に対応するインデックスをすべて削除する（元のファイルを削除した後に使用）
+
+        Args:
+            content_hash: ファイル内容のハッシュ
+
+        Returns:
+            削除したインデックス数
+        """
+        prefix = f"{content_hash}-"
+        with self._lock:
+            for key in [key for key in self._indexes if key.startswith(prefix)]:
+                del self._indexes[key]
+
+        shard_dir = os.path.dirname(self._path(prefix))
+        try:
+            names = [name for name in os.listdir(shard_dir) if name.startswith(prefix)]
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            try:
+                os.remove(os.path.join(shard_dir, name))
+            except FileNotFoundError:
+                pass
+        return len(names)
+
+    @staticmethod
+    def _save(path: str, matrix: np.ndarray) -> np.ndarray:
+        """埋め込み行列を保存し、メモリマップで開き直す"""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "wb") as f:
+                np.save(f, matrix)
+            os.replace(temp_path, path)
+            return np.load(path, mmap_mode="r")
+        except OSError as e:
+            # 保存できない場合もメモリ上の行列で検索は継続する
+            logger.warning(f"ベクトルインデックスの書き込みエラー: {str(e)}")
+            return matrix
+
+
+@lru_cache()
+def get_vector_index_store() -> VectorIndexStore:
+    """VectorIndexStoreのインスタンスを取得する（キャッシュ付き）"""
+    return VectorIndexStore(VECTOR_INDEX_DIR, get_settings().vector_index_cache_size)
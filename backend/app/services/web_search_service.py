@@ -0,0 +1,577 @@
+"""
+Web検索サービス
+検索プロバイダーを切り替え可能にし、共有の非同期HTTPクライアントで複数クエリの検索と
+上位ページの本文取得を並行して行う（検索結果はTTL付きでキャッシュする）
+"""
+
+import asyncio
+import ipaddress
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from html.parser import HTMLParser
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+from app.core.settings import get_settings
+from loguru import logger
+
+# 本文を取得するページの最大サイズ（バイト）
+_PAGE_MAX_BYTES = 1024 * 1024
+
+# HTTPヘッダーに文字コードがない場合に<meta>から探す範囲（バイト）
+_CHARSET_SNIFF_BYTES = 4096
+_META_CHARSET_PATTERN = re.compile(rb"""charset=["']?([A-Za-z0-9_-]+)""", re.I)
+
+_USER_AGENT = "ai-agent/0.1 (+web_search)"
+
+# ページ取得時にたどるリダイレクトの最大回数
+_MAX_REDIRECTS = 5
+
+
+class SearchResult(NamedTuple):
+    """検索結果1件"""
+
+    title: str
+    url: str
+    snippet: str
+
+
+class SearchResponse(NamedTuple):
+    """1クエリ分の検索結果（失敗した場合はerrorにメッセージ）"""
+
+    query: str
+    results: List[SearchResult]
+    error: Optional[str] = None
+
+
+class SearchProvider:
+    """検索プロバイダーの基底クラス"""
+
+    name: str = "base"
+
+    async def search(
+        self, client: httpx.AsyncClient, query: str, max_results: int
+    ) -> List[SearchResult]:
+        """
+        検索を実行する
+
+        Args:
+            client: 共有のHTTPクライアント
+            query: 検索クエリ
+            max_results: 取得する最大件数
+
+        Returns:
+            検索結果のリスト
+        """
+        raise NotImplementedError("サブクラスでオーバーライドしてください")
+
+
+class MockSearchProvider(SearchProvider):
+    """外部サービスを使用しない固定の検索結果（オフライン環境用）"""
+
+    name: str = "mock"
+
+    async def search(
+        self, client: httpx.AsyncClient, query: str, max_results: int
+    ) -> List[SearchResult]:
+        results = [
+            SearchResult(
+                f"検索結果1 - {query}に関する情報",
+                f"https://example.com/result1?q={query}",
+                f"{query}に関する詳細情報です。これは最も関連性の高い結果です。",
+            ),
+            SearchResult(
+                f"検索結果2 - {query}の歴史",
+                f"https://example.com/result2?q={query}",
+                f"{query}の歴史的背景と発展について解説しています。",
+            ),
+            SearchResult(
+                f"検索結果3 - {query}の使い方ガイド",
+                f"https://example.com/result3?q={query}",
+                f"{query}の基本的な使い方と応用例を紹介します。",
+            ),
+        ]
+        return results[:max_results]
+
+
+class SearxngSearchProvider(SearchProvider):
+    """SearXNG互換のJSON検索API（ローカルの検証用サーバーにも使用）"""
+
+    name: str = "searxng"
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+
+    async def search(
+        self, client: httpx.AsyncClient, query: str, max_results: int
+    ) -> List[SearchResult]:
+        response = await client.get(
+            self.endpoint, params={"q": query, "format": "json"}
+        )
+        response.raise_for_status()
+        return [
+            SearchResult(
+                item.get("title", ""), item.get("url", ""), item.get("content", "")
+            )
+            for item in response.json().get("results", [])[:max_results]
+        ]
+
+
+class BingSearchProvider(SearchProvider):
+    """Bing Web Search API"""
+
+    name: str = "bing"
+
+    def __init__(self, api_key: str, endpoint: str = ""):
+        self.api_key = api_key
+        self.endpoint = endpoint or "https://api.bing.microsoft.com/v7.0/search"
+
+    async def search(
+        self, client: httpx.AsyncClient, query: str, max_results: int
+    ) -> List[SearchResult]:
+        response = await client.get(
+            self.endpoint,
+            params={"q": query, "count": max_results, "mkt": "ja-JP"},
+            headers={"Ocp-Apim-Subscription-Key": self.api_key},
+        )
+        response.raise_for_status()
+        return [
+            SearchResult(
+                item.get("name", ""), item.get("url", ""), item.get("snippet", "")
+            )
+            for item in response.json()
+            .get("webPages", {})
+            .get("value", [])[:max_results]
+        ]
+
+
+def get_search_provider() -> SearchProvider:
+    """
+    設定に基づいて検索プロバイダーを生成する
+
+    Returns:
+        検索プロバイダー
+    """
+    settings = get_settings()
+    provider = settings.web_search_provider
+
+    if provider == "searxng":
+        if not settings.web_search_endpoint:
+            raise ValueError("SearXNGを使用するにはweb_search_endpointの設定が必要です")
+        return SearxngSearchProvider(settings.web_search_endpoint)
+    elif provider == "bing":
+        if not settings.web_search_api_key:
+            raise ValueError("Bing検索を使用するにはweb_search_api_keyの設定が必要です")
+        return BingSearchProvider(
+            settings.web_search_api_key, settings.web_search_endpoint
+        )
+    else:
+        # 外部サービスを使用しない固定の検索結果
+        return MockSearchProvider()
+
+
+class _TTLCache:
+    """有効期限と最大件数を持つLRUキャッシュ"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        """有効期限内の値を取得（期限切れ・未登録の場合はNone）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Any, value: Any) -> None:
+        """値を保存し、上限を超えた分を古いものから削除"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class _TextExtractor(HTMLParser):
+    """HTMLから本文のテキストを取り出すパーサー"""
+
+    _SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: Any) -> None:
+        if tag in self._SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        text = " ".join(data.split())
+        if text and not self._skip_depth:
+            self.parts.append(text)
+
+
+def _html_to_text(html: str, max_chars: int) -> str:
+    """HTMLを本文のテキストに変換（最大文字数で切り詰め）"""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return "\n".join(parser.parts)[:max_chars]
+
+
+class UnsafeURLError(Exception):
+    """内部ネットワークなど、取得を許可しないURLの場合の例外"""
+
+
+def _is_public_address(address: str) -> bool:
+    """インターネット上のアドレスかどうか（ループバック・プライベート・リンクローカル等は除く）"""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def _resolve(host: str, port: int) -> List[str]:
+    """
+    ホストを名前解決してアドレスのリストを返す（IPアドレスはそのまま返す）
+
+    Raises:
+        UnsafeURLError: 名前解決できない場合
+    """
+    try:
+        return [str(ipaddress.ip_address(host))]
+    except ValueError:
+        pass
+
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+    except OSError as e:
+        raise UnsafeURLError(f"ホストを解決できません: {host}: {str(e)}")
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+class _PublicOnlyTransport(httpx.AsyncHTTPTransport):
+    """
+    内部ネットワークへの接続を拒否するトランスポート
+
+    確認と接続で別々に名前解決すると、その間にDNSの応答を変えて内部のアドレスへ
+    接続させられる（DNSリバインディング）ため、確認したアドレスに直接接続する。
+    Hostヘッダー、TLSのSNIと証明書の検証には元のホスト名を使用する。
+    リダイレクト先への接続もこのトランスポートを通るため、同様に確認される。
+    """
+
+    def __init__(self, allow_private_addresses: bool = False, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.allow_private_addresses = allow_private_addresses
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        if url.scheme not in ("http", "https") or not url.host:
+            raise UnsafeURLError(f"取得できないURLです: {url}")
+
+        port = url.port or (443 if url.scheme == "https" else 80)
+        addresses = await _resolve(url.host, port)
+
+        # 1つでも内部のアドレスに解決される場合は拒否する
+        if not addresses or not (
+            self.allow_private_addresses
+            or all(_is_public_address(address) for address in addresses)
+        ):
+            raise UnsafeURLError(f"内部ネットワークのURLは取得できません: {url.host}")
+
+        pinned = httpx.Request(
+            request.method,
+            url.copy_with(host=addresses[0]),
+            headers=request.headers,
+            stream=request.stream,
+            extensions={**request.extensions, "sni_hostname": url.host},
+        )
+        return await super().handle_async_request(pinned)
+
+
+def _decode_page(data: bytes, encoding: Optional[str]) -> str:
+    """ページの内容を文字列に変換（ヘッダーに文字コードがなければ<meta>から判定）"""
+    if not encoding:
+        match = _META_CHARSET_PATTERN.search(data[:_CHARSET_SNIFF_BYTES])
+        encoding = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        return data.decode(encoding, errors="replace")
+    except LookupError:
+        return data.decode("utf-8", errors="replace")
+
+
+class WebSearchService:
+    """
+    共有のHTTPクライアントで検索とページ取得を行うクラス
+
+    ワークフローは別スレッドで同期的にツールを呼び出すため、HTTPクライアントは専用の
+    イベントループ上で1つだけ作成し、どのスレッドからも同じ接続プールを使用する。
+    """
+
+    def __init__(
+        self,
+        provider: SearchProvider,
+        timeout_seconds: float,
+        max_connections: int,
+        cache_ttl_seconds: float,
+        cache_size: int,
+        page_max_chars: int,
+        allow_private_addresses: bool = False,
+    ):
+        self.provider = provider
+        self.timeout_seconds = timeout_seconds
+        self.max_connections = max_connections
+        self.page_max_chars = page_max_chars
+        self.allow_private_addresses = allow_private_addresses
+        self._cache = _TTLCache(cache_ttl_seconds, cache_size)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._page_client: Optional[httpx.AsyncClient] = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """HTTPクライアント用のイベントループを取得（初回は専用スレッドで起動）"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="web-search", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """共有のHTTPクライアントを取得（専用のイベントループ上でのみ呼び出す）"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout_seconds),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                follow_redirects=True,
+                max_redirects=_MAX_REDIRECTS,
+                headers={"User-Agent": _USER_AGENT},
+            )
+        return self._client
+
+    def _get_page_client(self) -> httpx.AsyncClient:
+        """
+        検索結果のページ取得用のHTTPクライアントを取得（専用のイベントループ上でのみ呼び出す）
+
+        検索結果のURLは外部から与えられるため、内部ネットワークへの接続を拒否する。
+        接続はアドレス単位でプールされ、同じアドレスの別ホストにSNIの異なる接続を
+        再利用しないよう、キープアライブは無効にする。
+        """
+        if self._page_client is None:
+            self._page_client = httpx.AsyncClient(
+                transport=_PublicOnlyTransport(
+                    self.allow_private_addresses,
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=0,
+                    ),
+                ),
+                timeout=httpx.Timeout(self.timeout_seconds),
+                follow_redirects=True,
+                max_redirects=_MAX_REDIRECTS,
+                headers={"User-Agent": _USER_AGENT},
+            )
+        return self._page_client
+
+    def search(
+        self, queries: List[str], max_results: int, fetch_pages: int = 0
+    ) -> Tuple[List[SearchResponse], Dict[str, str]]:
+        """
+        複数のクエリを並行して検索する（同期呼び出し用）
+
+        Args:
+            queries: 検索クエリのリスト
+            max_results: クエリごとの最大件数
+            fetch_pages: 本文を取得するクエリごとの上位ページ数
+
+        Returns:
+            (クエリごとの検索結果, URLをキーとしたページ本文)
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._search_all(queries, max_results, fetch_pages), self._get_loop()
+        )
+        return future.result()
+
+    async def asearch(
+        self, queries: List[str], max_results: int, fetch_pages: int = 0
+    ) -> Tuple[List[SearchResponse], Dict[str, str]]:
+        """searchの非同期版（呼び出し元のイベントループをブロックしない）"""
+        future = asyncio.run_coroutine_threadsafe(
+            self._search_all(queries, max_results, fetch_pages), self._get_loop()
+        )
+        return await asyncio.wrap_future(future)
+
+    async def _search_all(
+        self, queries: List[str], max_results: int, fetch_pages: int
+    ) -> Tuple[List[SearchResponse], Dict[str, str]]:
+        """全クエリを並行して検索し、上位ページの本文も並行して取得する"""
+        client = self._get_client()
+        responses = await asyncio.gather(
+            *(self._search_one(client, query, max_results) for query in queries)
+        )
+
+        urls = list(
+            dict.fromkeys(
+                result.url
+                for response in responses
+                for result in response.results[:fetch_pages]
+                if result.url.startswith(("http://", "https://"))
+            )
+        )
+        page_client = self._get_page_client()
+        pages = await asyncio.gather(
+            *(self._fetch_page(page_client, url) for url in urls)
+        )
+        return list(responses), {
+            url: text for url, text in zip(urls, pages) if text is not None
+        }
+
+    async def _search_one(
+        self, client: httpx.AsyncClient, query: str, max_results: int
+    ) -> SearchResponse:
+        """1クエリを検索する（成功した結果のみキャッシュする）"""
+        key = ("search", self.provider.name, query, max_results)
+        cached = self._cache.get(key)
+        if cached is not None:
+            logger.debug(f"Web検索キャッシュを使用: {query}")
+            return cached
+
+        started = time.perf_counter()
+        try:
+            results = await self.provider.search(client, query, max_results)
+        except Exception as e:
+            logger.error(f"Web検索エラー: {query}: {str(e)}")
+            return SearchResponse(query, [], str(e))
+
+        logger.info(
+            f"Web検索: {query} ({len(results)}件, {time.perf_counter() - started:.2f}秒)"
+        )
+        response = SearchResponse(query, results)
+        self._cache.put(key, response)
+        return response
+
+    async def _fetch_page(self, client: httpx.AsyncClient, url: str) -> Optional[str]:
+        """ページを取得して本文のテキストを返す（HTML・テキスト以外と失敗時はNone）"""
+        key = ("page", url)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            page = await self._download_page(client, httpx.URL(url))
+        except Exception as e:
+            logger.warning(f"ページ取得エラー: {url}: {str(e)}")
+            return None
+        if page is None:
+            return None
+
+        data, content_type, charset = page
+
+        text = _decode_page(data[:_PAGE_MAX_BYTES], charset)
+        if content_type.startswith("text/html"):
+            # HTMLの解析はCPU処理のため、他の通信を止めないようスレッドで実行
+            text = await asyncio.to_thread(_html_to_text, text, self.page_max_chars)
+        else:
+            text = text[: self.page_max_chars]
+
+        self._cache.put(key, text)
+        return text
+
+    @staticmethod
+    async def _download_page(
+        client: httpx.AsyncClient, url: httpx.URL
+    ) -> Optional[Tuple[bytes, str, Optional[str]]]:
+        """
+        ページを上限サイズまで取得する
+
+        Args:
+            client: ページ取得用のHTTPクライアント（リダイレクト先も含めて接続先を確認する）
+            url: 取得するURL
+
+        Returns:
+            (本文, Content-Type, 文字コード)（HTML・テキスト以外の場合はNone）
+
+        Raises:
+            UnsafeURLError: 内部ネットワークのURLの場合
+        """
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "")
+            if not content_type.startswith(("text/html", "text/plain")):
+                return None
+
+            # 大きなページは上限までのみ読み込む
+            data = bytearray()
+            async for chunk in response.aiter_bytes():
+                data.extend(chunk)
+                if len(data) >= _PAGE_MAX_BYTES:
+                    break
+            return bytes(data), content_type, response.charset_encoding
+
+    def close(self) -> None:
+        """HTTPクライアントとイベントループを停止する"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        clients = [c for c in (self._client, self._page_client) if c is not None]
+        self._client = self._page_client = None
+        for client in clients:
+            try:
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(5)
+            except Exception as e:
+                logger.warning(f"HTTPクライアントの終了エラー: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        loop.close()
+
+
+@lru_cache()
+def get_web_search_service() -> WebSearchService:
+    """WebSearchServiceのインスタンスを取得する（キャッシュ付き）"""
+    settings = get_settings()
+    return WebSearchService(
+        get_search_provider(),
+        settings.web_search_timeout_seconds,
+        settings.web_search_max_connections,
+        settings.web_search_cache_ttl_seconds,
+        settings.web_search_cache_size,
+        settings.web_search_page_max_chars,
+        settings.web_search_allow_private_addresses,
+    )
+
+
+def shutdown_web_search() -> None:
+    """Web検索サービスを停止する（起動していない場合は何もしない）"""
+    if get_web_search_service.cache_info().currsize:
+        get_web_search_service().close()
+        get_web_search_service.cache_clear()
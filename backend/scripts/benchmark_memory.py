@@ -0,0 +1,116 @@
+"""
+AgentMemoryとセッションごとのAgentManagerのメモリ使用量ベンチマーク
+
+使い方（backendディレクトリで実行）:
+    python -m scripts.benchmark_memory --sessions 10000 --turns 50
+    python -m scripts.benchmark_memory --agent-managers 20 --provider azure
+"""
+
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from app.agent.memory import AgentMemory
+
+# クライアントを生成するだけで通信はしないため、ダミーの接続情報を使用する
+_BENCHMARK_LLM_CONFIGS = {
+    "azure": {
+        "provider": "azure",
+        "endpoint": "https://example.openai.azure.com/",
+        "api_key": "dummy",
+        "deployment_name": "dummy",
+    },
+    "openai": {"provider": "openai", "api_key": "dummy", "model_name": "gpt-4o"},
+    "local": {"provider": "local", "endpoint": "http://localhost:8000"},
+}
+
+
+def run_benchmark(sessions: int, turns: int) -> None:
+    """指定したセッション数×ターン数の履歴を格納し、使用量を計測する"""
+    # 実運用に近づけるため、メッセージ本文はターンごとに別オブジェクトとする
+    user_text = "ユーザーからの質問です。" * 4
+    ai_text = "エージェントからの回答です。" * 8
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    memory = AgentMemory()
+    for session_num in range(sessions):
+        session_id = f"session-{session_num}"
+        for turn in range(turns):
+            memory.add_user_message(session_id, f"{turn}:{user_text}")
+            memory.add_ai_message(session_id, f"{turn}:{ai_text}")
+
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    messages = sessions * turns * 2
+    print(f"セッション数: {sessions}, ターン数: {turns}, メッセージ数: {messages}")
+    print(f"格納時間: {elapsed:.2f}秒")
+    print(
+        f"使用メモリ: {current / (1024 * 1024):.1f}MB (ピーク {peak / (1024 * 1024):.1f}MB)"
+    )
+    print(f"1メッセージあたり: {current / messages:.0f}バイト（本文を含む）")
+
+    start = time.perf_counter()
+    for session_num in range(sessions):
+        memory.get_chat_history(f"session-{session_num}")
+    elapsed = time.perf_counter() - start
+    print(f"全セッションの履歴取得: {elapsed * 1000:.1f}ミリ秒")
+
+
+def _traced_bytes(create) -> int:
+    """生成したオブジェクトが保持しているメモリ（バイト）を計測する"""
+    gc.collect()
+    tracemalloc.start()
+    objects = create()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current
+
+
+async def run_agent_benchmark(managers: int, provider: str) -> None:
+    """
+    セッションごとに作成するAgentManagerと、セッション別LLM設定のクライアント・
+    ワークフローの使用量を計測する（SessionManagerの概算サイズの根拠）
+    """
+    from app.agent.core import AgentManager
+    from app.agent.tools import get_tools
+
+    config = _BENCHMARK_LLM_CONFIGS[provider]
+    # ツールとライブラリの読み込み分は全セッションで共有するため、計測の前に済ませる
+    get_tools()
+    AgentManager(config).update_session_llm_config("warmup", config)
+
+    manager_bytes = _traced_bytes(
+        lambda: [AgentManager(config) for _ in range(managers)]
+    )
+    agents = [AgentManager(config) for _ in range(managers)]
+    client_bytes = _traced_bytes(
+        lambda: [agent.update_session_llm_config("session", config) for agent in agents]
+    )
+
+    print(f"プロバイダー: {provider}, AgentManager数: {managers}")
+    print(f"AgentManager 1個あたり: {manager_bytes / managers / 1024:.0f}KiB")
+    print(f"セッション別LLM設定 1件あたり: {client_bytes / managers / 1024:.0f}KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--agent-managers", type=int, default=0)
+    parser.add_argument(
+        "--provider", choices=sorted(_BENCHMARK_LLM_CONFIGS), default="azure"
+    )
+    args = parser.parse_args()
+
+    if args.agent_managers:
+        asyncio.run(run_agent_benchmark(args.agent_managers, args.provider))
+    else:
+        run_benchmark(args.sessions, args.turns)
@@ -0,0 +1,93 @@
+"""
+起動時のインポート時間と重いライブラリの遅延読み込みのチェック
+
+新しいプロセスで app.main をインポートし、解析ライブラリ・LLMクライアントが
+読み込まれていないこと、インポート時間が予算内であることを確認する。
+いずれかを満たさない場合は終了コード1で終了する（CIで使用する）。
+
+使い方（backendディレクトリで実行）:
+    python -m scripts.check_import_time --budget 2.0 --runs 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict
+
+# 起動時に読み込まれてはいけないモジュール（初回の使用時にインポートする）
+LAZY_MODULES = (
+    "pandas",
+    "pdfplumber",
+    "docx",
+    "pptx",
+    "openai",
+    "langchain_community",
+)
+
+# 新しいプロセスで実行する計測コード
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+lazy = {lazy!r}
+loaded = [name for name in lazy if name in sys.modules]
+from app.agent.tools import get_tools
+get_tools()
+loaded_by_tools = [name for name in lazy if name in sys.modules and name not in loaded]
+print(json.dumps({{"elapsed": elapsed, "loaded": loaded, "loaded_by_tools": loaded_by_tools}}))
+"""
+
+
+def measure() -> Dict[str, Any]:
+    """新しいプロセスでapp.mainをインポートし、時間と読み込まれたモジュールを返す"""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(lazy=LAZY_MODULES)],
+        cwd=backend_dir,
+        env={**os.environ, "PYTHONPATH": backend_dir},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_check(budget: float, runs: int) -> bool:
+    """インポート時間（最速の計測値）と遅延読み込みを確認する"""
+    results = [measure() for _ in range(runs)]
+    elapsed = min(result["elapsed"] for result in results)
+    loaded = sorted({name for result in results for name in result["loaded"]})
+    loaded_by_tools = sorted(
+        {name for result in results for name in result["loaded_by_tools"]}
+    )
+
+    print(
+        f"app.mainのインポート時間: {elapsed:.2f}秒（予算 {budget:.2f}秒, {runs}回中の最速）"
+    )
+    ok = True
+    if elapsed > budget:
+        print("NG: インポート時間が予算を超えています")
+        ok = False
+    if loaded:
+        print(f"NG: 起動時に読み込まれたモジュール: {', '.join(loaded)}")
+        ok = False
+    if loaded_by_tools:
+        print(
+            f"NG: ツールの登録時に読み込まれたモジュール: {', '.join(loaded_by_tools)}"
+        )
+        ok = False
+    if ok:
+        print("OK")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget", type=float, default=2.0)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    sys.exit(0 if run_check(args.budget, args.runs) else 1)
@@ -0,0 +1,182 @@
+"""
+SearXNG互換の検証用検索サーバー
+
+外部の検索サービスを使用せずに、Web検索サービスの検索・ページ取得を検証するための
+ローカルサーバー。検索APIとあわせて、文字コード・リダイレクトなどを確認するための
+ページも返す。
+
+エンドポイント:
+    /search?q=...&format=json  検索結果（クエリが「url:」で始まる場合はそのURLを1件返す）
+    /page/utf8                 UTF-8のHTML（script・styleを含む）
+    /page/sjis                 Shift_JISのHTML（文字コードは<meta>のみで指定）
+    /page/text                 プレーンテキスト
+    /page/binary               HTML・テキスト以外のファイル
+    /redirect?to=...           指定したURLへリダイレクト
+    /host                      受信したHostヘッダーを返す
+
+使い方（backendディレクトリで実行）:
+    python -m scripts.stub_search_server --port 8888 --delay 0.2
+
+    WEB_SEARCH_PROVIDER=searxng
+    WEB_SEARCH_ENDPOINT=http://127.0.0.1:8888/search
+    WEB_SEARCH_ALLOW_PRIVATE_ADDRESSES=true
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+_UTF8_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>検証用ページ</title><style>body { color: red; }</style></head>
+<body>
+<h1>検証用ページ</h1>
+<script>var hidden = "表示されないスクリプト";</script>
+<p>これはUTF-8の本文です。</p>
+</body>
+</html>
+"""
+
+_SJIS_PAGE = """<html>
+<head><meta charset="Shift_JIS"><title>シフトJIS</title></head>
+<body><p>これはShift_JISの本文です。</p></body>
+</html>
+"""
+
+_PAGES = {
+    "/page/utf8": ("text/html; charset=utf-8", _UTF8_PAGE.encode("utf-8")),
+    "/page/sjis": ("text/html", _SJIS_PAGE.encode("shift_jis")),
+    "/page/text": ("text/plain; charset=utf-8", "プレーンテキストの本文".encode()),
+    "/page/binary": ("application/octet-stream", b"\x00\x01\x02\x03"),
+}
+
+
+class StubSearchServer:
+    """
+    検証用検索サーバー（別スレッドで起動する）
+
+    Args:
+        host: 待ち受けるアドレス
+        port: 待ち受けるポート（0の場合は空いているポート）
+        delay_seconds: 検索APIの応答を遅らせる秒数（並行実行の確認用）
+    """
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 0, delay_seconds: float = 0.0
+    ):
+        self.delay_seconds = delay_seconds
+        # クエリごとの検索APIの呼び出し回数（キャッシュの確認用）
+        self.search_counts: Counter = Counter()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "StubSearchServer":
+        """サーバーを別スレッドで起動する"""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="stub-search", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """サーバーを停止する"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def serve_forever(self) -> None:
+        """現在のスレッドでサーバーを実行する（Ctrl+Cで停止）"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def search_results(self, query: str, base_url: str) -> List[Dict[str, str]]:
+        """クエリに対する検索結果（ページのURLはリクエストされたホストを基準にする）"""
+        if query.startswith("url:"):
+            return [{"title": query, "url": query[4:], "content": ""}]
+        return [
+            {
+                "title": f"{query} - {name}",
+                "url": f"{base_url}{path}",
+                "content": f"{query}に関する{name}のページです。",
+            }
+            for name, path in (
+                ("UTF-8", "/page/utf8"),
+                ("Shift_JIS", "/page/sjis"),
+                ("テキスト", "/page/text"),
+                ("バイナリ", "/page/binary"),
+            )
+        ]
+
+
+def _make_handler(stub: StubSearchServer) -> type:
+    """検証用サーバーのリクエストハンドラーを作成"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlsplit(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            base_url = f"http://{self.headers.get('Host', '127.0.0.1')}"
+
+            if url.path == "/search":
+                query = params.get("q", "")
+                stub.search_counts[query] += 1
+                if stub.delay_seconds:
+                    time.sleep(stub.delay_seconds)
+                body = {"query": query, "results": stub.search_results(query, base_url)}
+                self._send(200, "application/json", json.dumps(body).encode())
+            elif url.path in _PAGES:
+                self._send(200, *_PAGES[url.path])
+            elif url.path == "/redirect":
+                self.send_response(302)
+                self.send_header("Location", params.get("to", "/"))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            elif url.path == "/host":
+                host = self.headers.get("Host", "")
+                self._send(200, "text/plain; charset=utf-8", host.encode())
+            else:
+                self._send(404, "text/plain", b"not found")
+
+        def _send(self, status: int, content_type: str, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubSearchServer(args.host, args.port, args.delay)
+    print(f"検証用検索サーバーを起動しました: http://{args.host}:{server.port}/search")
+    server.serve_forever()
@@ -0,0 +1,164 @@
+"""
+Web検索サービスのテスト（ローカルの検証用検索サーバーを使用する）
+"""
+
+import time
+
+import pytest
+from app.services import web_search_service
+from app.services.web_search_service import SearxngSearchProvider, WebSearchService
+from scripts.stub_search_server import StubSearchServer
+
+
+@pytest.fixture
+def stub():
+    server = StubSearchServer(delay_seconds=0.2).start()
+    yield server
+    server.stop()
+
+
+def make_service(stub: StubSearchServer, allow_private_addresses: bool = True):
+    return WebSearchService(
+        SearxngSearchProvider(f"{stub.base_url}/search"),
+        timeout_seconds=5.0,
+        max_connections=10,
+        cache_ttl_seconds=60,
+        cache_size=32,
+        page_max_chars=1000,
+        allow_private_addresses=allow_private_addresses,
+    )
+
+
+@pytest.fixture
+def service(stub):
+    service = make_service(stub)
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def public_only_service(stub):
+    service = make_service(stub, allow_private_addresses=False)
+    yield service
+    service.close()
+
+
+def fetch(service: WebSearchService, url: str):
+    """検証用サーバーが返す1件の検索結果として、URLの本文を取得する"""
+    _, pages = service.search([f"url:{url}"], max_results=1, fetch_pages=1)
+    return pages.get(url)
+
+
+def test_search_returns_provider_results(service, stub):
+    responses, pages = service.search(["東京"], max_results=2)
+
+    assert pages == {}
+    assert [response.query for response in responses] == ["東京"]
+    assert responses[0].error is None
+    assert [result.title for result in responses[0].results] == [
+        "東京 - UTF-8",
+        "東京 - Shift_JIS",
+    ]
+
+
+def test_queries_run_concurrently(service, stub):
+    queries = [f"クエリ{i}" for i in range(5)]
+
+    started = time.perf_counter()
+    responses, _ = service.search(queries, max_results=1)
+    elapsed = time.perf_counter() - started
+
+    assert [response.query for response in responses] == queries
+    # 検索APIは1件あたり0.2秒かかるため、逐次実行なら1秒以上かかる
+    assert elapsed < 0.8
+
+
+def test_search_results_are_cached(service, stub):
+    first, _ = service.search(["キャッシュ"], max_results=3)
+    second, _ = service.search(["キャッシュ"], max_results=3)
+
+    assert first == second
+    assert stub.search_counts["キャッシュ"] == 1
+
+
+def test_search_errors_are_reported_per_query(stub):
+    service = WebSearchService(
+        SearxngSearchProvider(f"{stub.base_url}/missing"), 5.0, 10, 60, 32, 1000
+    )
+    try:
+        responses, _ = service.search(["エラー"], max_results=1)
+    finally:
+        service.close()
+
+    assert responses[0].results == []
+    assert "404" in responses[0].error
+
+
+def test_fetch_pages_extracts_text(service, stub):
+    _, pages = service.search(["本文"], max_results=4, fetch_pages=4)
+
+    assert (
+        pages[f"{stub.base_url}/page/utf8"] == "検証用ページ\nこれはUTF-8の本文です。"
+    )
+    assert pages[f"{stub.base_url}/page/sjis"] == "これはShift_JISの本文です。"
+    assert pages[f"{stub.base_url}/page/text"] == "プレーンテキストの本文"
+    # HTML・テキスト以外のページは取得しない
+    assert f"{stub.base_url}/page/binary" not in pages
+
+
+def test_fetch_page_follows_redirects(service, stub):
+    url = f"{stub.base_url}/redirect?to=/page/text"
+
+    assert fetch(service, url) == "プレーンテキストの本文"
+
+
+def test_internal_pages_are_not_fetched(public_only_service, stub):
+    responses, pages = public_only_service.search(
+        ["内部"], max_results=4, fetch_pages=4
+    )
+
+    # 検索APIは設定されたエンドポイントのため利用できるが、結果のページは取得しない
+    assert len(responses[0].results) == 4
+    assert pages == {}
+
+
+def test_connects_to_checked_address(service, stub, monkeypatch):
+    resolved = []
+
+    async def resolve(host, port):
+        resolved.append(host)
+        return ["127.0.0.1"]
+
+    monkeypatch.setattr(web_search_service, "_resolve", resolve)
+
+    # 実在しないホスト名でも、確認したアドレスに接続して元のHostヘッダーを送る
+    assert (
+        fetch(service, f"http://stub.test:{stub.port}/host") == f"stub.test:{stub.port}"
+    )
+    assert resolved == ["stub.test"]
+
+
+def test_rejects_host_resolving_to_internal_address(public_only_service, monkeypatch):
+    async def resolve(host, port):
+        return ["93.184.216.34", "127.0.0.1"]
+
+    monkeypatch.setattr(web_search_service, "_resolve", resolve)
+
+    assert fetch(public_only_service, "http://rebind.test/") is None
+
+
+def test_rejects_redirect_to_internal_address(public_only_service, stub, monkeypatch):
+    checked = []
+
+    # 検証用サーバーのアドレスのみを公開アドレスとして扱う
+    def is_public_address(address):
+        checked.append(address)
+        return address == "127.0.0.1"
+
+    monkeypatch.setattr(web_search_service, "_is_public_address", is_public_address)
+
+    assert fetch(public_only_service, f"{stub.base_url}/page/text") is not None
+    url = f"{stub.base_url}/redirect?to=http://127.0.0.2:{stub.port}/page/text"
+    assert fetch(public_only_service, url) is None
+    # リダイレクト先は接続前に確認して拒否する
+    assert checked[-1] == "127.0.0.2"